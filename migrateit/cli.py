@@ -1,27 +1,66 @@
+import contextlib
 import os
 import platform
 import shlex
 import subprocess
+import time
+from collections.abc import Generator
+from datetime import datetime
 from pathlib import Path
-
-from migrateit.clients import PsqlClient, SqlClient
+from typing import Any
+
+import migrateit.constants as C
+from migrateit.clients import PsqlClient, SqlClient, get_client_class
+from migrateit.drift import SchemaDrift, compare_fingerprints, fingerprint_schema, keep_drift
+from migrateit.hooks import HookManager, MigrationResult
+from migrateit.lint import LINT_RULES, LintFinding, lint_migration, load_baseline, save_baseline
+from migrateit.metrics import get_metrics, record_migration, record_statuses, timed
 from migrateit.models import (
+    ChangelogFile,
+    Migration,
+    MigrationPhase,
+    MigrationPlan,
     MigrationStatus,
+    PlannedMigration,
     SupportedDatabase,
+    TransactionMode,
+)
+from migrateit.reporters import (
+    STATUS_COLORS,
+    pretty_print_sql_error,
+    print_dag,
+    print_json,
+    print_list,
+    write_line,
 )
-from migrateit.reporters import STATUS_COLORS, pretty_print_sql_error, print_dag, print_list, write_line
+from migrateit.rewrite import rewrite_migration_file
+from migrateit.server import StatusCache, StatusWatcher, create_server
+from migrateit.template import build_template, clone_template, get_template_digest, template_lock
 from migrateit.tree import (
+    atomic_write,
     build_migration_plan,
     build_migrations_tree,
+    compress_migration_file,
+    compute_changelog_digest,
+    compute_names_digest,
+    compute_status_digest,
     create_changelog_file,
     create_migration_directory,
     create_new_migration,
     find_path,
+    hash_migration,
+    load_changelog_file,
+    migration_compression,
     retrieve_migration_sqls,
     save_changelog_file,
     write_into_migration_file,
 )
 
+# `check` exit codes, apart from the 1 and 3 of the error handler
+CHECK_UP_TO_DATE = 0
+CHECK_BEHIND = 4
+CHECK_DIVERGED = 5
+
 
 def cmd_init(table_name: str, migrations_dir: Path, migrations_file: Path, database: SupportedDatabase) -> int:
     write_line(f"\tCreating migrations file: {migrations_file}")
@@ -32,22 +71,104 @@ def cmd_init(table_name: str, migrations_dir: Path, migrations_file: Path, datab
 
     write_line(f"\tCreating migration for table: {table_name}")
     migration = create_new_migration(changelog=changelog, migrations_dir=migrations_dir, name="migrateit")
-    match database:
-        case SupportedDatabase.POSTGRES:
-            sql, rollback = PsqlClient.create_migrations_table_str(table_name=table_name)
-        case _:
-            raise NotImplementedError(f"Database {database} is not supported yet")
+    sql, rollback = get_client_class(database).create_migrations_table_str(table_name=table_name)
 
     write_into_migration_file(Path(migrations_dir / migration.name), sql=sql, rollback=rollback)
 
     return 0
 
 
+def cmd_convert(migrations_file: Path, target_format: str) -> int:
+    if target_format not in ("json", "jsonl"):
+        raise ValueError(f"Unsupported changelog format: {target_format}")
+
+    changelog = load_changelog_file(migrations_file)
+    if changelog.path.suffix == f".{target_format}":
+        write_line(f"Changelog {changelog.path} is already in {target_format} format.")
+        return 0
+
+    target_file = changelog.path.with_suffix(f".{target_format}")
+    write_line(f"\tConverting {changelog.path} into {target_file}")
+    create_changelog_file(target_file, changelog.database)
+    changelog.path = target_file
+    save_changelog_file(changelog)
+    migrations_file.unlink()
+    return 0
+
+
+def cmd_lint(
+    changelog: ChangelogFile,
+    migrations_dir: Path,
+    names: list[str] | None = None,
+    disabled_rules: list[str] | None = None,
+    baseline: Path | None = None,
+    update_baseline: bool = False,
+) -> int:
+    unknown = set(disabled_rules or []) - set(LINT_RULES)
+    if unknown:
+        raise ValueError(f"Unknown lint rules: {', '.join(sorted(unknown))}")
+    migrations = changelog.migrations
+    if names:
+        migrations = [changelog.get_migration_by_name(name) for name in names]
+
+    findings = _lint_migrations(migrations_dir, migrations, disabled_rules)
+    if update_baseline:
+        if not baseline:
+            raise ValueError("A baseline file is required to update it.")
+        save_baseline(baseline, findings)
+        write_line(f"\tSaved {len(findings)} findings into {baseline}")
+        return 0
+
+    accepted = load_baseline(baseline) if baseline else set()
+    new_findings = [f for f in findings if f.fingerprint not in accepted]
+    for finding in new_findings:
+        write_line(f"{finding.location}: {finding.rule}: {finding.message}")
+    write_line(f"\n{len(new_findings)} new findings ({len(findings) - len(new_findings)} in the baseline).")
+    return 1 if new_findings else 0
+
+
+def _lint_migrations(
+    migrations_dir: Path,
+    migrations: list[Migration],
+    disabled_rules: list[str] | None = None,
+) -> list[LintFinding]:
+    disabled = set(C.MIGRATEIT_LINT_DISABLE if disabled_rules is None else disabled_rules)
+    rules = [rule for rule in LINT_RULES if rule not in disabled]
+    return [finding for m in migrations for finding in lint_migration(migrations_dir / m.name, rules)]
+
+
+def cmd_rewrite(client: SqlClient, names: list[str] | None = None, dry_run: bool = False) -> int:
+    status_map = client.retrieve_migration_statuses()
+    if names:
+        migrations = [client.changelog.get_migration_by_name(name) for name in names]
+        applied = [m.name for m in migrations if status_map.get(m.name) != MigrationStatus.NOT_APPLIED]
+        if applied:
+            raise ValueError(f"Migrations {applied} are already applied, rewriting them would change their hash.")
+    else:
+        migrations = _pending_migrations(client, status_map)
+
+    total = 0
+    for migration in migrations:
+        path = client.migrations_dir / migration.name
+        for rewrite in rewrite_migration_file(path, dry_run=dry_run):
+            total += 1
+            write_line(f"{path}:{rewrite.line}: {rewrite.rule}")
+            for statement in rewrite.statements:
+                write_line(f"\t{' '.join(statement.split())};")
+
+    if total and not dry_run:
+        write_line(f"\nRewrote {total} statements, apply them with `migrate --transaction-mode statement`.")
+    elif not total:
+        write_line("Nothing to rewrite.")
+    return 0
+
+
 def cmd_new(
     client: SqlClient,
     name: str,
     dependencies: list[str] | None = None,
     no_edit: bool = False,
+    phase: MigrationPhase = MigrationPhase.PRE,
 ) -> int:
     if not client.is_migrations_table_created():
         raise ValueError(f"Migrations table={client.table_name} does not exist. Please run `init` & `migrate` first.")
@@ -57,6 +178,7 @@ def cmd_new(
         migrations_dir=client.migrations_dir,
         name=name,
         dependencies=dependencies,
+        phase=phase,
     )
 
     if no_edit:
@@ -73,6 +195,9 @@ def cmd_run(
     is_fake: bool = False,
     is_rollback: bool = False,
     is_hash_update: bool = False,
+    hooks: HookManager | None = None,
+    transaction_mode: TransactionMode = TransactionMode.PLAN,
+    phase: MigrationPhase | None = None,
 ) -> int:
     target_migration = client.changelog.get_migration_by_name(name) if name else None
 
@@ -86,39 +211,210 @@ def cmd_run(
         client.connection.commit()
         return 0
 
+    hooks = hooks if hooks is not None else HookManager()
+    try:
+        with _migrations_lock(client, transaction_mode):
+            statuses = client.retrieve_migration_statuses()
+            record_statuses(statuses)
+            if is_fake:
+                if not target_migration:
+                    raise ValueError("Fake migration requires a target migration name")
+                if target_migration.initial:
+                    raise ValueError("Cannot fake the initial migration")
+                write_line(
+                    f"{'Faking' if not is_rollback else 'Faking rollback for'} migration: {target_migration.name}"
+                )
+                client.apply_migration(target_migration, is_fake=is_fake, is_rollback=is_rollback)
+                client.connection.commit()
+                return 0
+
+            migration_plan = _build_plan(client, statuses, target_migration, is_rollback, hooks, phase)
+            hooks.after_plan(client, migration_plan, is_rollback)
+            _execute_plan(client, migration_plan, is_rollback, hooks, transaction_mode)
+            return 0
+    except Exception as e:
+        hooks.on_failure(client, hooks.current, e)
+        raise
+
+
+def cmd_plan(
+    client: SqlClient,
+    output: Path,
+    name: str | None = None,
+    is_rollback: bool = False,
+    phase: MigrationPhase | None = None,
+) -> int:
+    target_migration = client.changelog.get_migration_by_name(name) if name else None
+    applied = client.retrieve_applied_migrations()
     statuses = client.retrieve_migration_statuses()
-    if is_fake:
-        if not target_migration:
-            raise ValueError("Fake migration requires a target migration name")
-        if target_migration.initial:
-            raise ValueError("Cannot fake the initial migration")
-        write_line(f"{'Faking' if not is_rollback else 'Faking rollback for'} migration: {target_migration.name}")
-        client.apply_migration(target_migration, is_fake=is_fake, is_rollback=is_rollback)
-        client.connection.commit()
-        return 0
+    record_statuses(statuses)
+    migration_plan = _build_plan(client, statuses, target_migration, is_rollback, phase=phase)
 
+    plan = MigrationPlan(
+        database=client.changelog.database,
+        table_name=client.table_name,
+        status_digest=compute_status_digest(applied),
+        is_rollback=is_rollback,
+        migrations=[
+            PlannedMigration(m.name, hash_migration(client.migrations_dir / m.name), m.initial) for m in migration_plan
+        ],
+        created_at=datetime.now().isoformat(),
+    )
+    atomic_write(output, plan.to_json() + "\n")
+
+    for migration in plan.migrations:
+        write_line(f"\t{'Apply' if not is_rollback else 'Roll back'} {migration.name} ({migration.hash[:12]})")
+    write_line(f"Plan with {len(plan.migrations)} migrations written into {output}")
+    return 0
+
+
+def cmd_apply(
+    client: SqlClient,
+    plan_file: Path,
+    hooks: HookManager | None = None,
+    transaction_mode: TransactionMode = TransactionMode.PLAN,
+) -> int:
+    plan = MigrationPlan.from_json(plan_file.read_text())
+    if plan.database != client.changelog.database or plan.table_name != client.table_name:
+        raise ValueError(f"Plan {plan_file} was built for {plan.database.value} table {plan.table_name}.")
+    with timed("hash_check"):
+        changed = [m.name for m in plan.migrations if hash_migration(client.migrations_dir / m.name) != m.hash]
+    if changed:
+        raise ValueError(f"Migrations {changed} changed since the plan was built.")
+
+    hooks = hooks if hooks is not None else HookManager()
+    try:
+        with _migrations_lock(client, transaction_mode):
+            # the plan was reviewed against a given state of the database, any change invalidates it
+            if compute_status_digest(client.retrieve_applied_migrations()) != plan.status_digest:
+                raise ValueError("The migrations table changed since the plan was built, build a new plan.")
+
+            migration_plan = [Migration(name=m.name, initial=m.initial) for m in plan.migrations]
+            hooks.after_plan(client, migration_plan, plan.is_rollback)
+            _execute_plan(client, migration_plan, plan.is_rollback, hooks, transaction_mode)
+            return 0
+    except Exception as e:
+        hooks.on_failure(client, hooks.current, e)
+        raise
+
+
+def _build_plan(
+    client: SqlClient,
+    statuses: dict[str, MigrationStatus],
+    target_migration: Migration | None,
+    is_rollback: bool,
+    hooks: HookManager | None = None,
+    phase: MigrationPhase | None = None,
+) -> list[Migration]:
     if is_rollback and not target_migration:
         raise ValueError("Rollback requires a target migration name")
+    if is_rollback and phase is not None:
+        raise ValueError("Rollbacks can't be limited to a deploy phase")
+    _report_migration_files(client)
     client.validate_migrations(statuses)
 
-    migration_plan = build_migration_plan(
-        client.changelog,
-        migration_tree=build_migrations_tree(client.changelog),
-        statuses_map=statuses,
-        target_migration=target_migration,
-        is_rollback=is_rollback,
-    )
+    if hooks is not None:
+        hooks.before_plan(client, target_migration, is_rollback)
+    with timed("planning"):
+        return build_migration_plan(
+            client.changelog,
+            migration_tree=build_migrations_tree(client.changelog),
+            statuses_map=statuses,
+            target_migration=target_migration,
+            is_rollback=is_rollback,
+            phase=phase,
+        )
 
+
+def _execute_plan(
+    client: SqlClient,
+    migration_plan: list[Migration],
+    is_rollback: bool,
+    hooks: HookManager,
+    transaction_mode: TransactionMode,
+) -> None:
     if not migration_plan:
+        client.connection.rollback()  # release the migrations lock
         write_line("Nothing to do.")
-        return 0
-
+        return
+
+    # changes made by hand since the last run must not become part of the recorded schema
+    with timed("fingerprint"):
+        recorded = client.retrieve_schema_fingerprint()
+        drift = (
+            compare_fingerprints(recorded, fingerprint_schema(client.retrieve_schema_objects()))
+            if recorded is not None
+            else None
+        )
+    if drift:
+        write_line(
+            f"Schema changed outside of the migrations since the last run ({len(drift.added)} added, "
+            f"{len(drift.removed)} removed, {len(drift.changed)} changed), see `migrateit drift`."
+        )
+
+    throttled = get_metrics().phases.get("replication_throttle", 0.0)
     for migration in migration_plan:
         write_line(f"{'Applying' if not is_rollback else 'Rolling back'} migration: {migration.name}")
-        client.apply_migration(migration, is_rollback=is_rollback)
+        hooks.before_migration(client, migration, is_rollback)
+        started = time.perf_counter()
+        with timed("sql_exec"):
+            rows = client.apply_migration(migration, is_rollback=is_rollback)
+        seconds = time.perf_counter() - started
+        if transaction_mode != TransactionMode.PLAN:
+            # recorded with each migration, the ones committed before a later one fails are not reported as drift
+            _save_schema_fingerprint(client, recorded, drift)
+        if transaction_mode == TransactionMode.MIGRATION:
+            with timed("commit"):
+                client.connection.commit()
+            if isinstance(client, PsqlClient) and migration is not migration_plan[-1]:
+                client.throttle_between_migrations()
+        record_migration(migration.name, seconds)
+        hooks.after_migration(client, MigrationResult(migration, is_rollback, seconds, rows))
+
+    throttled = get_metrics().phases.get("replication_throttle", 0.0) - throttled
+    if throttled:
+        write_line(f"Paused {throttled:.1f}s waiting for the replicas to catch up.")
+
+    if transaction_mode == TransactionMode.PLAN:
+        _save_schema_fingerprint(client, recorded, drift)
+    with timed("commit"):
+        client.connection.commit()
 
-    client.connection.commit()
-    return 0
+
+def _save_schema_fingerprint(client: SqlClient, recorded: dict[str, str] | None, drift: SchemaDrift | None) -> None:
+    # the schema the changelog leads to, the objects changed by hand before the run are kept as recorded
+    with timed("fingerprint"):
+        fingerprint = fingerprint_schema(client.retrieve_schema_objects())
+        if recorded is not None and drift:
+            fingerprint = keep_drift(fingerprint, recorded, drift)
+        client.save_schema_fingerprint(fingerprint)
+
+
+@contextlib.contextmanager
+def _migrations_lock(client: SqlClient, transaction_mode: TransactionMode) -> Generator[None]:
+    """
+    Hold the migrations lock while the block runs.
+    A plan applied in a single transaction releases it on commit, other modes commit several times and hold it for
+    the whole session instead.
+    """
+    if transaction_mode == TransactionMode.PLAN:
+        with timed("lock_wait"):
+            client.acquire_migrations_lock()
+        yield
+        return
+
+    previous = client.connection.autocommit
+    client.connection.rollback()
+    client.connection.autocommit = transaction_mode == TransactionMode.STATEMENT
+    try:
+        with timed("lock_wait"):
+            client.acquire_migrations_lock(session=True)
+        yield
+    finally:
+        client.connection.rollback()
+        client.release_migrations_lock()
+        client.connection.rollback()
+        client.connection.autocommit = previous
 
 
 def cmd_squash(
@@ -126,6 +422,7 @@ def cmd_squash(
     start_migration: str,
     end_migration: str | None = None,
     name: str | None = None,
+    hooks: HookManager | None = None,
 ) -> int:
     if not end_migration:
         end_migration = client.changelog.migrations[-1].name
@@ -141,43 +438,132 @@ def cmd_squash(
     if any(m.initial for m in (client.changelog.get_migration_by_name(m) for m in to_squash)):
         raise ValueError("Cannot squash initial migrations.")
 
-    statuses = client.retrieve_migration_statuses()
-    if not all(statuses[m] == statuses[to_squash[0]] for m in to_squash):
-        raise ValueError("Cannot squash migrations that are not in the same state.")
+    hooks = hooks if hooks is not None else HookManager()
+    migrations = [client.changelog.get_migration_by_name(m) for m in to_squash]
+    try:
+        statuses = client.retrieve_migration_statuses()
+        if not all(statuses[m] == statuses[to_squash[0]] for m in to_squash):
+            raise ValueError("Cannot squash migrations that are not in the same state.")
+
+        hooks.before_squash(client, migrations)
+        squashed_migration = create_new_migration(
+            changelog=client.changelog,
+            migrations_dir=client.migrations_dir,
+            name=name if name else f"squashed_{start_migration}_{end_migration}",
+            dependencies=client.changelog.get_migration_by_name(start_migration).parents,
+            # pre-deploy changes would be delayed if squashed into a post-deploy migration
+            phase=MigrationPhase.POST
+            if all(m.phase == MigrationPhase.POST for m in migrations)
+            else MigrationPhase.PRE,
+        )
+
+        for migration in migrations:
+            write_line(f"Squashing migration: {migration.name}")
+            sql, rollback = retrieve_migration_sqls(client.migrations_dir / migration.name)
+            write_into_migration_file(client.migrations_dir / squashed_migration.name, sql=sql, rollback=rollback)
+
+        # the squashed migration is stored like the latest compressed migration it replaces
+        compressions = [migration_compression(client.migrations_dir / m.name) for m in migrations]
+        if suffix := next((c for c in reversed(compressions) if c), None):
+            compress_migration_file(client.migrations_dir / squashed_migration.name, suffix)
+
+        write_line(f"Squashed migration created: {squashed_migration.name}")
+
+        if all(statuses[m] == MigrationStatus.APPLIED for m in to_squash):
+            client.squash_migrations(to_squash, squashed_migration)
+            client.connection.commit()
+            write_line("Migrations marked as squashed in the database.")
+            write_line(f"Squashed migration {squashed_migration.name} applied in the database.")
+
+        client.changelog.migrations = [m for m in client.changelog.migrations if m.name not in to_squash]
+        save_changelog_file(client.changelog)
+        write_line("Changelog file updated")
+        hooks.after_squash(client, migrations, squashed_migration)
+    except Exception as e:
+        hooks.on_failure(client, None, e)
+        raise
 
-    squashed_migration = create_new_migration(
-        changelog=client.changelog,
-        migrations_dir=client.migrations_dir,
-        name=name if name else f"squashed_{start_migration}_{end_migration}",
-        dependencies=client.changelog.get_migration_by_name(start_migration).parents,
-    )
+    return 0
 
-    for migration_name in to_squash:
-        migration = client.changelog.get_migration_by_name(migration_name)
-        write_line(f"Squashing migration: {migration.name}")
-        sql, rollback = retrieve_migration_sqls(client.migrations_dir / migration.name)
-        write_into_migration_file(client.migrations_dir / squashed_migration.name, sql=sql, rollback=rollback)
 
-    write_line(f"Squashed migration created: {squashed_migration.name}")
+def cmd_serve(
+    client: SqlClient,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket_path: Path | None = None,
+    poll_interval: float = C.MIGRATEIT_SERVE_POLL_INTERVAL,
+) -> int:
+    cache = StatusCache(client, connect=type(client).connect)
+    cache.refresh()
+    server = create_server(cache, host=host, port=port, socket_path=socket_path)
+    watcher = StatusWatcher(cache, poll_interval)
+    watcher.start()
+
+    address = socket_path or f"http://{host}:{server.socket.getsockname()[1]}"
+    write_line(f"Serving /status, /pending and /plan on {address}, press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        watcher.stop()
+        if socket_path is not None:
+            socket_path.unlink(missing_ok=True)
+    return 0
 
-    if all(statuses[m] == MigrationStatus.APPLIED for m in to_squash):
-        client.squash_migrations(to_squash, squashed_migration)
-        client.connection.commit()
-        write_line("Migrations marked as squashed in the database.")
-        write_line(f"Squashed migration {squashed_migration.name} applied in the database.")
 
-    client.changelog.migrations = [m for m in client.changelog.migrations if m.name not in to_squash]
-    save_changelog_file(client.changelog)
-    write_line("Changelog file updated")
+def cmd_template(
+    client: PsqlClient,
+    template_name: str,
+    clone: str | None = None,
+    force: bool = False,
+) -> int:
+    digest = compute_changelog_digest(client.changelog, client.migrations_dir)
+
+    with template_lock(client, template_name):
+        if force or get_template_digest(client, template_name) != digest:
+            write_line(f"Building template database: {template_name}")
+            with build_template(client, template_name, digest) as template_client:
+                cmd_run(template_client)
+            write_line(f"Template database {template_name} built for digest {digest}")
+        else:
+            write_line(f"Template database {template_name} is up to date.")
+
+        if clone:
+            clone_template(client, template_name, clone)
+            write_line(f"Database {clone} cloned from {template_name}")
 
     return 0
 
 
-def cmd_show(client: SqlClient, list_mode: bool = False, validate_sql: bool = False) -> int:
-    migrations = build_migrations_tree(client.changelog)
+def cmd_show(
+    client: SqlClient,
+    list_mode: bool = False,
+    validate_sql: bool = False,
+    output_format: str = "text",
+    collapse: int | None = None,
+) -> int:
     status_map = client.retrieve_migration_statuses()
-    status_count = {status: 0 for status in MigrationStatus}
+    record_statuses(status_map)
+    with timed("planning"):
+        migrations = build_migrations_tree(client.changelog, status_map)
+
+    if output_format in ("json", "ndjson"):
+        index = client.migrations_index
+        extra: dict[str, Any] = {"orphans": index.orphans, "missing": index.missing}
+        if validate_sql:
+            errors = [(m.name, client.validate_sql_syntax(m)) for m in client.changelog.migrations]
+            extra["sql_errors"] = [{"migration": name, "error": str(err[0])} for name, err in errors if err]
+            extra["lint"] = [
+                {"migration": f.path.name, "line": f.line, "rule": f.rule, "message": f.message}
+                for f in _lint_migrations(client.migrations_dir, _pending_migrations(client, status_map))
+            ]
+        with timed("render"):
+            print_json(migrations, status_map, ndjson=output_format == "ndjson", extra=extra)
+        return 0
 
+    status_count = {status: 0 for status in MigrationStatus}
     for status in status_map.values():
         status_count[status] += 1
 
@@ -185,10 +571,11 @@ def cmd_show(client: SqlClient, list_mode: bool = False, validate_sql: bool = Fa
     write_line(f"{'Migration File':<40} | {'Status'}")
     write_line("-" * 60)
 
-    if list_mode:
-        print_list(migrations, status_map)
-    else:
-        print_dag(next(iter(migrations)), migrations, status_map)
+    with timed("render"):
+        if list_mode:
+            print_list(migrations)
+        else:
+            print_dag(migrations, collapse=collapse)
 
     write_line("\nSummary:")
     for status, label in {
@@ -198,6 +585,7 @@ def cmd_show(client: SqlClient, list_mode: bool = False, validate_sql: bool = Fa
         MigrationStatus.CONFLICT: "Conflict",
     }.items():
         write_line(f"  {label:<12}: {STATUS_COLORS[status]}{status_count[status]}{STATUS_COLORS['reset']}")
+    _report_migration_files(client)
 
     if validate_sql:
         write_line("\nValidating SQL migrations...")
@@ -208,4 +596,94 @@ def cmd_show(client: SqlClient, list_mode: bool = False, validate_sql: bool = Fa
                 msg = "\nSQL validation failed. Please fix the errors above."
                 pretty_print_sql_error(err[0], err[1])
         write_line(msg)
+
+        # applied migrations cannot be changed anymore, only lint the ones still to run
+        findings = _lint_migrations(client.migrations_dir, _pending_migrations(client, status_map))
+        for finding in findings:
+            write_line(f"{finding.location}: {finding.rule}: {finding.message}")
+        if findings:
+            write_line(f"Lint found {len(findings)} issues in pending migrations, see `migrateit lint`.")
     return 0
+
+
+def cmd_drift(client: SqlClient, accept: bool = False) -> int:
+    """
+    Compare the live schema with the fingerprint recorded after the last run.
+    Args:
+        client: The SQL client.
+        accept: Record the live schema instead, i.e. after a hotfix made by hand was added to a migration.
+    Returns:
+        1 if objects were created, dropped or changed outside of the migrations, 0 otherwise.
+    """
+    if accept:
+        fingerprint = fingerprint_schema(client.retrieve_schema_objects())
+        client.save_schema_fingerprint(fingerprint)
+        client.connection.commit()
+        write_line(f"Recorded the live schema, {len(fingerprint)} schema objects.")
+        return 0
+
+    recorded = client.retrieve_schema_fingerprint()
+    if recorded is None:
+        write_line("No schema fingerprint recorded yet, it is recorded by the next migrate.")
+        return 0
+
+    drift = compare_fingerprints(recorded, fingerprint_schema(client.retrieve_schema_objects()))
+    if not drift:
+        write_line(f"No drift found in {len(recorded)} schema objects.")
+        return 0
+
+    write_line("Schema changed outside of the migrations since the last run:")
+    for label, keys in (("+", drift.added), ("-", drift.removed), ("~", drift.changed)):
+        for key in keys:
+            write_line(f"  {label} {key}")
+    write_line(f"{len(drift.added)} added, {len(drift.removed)} removed, {len(drift.changed)} changed.")
+    return 1
+
+
+def cmd_check(client: SqlClient) -> int:
+    """
+    Tell if the database has every migration of the changelog applied, without reading the migration files.
+    Returns:
+        CHECK_UP_TO_DATE (also when the database is ahead of the changelog), CHECK_BEHIND if only migrations of the
+        changelog are missing or CHECK_DIVERGED if the database has migrations the changelog does not know about.
+    """
+    names = [m.name for m in client.changelog.migrations]
+    with timed("status_query"):
+        stored = client.retrieve_changelog_digest()
+    if stored is not None:
+        digest, applied_count = stored
+        if digest == compute_names_digest(names):
+            write_line(f"Database is up to date ({applied_count} migrations applied).")
+            return CHECK_UP_TO_DATE
+        # most of the time the database is missing the last migrations of the changelog
+        if applied_count < len(names) and digest == compute_names_digest(names[:applied_count]):
+            write_line(f"Database is behind: {len(names) - applied_count} migrations pending.")
+            return CHECK_BEHIND
+
+    # the applied set is not a prefix of the changelog (or the digest was never recorded), compare the names
+    applied = {name for name, _ in client.retrieve_applied_migrations()}
+    pending = [name for name in names if name not in applied]
+    unknown = applied.difference(names)
+    if not pending:
+        if unknown:
+            write_line(f"Database is ahead of the changelog: {len(unknown)} migrations unknown to this changelog.")
+        else:
+            write_line(f"Database is up to date ({len(applied)} migrations applied).")
+        return CHECK_UP_TO_DATE
+    if not unknown:
+        write_line(f"Database is behind: {len(pending)} migrations pending.")
+        return CHECK_BEHIND
+    write_line(f"Database diverged from the changelog: {', '.join(sorted(unknown))} not in the changelog.")
+    return CHECK_DIVERGED
+
+
+def _pending_migrations(client: SqlClient, status_map: dict[str, MigrationStatus]) -> list[Migration]:
+    return [m for m in client.changelog.migrations if status_map.get(m.name) == MigrationStatus.NOT_APPLIED]
+
+
+def _report_migration_files(client: SqlClient) -> None:
+    index = client.migrations_index
+    if index.orphans:
+        write_line(f"\nMigration files not in the changelog: {', '.join(index.orphans)}")
+    if index.missing:
+        write_line(f"\nChangelog migrations without a file: {', '.join(index.missing)}")
@@ -1,3 +1,6 @@
 from ._client import SqlClient as SqlClient
 from ._protocol import SqlClientProtocol as SqlClientProtocol
+from ._registry import get_client_class as get_client_class
+from ._registry import register_client as register_client
 from .psql import PsqlClient as PsqlClient
+from .sqlite import SqliteClient as SqliteClient
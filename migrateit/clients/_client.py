@@ -1,9 +1,20 @@
 import os
-from abc import ABC
+from abc import ABC, abstractmethod
 from pathlib import Path
 
 from migrateit.clients._protocol import SqlClientProtocol
-from migrateit.models import ChangelogFile, MigrateItConfig
+from migrateit.metrics import timed
+from migrateit.models import ChangelogFile, MigrateItConfig, Migration, MigrationsIndex, MigrationStatus
+from migrateit.reporters import logger
+from migrateit.tree import (
+    EMPTY_NAMES_DIGEST,
+    MERKLE_DEPTH,
+    build_merkle_tree,
+    hash_migration,
+    merkle_bucket,
+    merkle_children,
+    scan_migrations_directory,
+)
 
 
 class SqlClient[T](ABC, SqlClientProtocol):
@@ -16,11 +27,34 @@ class SqlClient[T](ABC, SqlClientProtocol):
 
     connection: T
     config: MigrateItConfig
+    _migrations_index: MigrationsIndex | None = None
+    # (file hash, database hash) of the conflicts found by the last status retrieval
+    _conflict_hashes: dict[str, tuple[str, str]]
 
     @property
     def table_name(self) -> str:
         return self.config.table_name
 
+    @property
+    def digest_table_name(self) -> str:
+        # single row table with the digest of the migration names in the migrations table
+        return f"{self.table_name}_digest"
+
+    @property
+    def fingerprint_table_name(self) -> str:
+        # hash of each schema object after the last run, see `migrateit drift`
+        return f"{self.table_name}_fingerprint"
+
+    @property
+    def merkle_table_name(self) -> str:
+        # digest of each node of the Merkle tree of the migrations table, see `build_merkle_tree`
+        return f"{self.table_name}_merkle"
+
+    @property
+    def internal_tables(self) -> list[str]:
+        # migrateit bookkeeping, left out of the schema fingerprint
+        return [self.table_name, self.digest_table_name, self.fingerprint_table_name, self.merkle_table_name]
+
     @property
     def migrations_dir(self) -> Path:
         return self.config.migrations_dir
@@ -29,6 +63,12 @@ class SqlClient[T](ABC, SqlClientProtocol):
     def changelog(self) -> ChangelogFile:
         return self.config.changelog
 
+    @property
+    def migrations_index(self) -> MigrationsIndex:
+        if self._migrations_index is None or self._migrations_index.directory != self.migrations_dir:
+            self._migrations_index = scan_migrations_directory(self.migrations_dir, self.changelog)
+        return self._migrations_index
+
     def __init__(self, connection: T, config: MigrateItConfig):
         if connection is None:
             raise ValueError("Database connection cannot be None")
@@ -37,6 +77,7 @@ class SqlClient[T](ABC, SqlClientProtocol):
 
         self.connection = connection
         self.config = config
+        self._conflict_hashes = {}
 
     @staticmethod
     def validate_config(config: MigrateItConfig) -> None:
@@ -53,3 +94,143 @@ class SqlClient[T](ABC, SqlClientProtocol):
             raise ValueError("Migrations directory is required")
         if not config.changelog.path:
             raise ValueError("Migrations file is required")
+
+    def _get_migration_path(self, migration: Migration) -> Path:
+        if not migration.name.endswith(".sql") or self.migrations_index.stat(migration.name) is None:
+            raise FileNotFoundError(f"Migration file {migration.name} does not exist or is not a valid SQL file")
+        return self.migrations_dir / migration.name
+
+    def validate_migrations(self, status_map: dict[str, MigrationStatus]) -> None:
+        if len(self.changelog.migrations) == 0:
+            return
+
+        if not self.changelog.migrations[0].initial:
+            raise ValueError("Initial migration is not defined in the changelog")
+        if len([m for m in self.changelog.migrations if m.initial]) > 1:
+            raise ValueError("Multiple initial migrations found in the changelog")
+
+        # check removed migrations
+        removed_migrations = [m for m, s in status_map.items() if s == MigrationStatus.REMOVED]
+        if removed_migrations:
+            raise ValueError(f"Removed migrations found in the database: {removed_migrations}. ")
+
+        # check conflict migrations
+        conflict_migrations = [m for m, s in status_map.items() if s == MigrationStatus.CONFLICT]
+        if conflict_migrations:
+            missing = [m for m in conflict_migrations if m not in self._conflict_hashes]
+            if missing:
+                database_hashes = self._get_database_hashes(missing)
+                for name in missing:
+                    file_hash = self._get_file_hash(self.migrations_dir / name)
+                    self._conflict_hashes[name] = (file_hash, database_hashes.get(name, ""))
+            raise ValueError(
+                "Migrations with a different hash in the database: "
+                + ", ".join(
+                    f"{name} (found={self._conflict_hashes[name][0]} existing={self._conflict_hashes[name][1]})"
+                    for name in conflict_migrations
+                )
+            )
+
+        # check for each migration all the parents are applied
+        for migration in self.changelog.migrations:
+            if status_map[migration.name] != MigrationStatus.APPLIED:
+                continue
+            for parent in migration.parents:
+                if status_map[parent] != MigrationStatus.APPLIED:
+                    raise ValueError(f"Migration {migration.name} is applied before its parent {parent}.")
+
+    def _build_migration_statuses(self) -> dict[str, MigrationStatus]:
+        """
+        Compare the migrations table with the changelog and files.
+        The local Merkle tree assumes every migration with a file is applied, only the subtrees whose digest differs
+        from the one kept in the database are descended (a query per level) and only the rows of the differing
+        leaves are read. Without a tree in the database every row is compared.
+        """
+        self._conflict_hashes = {}
+        if not self.is_migrations_table_created():
+            return {m.name: MigrationStatus.NOT_APPLIED for m in self.changelog.migrations}
+
+        with timed("hash_check"):
+            file_hashes = {
+                m.name: self._get_file_hash(self.migrations_dir / m.name)
+                for m in self.changelog.migrations
+                if self.migrations_index.stat(m.name) is not None
+            }
+        local_tree = build_merkle_tree(file_hashes.items())
+
+        nodes, remote_tree = [""], {}
+        with timed("status_query"):
+            for depth in range(MERKLE_DEPTH + 1):
+                remote_nodes = self._get_merkle_nodes(nodes)
+                if remote_nodes is None:
+                    return self._compare_migration_rows(self.retrieve_applied_migrations(), file_hashes)
+                remote_tree.update(remote_nodes)
+                nodes = [
+                    n for n in nodes if remote_nodes.get(n, EMPTY_NAMES_DIGEST) != local_tree.get(n, EMPTY_NAMES_DIGEST)
+                ]
+                if not nodes:
+                    break
+                if depth < MERKLE_DEPTH:
+                    nodes = [child for n in nodes for child in merkle_children(n)]
+            buckets = set(nodes)
+            candidates = {name for name in file_hashes if merkle_bucket(name) in buckets}
+            rows = self._get_database_hashes(list(candidates)) if candidates else {}
+
+        # rows left out of the changelog or without a file also change their leaf, they need every row
+        found_tree = build_merkle_tree(rows.items())
+        if any(found_tree.get(b, EMPTY_NAMES_DIGEST) != remote_tree.get(b, EMPTY_NAMES_DIGEST) for b in buckets):
+            return self._compare_migration_rows(self.retrieve_applied_migrations(), file_hashes)
+
+        migrations = {m.name: MigrationStatus.NOT_APPLIED for m in self.changelog.migrations}
+        for name, file_hash in file_hashes.items():
+            if name not in candidates:
+                migrations[name] = MigrationStatus.APPLIED
+            elif name in rows:
+                migrations[name] = self._compare_migration_hash(name, file_hash, rows[name])
+        return migrations
+
+    def _compare_migration_rows(
+        self, rows: list[tuple[str, str]], file_hashes: dict[str, str]
+    ) -> dict[str, MigrationStatus]:
+        migrations = {m.name: MigrationStatus.NOT_APPLIED for m in self.changelog.migrations}
+        for migration_name, change_hash in rows:
+            if migration_name not in migrations:
+                # migration applied not in changelog
+                migrations[migration_name] = MigrationStatus.REMOVED
+                continue
+
+            migration_hash = file_hashes.get(migration_name)
+            if migration_hash is None:
+                with timed("hash_check"):
+                    migration_hash = self._get_file_hash(self.migrations_dir / migration_name)
+            migrations[migration_name] = self._compare_migration_hash(migration_name, migration_hash, change_hash)
+        return migrations
+
+    def _compare_migration_hash(self, migration_name: str, migration_hash: str, change_hash: str) -> MigrationStatus:
+        if migration_hash == change_hash:
+            return MigrationStatus.APPLIED
+        logger.warning(
+            f"Missmatch for migration {migration_name}. "
+            f"Migration hash is '{migration_hash}' but '{change_hash}' was found."
+        )
+        # kept for validate_migrations to report them without hashing the files or querying the rows again
+        self._conflict_hashes[migration_name] = (migration_hash, change_hash)
+        return MigrationStatus.CONFLICT
+
+    @abstractmethod
+    def _get_merkle_nodes(self, nodes: list[str]) -> dict[str, str] | None:
+        """
+        Retrieve the digests of the given nodes of the Merkle tree of the migrations table in a single query, the
+        empty ones may be left out. None if the database has no tree yet.
+        """
+        ...
+
+    @abstractmethod
+    def _get_database_hashes(self, migration_names: list[str]) -> dict[str, str]:
+        """
+        Retrieve the hashes of the given migrations in a single query, the ones not applied are left out.
+        """
+        ...
+
+    def _get_file_hash(self, path: Path) -> str:
+        return hash_migration(path)
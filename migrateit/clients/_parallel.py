@@ -0,0 +1,105 @@
+import contextlib
+import re
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from psycopg2.extensions import connection as Connection
+
+from migrateit.reporters import write_line
+from migrateit.tree import split_sql_statements
+
+# statements that only take a SHARE UPDATE EXCLUSIVE lock on their table and run outside of a transaction block,
+# the ones on different tables can run at the same time without blocking each other or the application
+_PARALLEL_STATEMENT_PATTERN = re.compile(
+    r"^(?:CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(?:[\w\"]+\s+)?ON\s+(?:ONLY\s+)?"
+    r"(?P<index_table>[\w.\"]+)"
+    r"|ALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?(?:ONLY\s+)?(?P<table>[\w.\"]+)\s+VALIDATE\s+CONSTRAINT\s+[\w\"]+\s*;?$)",
+    re.I,
+)
+# `-- migrateit: parallel` on the line before a statement lets it run with its neighbours even if not detected
+_PARALLEL_MARK_PATTERN = re.compile(r"--\s*migrateit:\s*parallel\b", re.I)
+
+
+@dataclass(frozen=True, slots=True)
+class ParallelStatement:
+    sql: str
+    table: str | None = None
+
+
+def group_parallel_statements(sql: str) -> list[str | list[ParallelStatement]]:
+    """
+    Split SQL into its statements, grouping the consecutive ones that can run at the same time.
+    Args:
+        sql: The SQL to split.
+    Returns:
+        The statements in file order, the groups of at least two independent statements as lists.
+    """
+    lines = sql.splitlines()
+    items: list[str | list[ParallelStatement]] = []
+    group: list[ParallelStatement] = []
+
+    def flush() -> None:
+        if len(group) > 1:
+            items.append(list(group))
+        else:
+            items.extend(s.sql for s in group)
+        group.clear()
+
+    for line, statement in split_sql_statements(sql):
+        match = _PARALLEL_STATEMENT_PATTERN.match(statement)
+        if match:
+            table = (match["index_table"] or match["table"]).replace('"', "").lower()
+            group.append(ParallelStatement(statement, table))
+        elif any(_PARALLEL_MARK_PATTERN.search(text) for text in lines[max(line - 2, 0) : line]):
+            group.append(ParallelStatement(statement))
+        else:
+            flush()
+            items.append(statement)
+    flush()
+    return items
+
+
+def run_parallel_statements(
+    open_connection: Callable[[], Connection],
+    statements: list[ParallelStatement],
+    max_connections: int,
+) -> None:
+    """
+    Run independent statements on a bounded pool of extra autocommit connections.
+    The statements on the same table run one after the other on the same connection, as they would lock each other.
+    Once a statement fails no other one is started, the running ones finish and the first error is raised.
+    Args:
+        open_connection: Opens a new connection to the database.
+        statements: The statements to run.
+        max_connections: The maximum number of connections used at the same time.
+    """
+    lanes: dict[str | int, list[str]] = {}
+    for i, statement in enumerate(statements):
+        lanes.setdefault(statement.table if statement.table is not None else i, []).append(statement.sql)
+
+    failed = False
+
+    def run_lane(lane: list[str]) -> None:
+        if failed:
+            return
+        with contextlib.closing(open_connection()) as conn:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                for sql in lane:
+                    if failed:
+                        return
+                    cursor.execute(sql)
+
+    workers = min(max_connections, len(lanes))
+    write_line(f"\tRunning {len(statements)} statements on {workers} connections")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="migrateit-ddl") as executor:
+        futures = [executor.submit(run_lane, lane) for lane in lanes.values()]
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        failed = any(f.exception() for f in done)
+    for future in futures:
+        if error := future.exception():
+            raise error
+    write_line(f"\tFinished {len(statements)} statements in {time.perf_counter() - started:.2f}s")
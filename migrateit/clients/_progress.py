@@ -0,0 +1,132 @@
+import contextlib
+import threading
+import time
+from collections.abc import Callable, Generator
+from dataclasses import dataclass
+
+from psycopg2 import Error as PsycopgError
+from psycopg2.extensions import connection as Connection
+
+from migrateit.reporters import logger, write_line
+
+# CLUSTER and VACUUM FULL only report heap blocks and written tuples
+PROGRESS_QUERY = """
+SELECT command, phase, blocks_done, blocks_total, tuples_done, tuples_total
+FROM pg_stat_progress_create_index WHERE pid = %(pid)s
+UNION ALL
+SELECT command, phase, heap_blks_scanned, heap_blks_total, heap_tuples_written, 0
+FROM pg_stat_progress_cluster WHERE pid = %(pid)s;
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class Progress:
+    command: str
+    phase: str
+    blocks_done: int
+    blocks_total: int
+    tuples_done: int
+    tuples_total: int
+
+    @property
+    def fraction(self) -> float | None:
+        if self.blocks_total:
+            return self.blocks_done / self.blocks_total
+        if self.tuples_total:
+            return self.tuples_done / self.tuples_total
+        return None
+
+
+def estimate_eta(start: Progress, start_time: float, current: Progress, now: float) -> float | None:
+    """
+    Estimate the seconds left for the current phase assuming the rate since the phase started is kept.
+    Returns:
+        The seconds left or None if there is not enough information yet.
+    """
+    if start.phase != current.phase or start.fraction is None or current.fraction is None:
+        return None
+    done = current.fraction - start.fraction
+    if done <= 0 or now <= start_time:
+        return None
+    return (now - start_time) * (1 - current.fraction) / done
+
+
+def render_progress(progress: Progress, eta: float | None) -> str:
+    parts = [f"\t{progress.command}: {progress.phase}"]
+    if progress.blocks_total:
+        parts.append(f"blocks {progress.blocks_done}/{progress.blocks_total} ({progress.fraction:.1%})")
+    if progress.tuples_done or progress.tuples_total:
+        total = f"/{progress.tuples_total}" if progress.tuples_total else ""
+        parts.append(f"tuples {progress.tuples_done}{total}")
+    if eta is not None:
+        minutes, seconds = divmod(round(eta), 60)
+        parts.append(f"ETA {minutes}m{seconds:02d}s")
+    return " | ".join(parts)
+
+
+class ProgressMonitor(threading.Thread):
+    """
+    Poll the progress views for a backend from a separate connection and report it while a migration runs.
+    The connection is only opened once the first interval elapses, so quick migrations never pay for it.
+    """
+
+    def __init__(self, connect: Callable[[], Connection], pid: int, interval: float) -> None:
+        super().__init__(name="migrateit-progress", daemon=True)
+        self.connect = connect
+        self.pid = pid
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def run(self) -> None:
+        if self._stop_event.wait(self.interval):
+            return
+        try:
+            with contextlib.closing(self.connect()) as conn:
+                conn.autocommit = True
+                self._poll(conn)
+        except PsycopgError as e:
+            # progress is informative only, never break the migration because of it
+            logger.debug(f"Progress reporting stopped: {e}")
+
+    def _poll(self, conn: Connection) -> None:
+        start: tuple[Progress, float] | None = None
+        last: Progress | None = None
+        with conn.cursor() as cursor:
+            while True:
+                cursor.execute(PROGRESS_QUERY, {"pid": self.pid})
+                row = cursor.fetchone()
+                now = time.monotonic()
+                if row:
+                    progress = Progress(*row)
+                    if not start or start[0].phase != progress.phase:
+                        start = (progress, now)
+                    if progress != last:
+                        write_line(render_progress(progress, estimate_eta(*start, progress, now)))
+                    last = progress
+                if self._stop_event.wait(self.interval):
+                    return
+
+
+@contextlib.contextmanager
+def progress_monitor(connect: Callable[[], Connection], pid: int, interval: float) -> Generator[None]:
+    """
+    Report the progress of long index builds and table rewrites of the given backend while the block runs.
+    Args:
+        connect: Opens the connection used to poll the progress views.
+        pid: The backend PID running the migration.
+        interval: Seconds between polls, 0 disables the reporting.
+    """
+    if interval <= 0:
+        yield
+        return
+
+    monitor = ProgressMonitor(connect, pid, interval)
+    monitor.start()
+    try:
+        yield
+    finally:
+        monitor.stop()
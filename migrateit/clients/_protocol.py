@@ -1,6 +1,4 @@
-from typing import Protocol
-
-from psycopg2 import ProgrammingError
+from typing import Any, Protocol
 
 from migrateit.models import Migration, MigrationStatus
 
@@ -16,6 +14,16 @@ class SqlClientProtocol(Protocol):
         """
         ...
 
+    @classmethod
+    def connect(cls) -> Any:
+        """
+        Open a connection to the database configured in the environment variables, outside autocommit mode.
+
+        Returns:
+            The database connection.
+        """
+        ...
+
     @classmethod
     def create_migrations_table_str(cls, table_name: str) -> tuple[str, str]:
         """
@@ -50,6 +58,49 @@ class SqlClientProtocol(Protocol):
         """
         ...
 
+    def acquire_migrations_lock(self, session: bool = False) -> None:
+        """
+        Block until no other migrateit process is changing the migrations.
+
+        Args:
+            session: If True, hold the lock until release_migrations_lock is called instead of until the
+                transaction ends, for runs committing more than once.
+        """
+        ...
+
+    def release_migrations_lock(self) -> None:
+        """
+        Release the session migrations lock.
+        """
+        ...
+
+    def retrieve_applied_migrations(self) -> list[tuple[str, str]]:
+        """
+        Retrieve the applied migrations in a single query.
+        Returns:
+            The (migration name, change hash) rows of the migrations table, empty if it does not exist yet.
+        """
+        ...
+
+    def retrieve_changelog_digest(self) -> tuple[str, int] | None:
+        """
+        Retrieve the digest of the migration names in the migrations table, kept up to date on every apply and
+        rollback, in a single query.
+        Returns:
+            The digest (see compute_names_digest) and the number of applied migrations, None if migrateit did not
+            record it yet.
+        """
+        ...
+
+    def retrieve_status_marker(self) -> str | None:
+        """
+        Retrieve a marker of the migrations table from the single row of the digest table, in a single query.
+        It changes whenever a migration is applied, rolled back or has its hash updated.
+        Returns:
+            The marker, None if migrateit did not record the digest yet.
+        """
+        ...
+
     def retrieve_migration_statuses(self) -> dict[str, MigrationStatus]:
         """
         Retrieve the migrations from the database.
@@ -58,7 +109,33 @@ class SqlClientProtocol(Protocol):
         """
         ...
 
-    def apply_migration(self, migration: Migration, is_fake: bool = False, is_rollback: bool = False) -> None:
+    def retrieve_schema_objects(self) -> dict[str, str]:
+        """
+        Retrieve the tables, columns, indexes and constraints of the live schema from the catalog, leaving out the
+        migrateit tables.
+        Returns:
+            The definition of each object by its key (i.e. "column public.users.email").
+        """
+        ...
+
+    def retrieve_schema_fingerprint(self) -> dict[str, str] | None:
+        """
+        Retrieve the schema fingerprint recorded after the last run.
+        Returns:
+            The hash of each schema object by its key, None if no fingerprint was recorded yet.
+        """
+        ...
+
+    def save_schema_fingerprint(self, fingerprint: dict[str, str]) -> None:
+        """
+        Replace the recorded schema fingerprint.
+
+        Args:
+            fingerprint: The hash of each schema object by its key.
+        """
+        ...
+
+    def apply_migration(self, migration: Migration, is_fake: bool = False, is_rollback: bool = False) -> int:
         """
         Apply a migration to the database.
 
@@ -66,6 +143,9 @@ class SqlClientProtocol(Protocol):
             migration: The migration object to apply.
             fake: If True, apply the migration without executing it.
             undo: If True, apply the reverse of the migration.
+
+        Returns:
+            The number of rows affected by the migration statements.
         """
         ...
 
@@ -100,7 +180,7 @@ class SqlClientProtocol(Protocol):
         """
         ...
 
-    def validate_sql_syntax(self, migration: Migration) -> tuple[ProgrammingError, str] | None:
+    def validate_sql_syntax(self, migration: Migration) -> tuple[Exception, str] | None:
         """
         Validate the SQL syntax of a migration.
 
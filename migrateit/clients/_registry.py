@@ -0,0 +1,30 @@
+from collections.abc import Callable
+
+from migrateit.clients._client import SqlClient
+from migrateit.models import SupportedDatabase
+
+_CLIENTS: dict[SupportedDatabase, type[SqlClient]] = {}
+
+
+def register_client[C: type[SqlClient]](database: SupportedDatabase) -> Callable[[C], C]:
+    """
+    Class decorator registering the client used for the given database.
+    """
+
+    def decorator(client: C) -> C:
+        _CLIENTS[database] = client
+        return client
+
+    return decorator
+
+
+def get_client_class(database: SupportedDatabase) -> type[SqlClient]:
+    """
+    Get the client registered for the given database.
+    Raises:
+        NotImplementedError: If no client is registered for it.
+    """
+    try:
+        return _CLIENTS[database]
+    except KeyError:
+        raise NotImplementedError(f"Database {database} is not supported") from None
@@ -0,0 +1,82 @@
+import time
+from dataclasses import dataclass
+
+from psycopg2.extensions import connection as Connection
+
+from migrateit.metrics import timed
+from migrateit.reporters import write_line
+
+# lag of the slowest streaming replica, replay_lag is NULL once a replica caught up with an idle primary. Other roles
+# than superusers need pg_monitor to see the lag columns, without it nothing is throttled.
+REPLICATION_LAG_QUERY = """
+SELECT COALESCE(EXTRACT(EPOCH FROM MAX(replay_lag)), 0)::float,
+    COALESCE(MAX(pg_wal_lsn_diff(pg_current_wal_lsn(), replay_lsn)), 0)::bigint
+FROM pg_stat_replication;
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class ReplicationLag:
+    seconds: float
+    bytes: int
+
+    def __str__(self) -> str:
+        return f"{self.seconds:.1f}s / {self.bytes} bytes"
+
+    def exceeds(self, max_seconds: float, max_bytes: int) -> bool:
+        return bool(max_seconds and self.seconds > max_seconds) or bool(max_bytes and self.bytes > max_bytes)
+
+
+def get_replication_lag(connection: Connection) -> ReplicationLag:
+    with connection.cursor() as cursor:
+        cursor.execute(REPLICATION_LAG_QUERY)
+        row = cursor.fetchone()
+    assert row is not None  # an aggregate always returns a row
+    seconds, lag_bytes = row
+    return ReplicationLag(seconds=float(seconds), bytes=int(lag_bytes))
+
+
+class ReplicationThrottle:
+    """
+    Pause a migration while its streaming replicas are too far behind, so they keep serving fresh reads.
+    The lag is checked at most once per interval, between statements committed on their own and between the chunks of
+    online changes.
+    """
+
+    def __init__(self, connection: Connection, max_lag: float = 0, max_lag_bytes: int = 0, interval: float = 1):
+        self.connection = connection
+        self.max_lag = max_lag
+        self.max_lag_bytes = max_lag_bytes
+        self.interval = interval
+        self.throttled = 0.0
+        self._checked: float | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_lag or self.max_lag_bytes)
+
+    def wait(self) -> float:
+        """
+        Block until the replication lag is back under the limits.
+        Returns:
+            The seconds spent waiting.
+        """
+        if not self.enabled or (self._checked is not None and time.monotonic() - self._checked < self.interval):
+            return 0.0
+
+        lag = get_replication_lag(self.connection)
+        self._checked = time.monotonic()
+        if not lag.exceeds(self.max_lag, self.max_lag_bytes):
+            return 0.0
+
+        write_line(f"\tReplication lag {lag} over the limit, pausing until the replicas catch up")
+        started = time.monotonic()
+        with timed("replication_throttle"):
+            while lag.exceeds(self.max_lag, self.max_lag_bytes):
+                time.sleep(self.interval)
+                lag = get_replication_lag(self.connection)
+        self._checked = time.monotonic()
+        waited = self._checked - started
+        self.throttled += waited
+        write_line(f"\tReplicas caught up after {waited:.1f}s")
+        return waited
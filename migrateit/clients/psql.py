@@ -1,19 +1,104 @@
-import hashlib
+import contextlib
 import os
 import re
+import time
+from collections.abc import Generator
 from pathlib import Path
 from typing import override
 
-from psycopg2 import DatabaseError, ProgrammingError
+import psycopg2
+from psycopg2 import DatabaseError, ProgrammingError, errors
 from psycopg2.extensions import connection as Connection
+from psycopg2.extensions import cursor as Cursor
+from psycopg2.extensions import make_dsn
+from psycopg2.extras import execute_values
 
+import migrateit.constants as C
 from migrateit.clients._client import SqlClient
-from migrateit.models import Migration, MigrationStatus
-from migrateit.reporters import write_line
-from migrateit.tree import ROLLBACK_SPLIT_TAG, build_migrations_tree
-
-
+from migrateit.clients._parallel import ParallelStatement, group_parallel_statements, run_parallel_statements
+from migrateit.clients._progress import progress_monitor
+from migrateit.clients._registry import register_client
+from migrateit.clients._throttle import ReplicationThrottle
+from migrateit.metrics import timed
+from migrateit.models import Migration, MigrationStatus, OnlineAlter, SupportedDatabase
+from migrateit.online import clear_online_alters, online_state_table, run_online_alter
+from migrateit.reporters import logger, write_line
+from migrateit.rewrite import rewrite_sql
+from migrateit.tree import (
+    build_merkle_tree,
+    compute_names_digest,
+    open_copy_block,
+    read_migration_segments,
+    split_sql_statements,
+    toggle_merkle_nodes,
+)
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# one round trip for every object of the user schemas, keyed by kind and qualified name
+_SCHEMA_OBJECTS_QUERY = """
+WITH relations AS (
+    SELECT c.oid, c.relkind, n.nspname || '.' || c.relname AS name
+    FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind IN ('r', 'p', 'v', 'm', 'f')
+        AND n.nspname <> 'information_schema' AND n.nspname NOT LIKE 'pg\\_%%'
+        -- resolved like the unquoted names the tables are created with (i.e. folded to lower case)
+        AND c.oid NOT IN (SELECT to_regclass(t) FROM unnest(%(excluded)s::text[]) t WHERE to_regclass(t) IS NOT NULL)
+)
+SELECT 'table ' || r.name,
+    r.relkind::text || CASE WHEN r.relkind IN ('v', 'm') THEN ' ' || pg_get_viewdef(r.oid) ELSE '' END
+FROM relations r
+UNION ALL
+SELECT 'column ' || r.name || '.' || a.attname,
+    format_type(a.atttypid, a.atttypmod) || CASE WHEN a.attnotnull THEN ' NOT NULL' ELSE '' END
+        || COALESCE(' DEFAULT ' || pg_get_expr(d.adbin, d.adrelid), '')
+FROM relations r
+JOIN pg_attribute a ON a.attrelid = r.oid AND a.attnum > 0 AND NOT a.attisdropped
+LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+UNION ALL
+SELECT 'index ' || n.nspname || '.' || i.relname,
+    pg_get_indexdef(i.oid) || CASE WHEN x.indisvalid THEN '' ELSE ' INVALID' END
+FROM relations r
+JOIN pg_index x ON x.indrelid = r.oid
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_namespace n ON n.oid = i.relnamespace
+UNION ALL
+SELECT 'constraint ' || r.name || '.' || k.conname, pg_get_constraintdef(k.oid)
+FROM relations r
+JOIN pg_constraint k ON k.conrelid = r.oid;
+"""
+
+
+@register_client(SupportedDatabase.POSTGRES)
 class PsqlClient(SqlClient[Connection]):
+    # seconds between progress reports of long index builds and table rewrites, 0 disables them
+    progress_interval: float = C.MIGRATEIT_PROGRESS_INTERVAL
+    # throttling of the online schema changes (\online_alter directives)
+    online_chunk_size: int = C.MIGRATEIT_ONLINE_CHUNK_SIZE
+    online_chunk_sleep: float = C.MIGRATEIT_ONLINE_CHUNK_SLEEP
+    online_lock_timeout: str = C.MIGRATEIT_ONLINE_LOCK_TIMEOUT
+    # rewrite lock-heavy DDL into its low-lock equivalent when applying, needs each statement to commit on its own
+    rewrite_ddl: bool = False
+    # pause between statements while the streaming replicas lag behind, 0 disables each limit
+    max_replication_lag: float = C.MIGRATEIT_MAX_REPLICATION_LAG
+    max_replication_lag_bytes: int = C.MIGRATEIT_MAX_REPLICATION_LAG_BYTES
+    replication_check_interval: float = C.MIGRATEIT_REPLICATION_CHECK_INTERVAL
+    # extra connections running independent CREATE INDEX CONCURRENTLY and VALIDATE CONSTRAINT statements at the same
+    # time, needs each statement to commit on its own, 0 runs them one after the other
+    parallel_ddl: int = C.MIGRATEIT_PARALLEL_DDL
+    _throttle: ReplicationThrottle | None = None
+
+    @property
+    def throttle(self) -> ReplicationThrottle:
+        if self._throttle is None:
+            self._throttle = ReplicationThrottle(
+                self.connection,
+                max_lag=self.max_replication_lag,
+                max_lag_bytes=self.max_replication_lag_bytes,
+                interval=self.replication_check_interval,
+            )
+        return self._throttle
+
     @override
     @classmethod
     def get_environment_url(cls) -> str:
@@ -29,6 +114,13 @@ class PsqlClient(SqlClient[Connection]):
             raise ValueError("DB_URL environment variable is not set")
         return db_url
 
+    @override
+    @classmethod
+    def connect(cls) -> Connection:
+        conn = psycopg2.connect(cls.get_environment_url())
+        conn.autocommit = False
+        return conn
+
     @override
     @classmethod
     def create_migrations_table_str(cls, table_name: str) -> tuple[str, str]:
@@ -75,63 +167,124 @@ DROP TABLE IF EXISTS {table_name};
             return result[0] if result else False
 
     @override
-    def retrieve_migration_statuses(self) -> dict[str, MigrationStatus]:
-        migrations = {k: MigrationStatus.NOT_APPLIED for k, _ in build_migrations_tree(self.changelog).items()}
+    def acquire_migrations_lock(self, session: bool = False) -> None:
+        lock = "pg_advisory_lock" if session else "pg_advisory_xact_lock"
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT {lock}(hashtext(%s));", (self.table_name,))
+
+    @override
+    def release_migrations_lock(self) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s));", (self.table_name,))
 
+    @override
+    def retrieve_applied_migrations(self) -> list[tuple[str, str]]:
         if not self.is_migrations_table_created():
-            return migrations
+            return []
 
-        with self.connection.cursor() as cursor:
+        with timed("status_query"), self.connection.cursor() as cursor:
             cursor.execute(f"""SELECT migration_name, change_hash FROM {self.table_name}""")
-            rows = cursor.fetchall()
-
-        for row in rows:
-            migration_name, change_hash = row
-            migration = next((m for m in self.changelog.migrations if m.name == migration_name), None)
-            if not migration:
-                # migration applied not in changelog
-                migrations[migration_name] = MigrationStatus.REMOVED
-                continue
+            return cursor.fetchall()
 
-            _, _, migration_hash = self._get_content_hash(self.migrations_dir / migration.name)
-            status = MigrationStatus.APPLIED
-            if migration_hash != change_hash:
-                status = MigrationStatus.CONFLICT
-                write_line(
-                    f"Missmatch for migration {migration_name}. "
-                    f"Migration hash is '{migration_hash}' but '{change_hash}' was found."
-                )
+    @override
+    def retrieve_changelog_digest(self) -> tuple[str, int] | None:
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"""SELECT digest, migrations FROM {self.digest_table_name};""")
+                row = cursor.fetchone()
+        except errors.UndefinedTable:
+            self.connection.rollback()
+            return None
+        return (row[0], row[1]) if row else None
 
-            migrations[migration.name] = status
+    @override
+    def retrieve_status_marker(self) -> str | None:
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s);", (self.digest_table_name,))
+            row = cursor.fetchone()
+            if not row or not row[0]:
+                return None
+            cursor.execute(f"""SELECT digest, migrations, updated_at FROM {self.digest_table_name};""")
+            row = cursor.fetchone()
+        return ":".join(map(str, row)) if row else None
 
-        return migrations
+    @override
+    def retrieve_schema_objects(self) -> dict[str, str]:
+        excluded = [*self.internal_tables, online_state_table(self.table_name)]
+        with timed("catalog_query"), self.connection.cursor() as cursor:
+            cursor.execute(_SCHEMA_OBJECTS_QUERY, {"excluded": excluded})
+            return dict(cursor.fetchall())
+
+    @override
+    def retrieve_schema_fingerprint(self) -> dict[str, str] | None:
+        # checked instead of failing, it is read inside the migration transaction
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s);", (self.fingerprint_table_name,))
+            row = cursor.fetchone()
+            if not row or not row[0]:
+                return None
+            cursor.execute(f"""SELECT object_name, object_hash FROM {self.fingerprint_table_name};""")
+            return dict(cursor.fetchall())
 
     @override
-    def apply_migration(self, migration: Migration, is_fake: bool = False, is_rollback: bool = False) -> None:
-        path = self.migrations_dir / migration.name
-        if not path.is_file() or not path.name.endswith(".sql"):
-            raise FileNotFoundError(f"Migration file {path.name} does not exist or is not a valid SQL file")
+    def save_schema_fingerprint(self, fingerprint: dict[str, str]) -> None:
+        with self._bookkeeping_transaction(), self.connection.cursor() as cursor:
+            cursor.execute(
+                f"""CREATE TABLE IF NOT EXISTS {self.fingerprint_table_name} (
+                    object_name TEXT PRIMARY KEY,
+                    object_hash VARCHAR(64) NOT NULL,
+                    recorded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                );"""
+            )
+            cursor.execute(f"""DELETE FROM {self.fingerprint_table_name};""")
+            execute_values(
+                cursor,
+                f"""INSERT INTO {self.fingerprint_table_name} (object_name, object_hash) VALUES %s;""",
+                list(fingerprint.items()),
+            )
+
+    @override
+    def retrieve_migration_statuses(self) -> dict[str, MigrationStatus]:
+        return self._build_migration_statuses()
+
+    @override
+    def apply_migration(self, migration: Migration, is_fake: bool = False, is_rollback: bool = False) -> int:
+        path = self._get_migration_path(migration)
         if not migration.initial and not (self.is_migration_applied(migration) == is_rollback):
             if is_rollback:
                 raise ValueError(f"Migration {path.name} is not applied, cannot undo it")
             raise ValueError(f"Migration {path.name} is already applied, cannot apply it again")
 
-        migration_code, reverse_migration_code, migration_hash = self._get_content_hash(path)
+        migration_hash = self._get_file_hash(path)
 
+        rows = 0
         try:
             with self.connection.cursor() as cursor:
                 if not is_fake:
-                    cursor.execute(migration_code if not is_rollback else reverse_migration_code)
-                if is_rollback and not migration.initial:
+                    with progress_monitor(
+                        self._open_connection, self.connection.get_backend_pid(), self.progress_interval
+                    ):
+                        rows = self._execute_migration(cursor, path, is_rollback=is_rollback)
+                with self._bookkeeping_transaction():
+                    if is_rollback and not migration.initial:
+                        cursor.execute(
+                            f"""DELETE FROM {self.table_name} where migration_name = %s and change_hash = %s;""",
+                            (os.path.basename(path), migration_hash),
+                        )
+                        if cursor.rowcount > 0:
+                            self._update_merkle_tree(cursor, [(os.path.basename(path), migration_hash)])
+                        clear_online_alters(cursor, online_state_table(self.table_name), path.name)
+                        self._update_changelog_digest(cursor, migration, is_rollback=True)
+                        return rows
                     cursor.execute(
-                        f"""DELETE FROM {self.table_name} where migration_name = %s and change_hash = %s;""",
+                        f"""INSERT INTO {self.table_name} (migration_name, change_hash) VALUES (%s, %s);""",
                         (os.path.basename(path), migration_hash),
                     )
-                    return
-                cursor.execute(
-                    f"""INSERT INTO {self.table_name} (migration_name, change_hash) VALUES (%s, %s);""",
-                    (os.path.basename(path), migration_hash),
-                )
+                    self._update_merkle_tree(
+                        cursor, [(os.path.basename(path), migration_hash)], rebuild=migration.initial
+                    )
+                    self._update_changelog_digest(cursor, migration)
+            return rows
         except (DatabaseError, ProgrammingError) as e:
             self.connection.rollback()
             raise e
@@ -146,59 +299,39 @@ DROP TABLE IF EXISTS {table_name};
 
     @override
     def update_migration_hash(self, migration: Migration) -> None:
-        path = self.migrations_dir / migration.name
-        if not path.is_file() or not path.name.endswith(".sql"):
-            raise FileNotFoundError(f"Migration file {path.name} does not exist or is not a valid SQL file")
+        path = self._get_migration_path(migration)
 
-        _, _, migration_hash = self._get_content_hash(path)
+        migration_hash = self._get_file_hash(path)
 
         with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"""SELECT change_hash FROM {self.table_name} WHERE migration_name = %s FOR UPDATE;""",
+                (os.path.basename(path),),
+            )
+            row = cursor.fetchone()
             cursor.execute(
                 f"""UPDATE {self.table_name} SET change_hash = %s WHERE migration_name = %s;""",
                 (migration_hash, os.path.basename(path)),
             )
-
-    @override
-    def validate_migrations(self, status_map: dict[str, MigrationStatus]) -> None:
-        if len(self.changelog.migrations) == 0:
-            return
-
-        if not self.changelog.migrations[0].initial:
-            raise ValueError("Initial migration is not defined in the changelog")
-        if len([m for m in self.changelog.migrations if m.initial]) > 1:
-            raise ValueError("Multiple initial migrations found in the changelog")
-
-        # check removed migrations
-        removed_migrations = [m for m, s in status_map.items() if s == MigrationStatus.REMOVED]
-        if removed_migrations:
-            raise ValueError(f"Removed migrations found in the database: {removed_migrations}. ")
-
-        # check conflict migrations
-        conflict_migrations = [m for m, s in status_map.items() if s == MigrationStatus.CONFLICT]
-        if conflict_migrations:
-            for conflict_migration in conflict_migrations:
-                path = self.migrations_dir / conflict_migration
-                _, _, migration_hash = self._get_content_hash(path)
-                raise ValueError(
-                    f"Migration {conflict_migration} has a different hash in the database: "
-                    f"found={migration_hash} existing={self._get_database_hash(conflict_migration)}"
+            if row:
+                self._update_merkle_tree(
+                    cursor, [(os.path.basename(path), row[0]), (os.path.basename(path), migration_hash)]
                 )
-
-        # check for each migration all the parents are applied
-        for migration in self.changelog.migrations:
-            if status_map[migration.name] != MigrationStatus.APPLIED:
-                continue
-            for parent in migration.parents:
-                if status_map[parent] != MigrationStatus.APPLIED:
-                    raise ValueError(f"Migration {migration.name} is applied before its parent {parent}.")
+            # the names digest stays the same, the status marker must still change
+            cursor.execute("SELECT to_regclass(%s);", (self.digest_table_name,))
+            row = cursor.fetchone()
+            if row and row[0]:
+                cursor.execute(f"""UPDATE {self.digest_table_name} SET updated_at = clock_timestamp();""")
 
     @override
     def validate_sql_syntax(self, migration: Migration) -> tuple[ProgrammingError, str] | None:
-        path = self.migrations_dir / migration.name
-        if not path.is_file() or not path.name.endswith(".sql"):
-            raise FileNotFoundError(f"Migration file {path.name} does not exist or is not a valid SQL file")
+        path = self._get_migration_path(migration)
 
-        migration_code, reverse_migration_code, _ = self._get_content_hash(path)
+        # COPY data is not SQL, only the statements around it are validated
+        migration_code, reverse_migration_code = (
+            "\n".join(c for c in read_migration_segments(path, is_rollback=r) if isinstance(c, str))
+            for r in (False, True)
+        )
 
         for code in (migration_code, reverse_migration_code):
             try:
@@ -231,19 +364,187 @@ DROP TABLE IF EXISTS {table_name};
                 return sql.replace("DROP COLUMN", "DROP COLUMN IF EXISTS")
         return sql
 
-    def _get_database_hash(self, migration_name: str) -> str:
+    def _rewrite_ddl(self, path: Path, sql: str) -> str:
+        if not self.connection.autocommit:
+            raise ValueError(
+                "Rewriting DDL requires every statement to commit on its own (--transaction-mode statement)"
+            )
+        sql, rewrites = rewrite_sql(sql)
+        for rewrite in rewrites:
+            logger.info(f"Rewrote {rewrite.rule} statement in {path.name}")
+        return sql
+
+    @override
+    def _get_database_hashes(self, migration_names: list[str]) -> dict[str, str]:
         with self.connection.cursor() as cursor:
             cursor.execute(
-                f"""SELECT change_hash FROM {self.table_name} WHERE migration_name = %s""",
-                (migration_name,),
+                f"""SELECT migration_name, change_hash FROM {self.table_name} WHERE migration_name = ANY(%s)""",
+                (list(migration_names),),
             )
-            result = cursor.fetchone()
+            return dict(cursor.fetchall())
 
-            if not result or not result[0]:
-                raise ValueError(f"Migration {migration_name} not found in the database")
-            return result[0]
+    @override
+    def _get_merkle_nodes(self, nodes: list[str]) -> dict[str, str] | None:
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s);", (self.merkle_table_name,))
+            row = cursor.fetchone()
+            if not row or not row[0]:
+                return None
+            cursor.execute(f"""SELECT node, digest FROM {self.merkle_table_name} WHERE node = ANY(%s);""", (nodes,))
+            return dict(cursor.fetchall())
+
+    @contextlib.contextmanager
+    def _bookkeeping_transaction(self) -> Generator[None]:
+        # autocommitting (--transaction-mode statement) the migration row and the digest would commit apart
+        if not self.connection.autocommit:
+            yield
+            return
+        self.connection.autocommit = False
+        try:
+            yield
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+        finally:
+            self.connection.autocommit = True
+
+    def _update_changelog_digest(self, cursor: Cursor, migration: Migration, is_rollback: bool = False) -> None:
+        cursor.execute("SELECT to_regclass(%s);", (self.digest_table_name,))
+        row = cursor.fetchone()
+        if not row or not row[0]:
+            cursor.execute(
+                f"""CREATE TABLE {self.digest_table_name} (
+                    digest VARCHAR(64) NOT NULL,
+                    migrations INTEGER NOT NULL,
+                    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                );"""
+            )
+        cursor.execute(f"""SELECT digest FROM {self.digest_table_name} FOR UPDATE;""")
+        row = cursor.fetchone()
+        if row is None or migration.initial:
+            # first run of this version or a new migrations table, start from the rows in it
+            cursor.execute(f"""SELECT migration_name FROM {self.table_name};""")
+            names = [name for (name,) in cursor.fetchall()]
+            cursor.execute(f"""DELETE FROM {self.digest_table_name};""")
+            cursor.execute(
+                f"""INSERT INTO {self.digest_table_name} (digest, migrations) VALUES (%s, %s);""",
+                (compute_names_digest(names), len(names)),
+            )
+            return
+        cursor.execute(
+            f"""UPDATE {self.digest_table_name}
+                SET digest = %s, migrations = migrations + %s, updated_at = CURRENT_TIMESTAMP;""",
+            (compute_names_digest([os.path.basename(migration.name)], row[0]), -1 if is_rollback else 1),
+        )
+
+    def _update_merkle_tree(self, cursor: Cursor, changes: list[tuple[str, str]], rebuild: bool = False) -> None:
+        cursor.execute("SELECT to_regclass(%s);", (self.merkle_table_name,))
+        row = cursor.fetchone()
+        if not row or not row[0]:
+            cursor.execute(
+                f"""CREATE TABLE {self.merkle_table_name} (
+                    node VARCHAR(8) PRIMARY KEY,
+                    digest VARCHAR(64) NOT NULL
+                );"""
+            )
+            rebuild = True
+        if rebuild:
+            # first run of this version or a new migrations table, start from the rows in it
+            cursor.execute(f"""SELECT migration_name, change_hash FROM {self.table_name};""")
+            nodes = build_merkle_tree(cursor.fetchall())
+            cursor.execute(f"""DELETE FROM {self.merkle_table_name};""")
+        else:
+            changed = build_merkle_tree(changes)
+            cursor.execute(
+                f"""SELECT node, digest FROM {self.merkle_table_name} WHERE node = ANY(%s) FOR UPDATE;""",
+                (list(changed),),
+            )
+            nodes = toggle_merkle_nodes(dict(cursor.fetchall()), changed)
+        if nodes:
+            execute_values(
+                cursor,
+                f"""INSERT INTO {self.merkle_table_name} (node, digest) VALUES %s
+                    ON CONFLICT (node) DO UPDATE SET digest = EXCLUDED.digest;""",
+                list(nodes.items()),
+            )
 
-    def _get_content_hash(self, path: Path) -> tuple[str, str, str]:
-        content = path.read_text()
-        migration, reverse_migration = content.split(ROLLBACK_SPLIT_TAG, 1)
-        return migration, reverse_migration, hashlib.sha256(content.encode("utf-8")).hexdigest()
+    def _execute_migration(self, cursor: Cursor, path: Path, is_rollback: bool = False) -> int:
+        total_rows = 0
+        for segment in read_migration_segments(path, is_rollback=is_rollback):
+            if isinstance(segment, str):
+                if self.rewrite_ddl and not is_rollback:
+                    segment = self._rewrite_ddl(path, segment)
+                # a multi statement query runs in a single implicit transaction, split it when autocommitting
+                if not self.connection.autocommit:
+                    statements: list[str | list[ParallelStatement]] = [segment]
+                elif self.parallel_ddl > 1:
+                    statements = group_parallel_statements(segment)
+                else:
+                    statements = [sql for _, sql in split_sql_statements(segment)]
+                for statement in statements:
+                    self._wait_for_replicas()
+                    if isinstance(statement, list):
+                        run_parallel_statements(self._open_connection, statement, self.parallel_ddl)
+                        continue
+                    cursor.execute(statement)
+                    total_rows += max(cursor.rowcount, 0)
+                continue
+
+            self._wait_for_replicas()
+
+            if isinstance(segment, OnlineAlter):
+                # the change commits its progress as it goes on its own connection, an open migration transaction
+                # would hold locks it waits for and hide the tables created before it
+                if not self.connection.autocommit:
+                    raise ValueError(
+                        f"Online change of {segment.table} in {path.name} requires every statement to commit on its "
+                        "own (--transaction-mode statement)"
+                    )
+                with contextlib.closing(self._open_connection()) as conn:
+                    total_rows += run_online_alter(
+                        conn,
+                        online_state_table(self.table_name),
+                        path.name,
+                        segment,
+                        chunk_size=self.online_chunk_size,
+                        chunk_sleep=self.online_chunk_sleep,
+                        lock_timeout=self.online_lock_timeout,
+                        throttle=self.throttle.wait,
+                    )
+                continue
+
+            started = time.perf_counter()
+            with open_copy_block(segment) as data:
+                cursor.copy_expert(segment.statement, data, size=COPY_BUFFER_SIZE)
+            elapsed = time.perf_counter() - started
+            rows = max(cursor.rowcount, 0)
+            total_rows += rows
+            write_line(
+                f"\tCopied {rows} rows from {segment.path.name} in {elapsed:.2f}s "
+                f"({rows / elapsed if elapsed > 0 else rows:.0f} rows/s)"
+            )
+        return total_rows
+
+    def throttle_between_migrations(self) -> None:
+        """
+        Pause after a migration committed on its own (--transaction-mode migration) while the replicas are too far
+        behind. Nothing is open between migrations, the lag is checked autocommitting to keep it that way.
+        """
+        if not self.throttle.enabled:
+            return
+        autocommit = self.connection.autocommit
+        self.connection.autocommit = True
+        try:
+            self.throttle.wait()
+        finally:
+            self.connection.autocommit = autocommit
+
+    def _wait_for_replicas(self) -> None:
+        # pausing inside an open transaction would hold its locks while the replicas catch up
+        if self.connection.autocommit:
+            self.throttle.wait()
+
+    def _open_connection(self) -> Connection:
+        # a new connection to the same database, connection.dsn hides the password
+        return psycopg2.connect(make_dsn(self.connection.dsn, password=self.connection.info.password))
@@ -0,0 +1,358 @@
+import contextlib
+import os
+import sqlite3
+from collections.abc import Generator
+from pathlib import Path
+from typing import override
+
+from migrateit.clients._client import SqlClient
+from migrateit.clients._registry import register_client
+from migrateit.metrics import timed
+from migrateit.models import Migration, MigrationStatus, SupportedDatabase
+from migrateit.tree import (
+    build_merkle_tree,
+    compute_names_digest,
+    read_migration_segments,
+    split_sql_statements,
+    toggle_merkle_nodes,
+)
+
+IN_MEMORY_DATABASE = ":memory:"
+# CURRENT_TIMESTAMP has a precision of seconds, the status marker needs changes close in time to differ
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+@register_client(SupportedDatabase.SQLITE)
+class SqliteClient(SqlClient[sqlite3.Connection]):
+    """
+    SQLite client, an in-memory database (DB_URL=sqlite:// or :memory:) starts empty on every connection which is
+    handy to check that the whole changelog applies in CI.
+    COPY blocks and online schema changes are PostgreSQL only.
+    """
+
+    @override
+    @classmethod
+    def get_environment_url(cls) -> str:
+        db_url = os.getenv(cls.VARNAME_DB_URL)
+        if not db_url:
+            return f"{os.getenv(cls.VARNAME_DB_NAME, 'migrateit')}.db"
+        if db_url.startswith("sqlite://"):
+            # sqlite:///relative.db, sqlite:////absolute.db and sqlite:// for an in-memory database
+            return db_url.removeprefix("sqlite://").removeprefix("/") or IN_MEMORY_DATABASE
+        return db_url
+
+    @override
+    @classmethod
+    def connect(cls) -> sqlite3.Connection:
+        # `serve` refreshes its cache from a watcher thread, it serializes the access to the connection
+        return sqlite3.connect(cls.get_environment_url(), autocommit=False, check_same_thread=False)
+
+    @override
+    @classmethod
+    def create_migrations_table_str(cls, table_name: str) -> tuple[str, str]:
+        if not table_name.isidentifier():
+            raise ValueError(f"Unsafe table name: {table_name}")
+        return (
+            f"""
+CREATE TABLE IF NOT EXISTS {table_name} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    migration_name VARCHAR(255) UNIQUE NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    change_hash VARCHAR(64) NOT NULL,
+    squashed BOOLEAN DEFAULT FALSE
+);
+            """,
+            f"""
+DROP TABLE IF EXISTS {table_name};
+            """,
+        )
+
+    @override
+    def is_migrations_table_created(self) -> bool:
+        row = self.connection.execute(
+            "SELECT EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND LOWER(name) = LOWER(?));",
+            (self.table_name,),
+        ).fetchone()
+        return bool(row[0]) if row else False
+
+    @override
+    def is_migration_applied(self, migration: Migration) -> bool:
+        row = self.connection.execute(
+            f"""SELECT EXISTS (SELECT 1 FROM {self.table_name} WHERE migration_name = ?);""",
+            (os.path.basename(migration.name),),
+        ).fetchone()
+        return bool(row[0]) if row else False
+
+    @override
+    def acquire_migrations_lock(self, session: bool = False) -> None:
+        # SQLite has a single writer per database: a no-op write takes the write lock until the transaction ends,
+        # other processes wait for it (up to the busy timeout). There is no lock outliving a transaction, runs
+        # committing more than once only rely on that per transaction lock.
+        if session or not self.is_migrations_table_created():
+            return
+        self.connection.execute(f"UPDATE {self.table_name} SET squashed = squashed WHERE 0;")
+
+    @override
+    def release_migrations_lock(self) -> None:
+        pass
+
+    @override
+    def retrieve_applied_migrations(self) -> list[tuple[str, str]]:
+        if not self.is_migrations_table_created():
+            return []
+
+        with timed("status_query"):
+            return self.connection.execute(f"""SELECT migration_name, change_hash FROM {self.table_name}""").fetchall()
+
+    @override
+    def retrieve_changelog_digest(self) -> tuple[str, int] | None:
+        try:
+            row = self.connection.execute(f"""SELECT digest, migrations FROM {self.digest_table_name};""").fetchone()
+        except sqlite3.OperationalError:
+            return None  # no such table
+        return (row[0], row[1]) if row else None
+
+    @override
+    def retrieve_status_marker(self) -> str | None:
+        try:
+            row = self.connection.execute(
+                f"""SELECT digest, migrations, updated_at FROM {self.digest_table_name};"""
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None  # no such table
+        return ":".join(map(str, row)) if row else None
+
+    @override
+    def retrieve_schema_objects(self) -> dict[str, str]:
+        # the definition of a table includes its columns and constraints
+        # table names are case insensitive
+        placeholders = ", ".join("?" for _ in self.internal_tables)
+        with timed("catalog_query"):
+            rows = self.connection.execute(
+                f"""SELECT type || ' ' || name, COALESCE(sql, '') FROM sqlite_master
+                    WHERE name NOT LIKE 'sqlite_%' AND LOWER(tbl_name) NOT IN ({placeholders});""",
+                [name.lower() for name in self.internal_tables],
+            )
+            return dict(rows.fetchall())
+
+    @override
+    def retrieve_schema_fingerprint(self) -> dict[str, str] | None:
+        try:
+            rows = self.connection.execute(f"""SELECT object_name, object_hash FROM {self.fingerprint_table_name};""")
+        except sqlite3.OperationalError:
+            return None  # no such table
+        return dict(rows.fetchall())
+
+    @override
+    def save_schema_fingerprint(self, fingerprint: dict[str, str]) -> None:
+        with self._bookkeeping_transaction():
+            self.connection.execute(
+                f"""CREATE TABLE IF NOT EXISTS {self.fingerprint_table_name} (
+                    object_name TEXT PRIMARY KEY,
+                    object_hash VARCHAR(64) NOT NULL,
+                    recorded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                );"""
+            )
+            self.connection.execute(f"""DELETE FROM {self.fingerprint_table_name};""")
+            self.connection.executemany(
+                f"""INSERT INTO {self.fingerprint_table_name} (object_name, object_hash) VALUES (?, ?);""",
+                list(fingerprint.items()),
+            )
+
+    @override
+    def retrieve_migration_statuses(self) -> dict[str, MigrationStatus]:
+        return self._build_migration_statuses()
+
+    @override
+    def apply_migration(self, migration: Migration, is_fake: bool = False, is_rollback: bool = False) -> int:
+        path = self._get_migration_path(migration)
+        if not migration.initial and not (self.is_migration_applied(migration) == is_rollback):
+            if is_rollback:
+                raise ValueError(f"Migration {path.name} is not applied, cannot undo it")
+            raise ValueError(f"Migration {path.name} is already applied, cannot apply it again")
+
+        migration_hash = self._get_file_hash(path)
+        rows = 0
+        try:
+            with contextlib.closing(self.connection.cursor()) as cursor:
+                if not is_fake:
+                    rows = self._execute_migration(cursor, path, is_rollback=is_rollback)
+                with self._bookkeeping_transaction():
+                    if is_rollback and not migration.initial:
+                        cursor.execute(
+                            f"""DELETE FROM {self.table_name} where migration_name = ? and change_hash = ?;""",
+                            (os.path.basename(path), migration_hash),
+                        )
+                        if cursor.rowcount > 0:
+                            self._update_merkle_tree(cursor, [(os.path.basename(path), migration_hash)])
+                        self._update_changelog_digest(cursor, migration, is_rollback=True)
+                        return rows
+                    cursor.execute(
+                        f"""INSERT INTO {self.table_name} (migration_name, change_hash) VALUES (?, ?);""",
+                        (os.path.basename(path), migration_hash),
+                    )
+                    self._update_merkle_tree(
+                        cursor, [(os.path.basename(path), migration_hash)], rebuild=migration.initial
+                    )
+                    self._update_changelog_digest(cursor, migration)
+            return rows
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            raise e
+
+    @override
+    def squash_migrations(self, migrations: list[str], new_migration: Migration) -> None:
+        placeholders = ", ".join("?" for _ in migrations)
+        self.connection.execute(
+            f"""UPDATE {self.table_name} SET squashed = TRUE WHERE migration_name IN ({placeholders});""",
+            migrations,
+        )
+        self.apply_migration(new_migration, is_fake=True)
+
+    @override
+    def update_migration_hash(self, migration: Migration) -> None:
+        path = self._get_migration_path(migration)
+        migration_hash = self._get_file_hash(path)
+        with contextlib.closing(self.connection.cursor()) as cursor:
+            row = cursor.execute(
+                f"""SELECT change_hash FROM {self.table_name} WHERE migration_name = ?;""", (os.path.basename(path),)
+            ).fetchone()
+            cursor.execute(
+                f"""UPDATE {self.table_name} SET change_hash = ? WHERE migration_name = ?;""",
+                (migration_hash, os.path.basename(path)),
+            )
+            if row:
+                self._update_merkle_tree(
+                    cursor, [(os.path.basename(path), row[0]), (os.path.basename(path), migration_hash)]
+                )
+        # the names digest stays the same, the status marker must still change
+        with contextlib.suppress(sqlite3.OperationalError):  # no such table
+            self.connection.execute(f"""UPDATE {self.digest_table_name} SET updated_at = {_NOW};""")
+
+    @override
+    def validate_sql_syntax(self, migration: Migration) -> tuple[sqlite3.Error, str] | None:
+        # SQLite checks the schema while parsing, the migration is run followed by its rollback and discarded.
+        # Only syntax errors are reported, once a statement fails for another reason (i.e. the table already
+        # exists) the rest of the migration cannot be checked.
+        path = self._get_migration_path(migration)
+        try:
+            for is_rollback in (False, True):
+                for segment in read_migration_segments(path, is_rollback=is_rollback):
+                    if not isinstance(segment, str):
+                        continue
+                    for _, statement in split_sql_statements(segment):
+                        try:
+                            self.connection.execute(statement)
+                        except sqlite3.Error as e:
+                            if "syntax error" in str(e) or "incomplete input" in str(e):
+                                return e, statement
+                            return None
+        finally:
+            self.connection.rollback()
+        return None
+
+    @override
+    def _get_database_hashes(self, migration_names: list[str]) -> dict[str, str]:
+        placeholders = ", ".join("?" for _ in migration_names)
+        rows = self.connection.execute(
+            f"""SELECT migration_name, change_hash FROM {self.table_name} WHERE migration_name IN ({placeholders})""",
+            migration_names,
+        )
+        return dict(rows.fetchall())
+
+    @override
+    def _get_merkle_nodes(self, nodes: list[str]) -> dict[str, str] | None:
+        placeholders = ", ".join("?" for _ in nodes)
+        try:
+            rows = self.connection.execute(
+                f"""SELECT node, digest FROM {self.merkle_table_name} WHERE node IN ({placeholders});""", nodes
+            )
+        except sqlite3.OperationalError:
+            return None  # no such table
+        return dict(rows.fetchall())
+
+    @contextlib.contextmanager
+    def _bookkeeping_transaction(self) -> Generator[None]:
+        # autocommitting (--transaction-mode statement) the migration row and the digest would commit apart
+        if self.connection.autocommit is not True:
+            yield
+            return
+        self.connection.autocommit = False
+        try:
+            yield
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+        finally:
+            self.connection.autocommit = True
+
+    def _update_changelog_digest(self, cursor: sqlite3.Cursor, migration: Migration, is_rollback: bool = False) -> None:
+        cursor.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.digest_table_name} (
+                digest VARCHAR(64) NOT NULL,
+                migrations INTEGER NOT NULL,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );"""
+        )
+        row = cursor.execute(f"""SELECT digest FROM {self.digest_table_name};""").fetchone()
+        if row is None or migration.initial:
+            # first run of this version or a new migrations table, start from the rows in it
+            names = [name for (name,) in cursor.execute(f"""SELECT migration_name FROM {self.table_name};""")]
+            cursor.execute(f"""DELETE FROM {self.digest_table_name};""")
+            cursor.execute(
+                f"""INSERT INTO {self.digest_table_name} (digest, migrations) VALUES (?, ?);""",
+                (compute_names_digest(names), len(names)),
+            )
+            return
+        cursor.execute(
+            f"""UPDATE {self.digest_table_name}
+                SET digest = ?, migrations = migrations + ?, updated_at = {_NOW};""",
+            (compute_names_digest([os.path.basename(migration.name)], row[0]), -1 if is_rollback else 1),
+        )
+
+    def _update_merkle_tree(
+        self, cursor: sqlite3.Cursor, changes: list[tuple[str, str]], rebuild: bool = False
+    ) -> None:
+        row = cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND LOWER(name) = LOWER(?));",
+            (self.merkle_table_name,),
+        ).fetchone()
+        if not row or not row[0]:
+            cursor.execute(
+                f"""CREATE TABLE {self.merkle_table_name} (
+                    node VARCHAR(8) PRIMARY KEY,
+                    digest VARCHAR(64) NOT NULL
+                );"""
+            )
+            rebuild = True
+        if rebuild:
+            # first run of this version or a new migrations table, start from the rows in it
+            nodes = build_merkle_tree(
+                cursor.execute(f"""SELECT migration_name, change_hash FROM {self.table_name};""").fetchall()
+            )
+            cursor.execute(f"""DELETE FROM {self.merkle_table_name};""")
+        else:
+            changed = build_merkle_tree(changes)
+            placeholders = ", ".join("?" for _ in changed)
+            rows = cursor.execute(
+                f"""SELECT node, digest FROM {self.merkle_table_name} WHERE node IN ({placeholders});""",
+                list(changed),
+            )
+            nodes = toggle_merkle_nodes(dict(rows.fetchall()), changed)
+        cursor.executemany(
+            f"""INSERT OR REPLACE INTO {self.merkle_table_name} (node, digest) VALUES (?, ?);""", list(nodes.items())
+        )
+
+    def _execute_migration(self, cursor: sqlite3.Cursor, path: Path, is_rollback: bool = False) -> int:
+        total_rows = 0
+        for segment in read_migration_segments(path, is_rollback=is_rollback):
+            if not isinstance(segment, str):
+                raise NotImplementedError(
+                    f"Migration {path.name} uses COPY blocks or online schema changes, only supported on PostgreSQL"
+                )
+            # the sqlite3 module runs a single statement per call
+            for _, statement in split_sql_statements(segment):
+                cursor.execute(statement)
+                total_rows += max(cursor.rowcount, 0)
+        return total_rows
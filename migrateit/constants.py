@@ -5,3 +5,15 @@ VERSION = importlib.metadata.version("migrateit")
 
 MIGRATEIT_ROOT_DIR = os.getenv("MIGRATEIT_MIGRATIONS_DIR", "migrateit")
 MIGRATEIT_MIGRATIONS_TABLE = os.getenv("MIGRATEIT_MIGRATIONS_TABLE", "MIGRATEIT_CHANGELOG")
+MIGRATEIT_TEMPLATE_DATABASE = os.getenv("MIGRATEIT_TEMPLATE_DATABASE", "migrateit_template")
+MIGRATEIT_METRICS_FILE = os.getenv("MIGRATEIT_METRICS_FILE") or None
+MIGRATEIT_PROGRESS_INTERVAL = float(os.getenv("MIGRATEIT_PROGRESS_INTERVAL", "5"))
+MIGRATEIT_ONLINE_CHUNK_SIZE = int(os.getenv("MIGRATEIT_ONLINE_CHUNK_SIZE", "10000"))
+MIGRATEIT_ONLINE_CHUNK_SLEEP = float(os.getenv("MIGRATEIT_ONLINE_CHUNK_SLEEP", "0.1"))
+MIGRATEIT_ONLINE_LOCK_TIMEOUT = os.getenv("MIGRATEIT_ONLINE_LOCK_TIMEOUT", "5s")
+MIGRATEIT_MAX_REPLICATION_LAG = float(os.getenv("MIGRATEIT_MAX_REPLICATION_LAG", "0"))
+MIGRATEIT_MAX_REPLICATION_LAG_BYTES = int(os.getenv("MIGRATEIT_MAX_REPLICATION_LAG_BYTES", "0"))
+MIGRATEIT_REPLICATION_CHECK_INTERVAL = float(os.getenv("MIGRATEIT_REPLICATION_CHECK_INTERVAL", "1"))
+MIGRATEIT_PARALLEL_DDL = int(os.getenv("MIGRATEIT_PARALLEL_DDL", "0"))
+MIGRATEIT_LINT_DISABLE = [r for r in os.getenv("MIGRATEIT_LINT_DISABLE", "").replace(" ", "").split(",") if r]
+MIGRATEIT_SERVE_POLL_INTERVAL = float(os.getenv("MIGRATEIT_SERVE_POLL_INTERVAL", "2"))
@@ -0,0 +1,53 @@
+import hashlib
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True, slots=True)
+class SchemaDrift:
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+def fingerprint_schema(objects: dict[str, str]) -> dict[str, str]:
+    """
+    Reduce the schema objects to a compact fingerprint.
+    Args:
+        objects: The definition of each schema object by its key (i.e. "index public.users_email").
+    Returns:
+        The hash of each definition by object key.
+    """
+    return {key: hashlib.sha256(definition.encode("utf-8")).hexdigest()[:16] for key, definition in objects.items()}
+
+
+def compare_fingerprints(recorded: dict[str, str], live: dict[str, str]) -> SchemaDrift:
+    """
+    Compare the fingerprint recorded after the last run with the one of the live schema.
+    Returns:
+        The objects created, dropped and changed since the fingerprint was recorded, sorted by key.
+    """
+    return SchemaDrift(
+        added=sorted(live.keys() - recorded.keys()),
+        removed=sorted(recorded.keys() - live.keys()),
+        changed=sorted(key for key in recorded.keys() & live.keys() if recorded[key] != live[key]),
+    )
+
+
+def keep_drift(fingerprint: dict[str, str], recorded: dict[str, str], drift: SchemaDrift) -> dict[str, str]:
+    """
+    Keep the objects that drifted before a run as they were recorded, so they are still reported afterwards.
+    Args:
+        fingerprint: The fingerprint of the schema after the run.
+        recorded: The fingerprint recorded before the run.
+        drift: The drift found before the run.
+    Returns:
+        The fingerprint to record.
+    """
+    kept = {key: value for key, value in fingerprint.items() if key not in drift.added}
+    kept.update((key, recorded[key]) for key in drift.removed)
+    # objects changed by hand and then dropped by the run are gone for good
+    kept.update((key, recorded[key]) for key in drift.changed if key in fingerprint)
+    return kept
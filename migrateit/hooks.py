@@ -0,0 +1,157 @@
+import contextlib
+import functools
+from collections.abc import Generator
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from importlib.metadata import entry_points
+from typing import Any
+
+from migrateit.clients import SqlClient
+from migrateit.models import Migration
+from migrateit.reporters import logger
+
+HOOKS_ENTRY_POINT_GROUP = "migrateit.hooks"
+
+
+@dataclass(frozen=True, slots=True)
+class MigrationResult:
+    migration: Migration
+    is_rollback: bool
+    seconds: float
+    rows: int
+
+
+class MigrateItHooks:
+    """
+    Base class for the lifecycle hooks, override only the callbacks you need.
+
+    Hooks are registered in the 'migrateit.hooks' entry point group pointing to a subclass (instantiated without
+    arguments) or an instance:
+
+        [options.entry_points]
+        migrateit.hooks =
+            audit = my_package.hooks:AuditHooks
+
+    Synchronous hooks run in the apply path and can abort the command raising an exception. Hooks with
+    `run_async = True` run in their own background thread, in order, and their errors are only logged; they must
+    not use the client connection while the command is running.
+    """
+
+    run_async: bool = False
+
+    def before_plan(self, client: SqlClient, target: Migration | None, is_rollback: bool) -> None:
+        """Called before building the migration plan of a migrate/rollback command."""
+
+    def after_plan(self, client: SqlClient, plan: list[Migration], is_rollback: bool) -> None:
+        """Called with the migrations that are going to be applied (or rolled back), in order."""
+
+    def before_migration(self, client: SqlClient, migration: Migration, is_rollback: bool) -> None:
+        """Called before applying (or rolling back) each migration."""
+
+    def after_migration(self, client: SqlClient, result: MigrationResult) -> None:
+        """Called after each migration is applied (or rolled back)."""
+
+    def before_squash(self, client: SqlClient, migrations: list[Migration]) -> None:
+        """Called with the migrations that are going to be squashed."""
+
+    def after_squash(self, client: SqlClient, migrations: list[Migration], squashed: Migration) -> None:
+        """Called once the squashed migration is created and the changelog saved."""
+
+    def on_failure(self, client: SqlClient, migration: Migration | None, error: BaseException) -> None:
+        """Called when a command fails, with the migration being applied when it failed if any."""
+
+
+class HookManager:
+    """
+    Dispatch the lifecycle callbacks to every registered hook.
+    Asynchronous hooks get a single worker thread each so their callbacks keep the order they were fired in.
+    """
+
+    def __init__(self, hooks: list[MigrateItHooks] | None = None) -> None:
+        self.hooks = hooks or []
+        # the migration being applied, reported to on_failure by the commands
+        self.current: Migration | None = None
+        self._executors = {
+            id(hook): ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"migrateit-{type(hook).__name__}")
+            for hook in self.hooks
+            if getattr(hook, "run_async", False)
+        }
+
+    def __bool__(self) -> bool:
+        return bool(self.hooks)
+
+    def before_plan(self, client: SqlClient, target: Migration | None, is_rollback: bool) -> None:
+        self._dispatch("before_plan", client, target, is_rollback)
+
+    def after_plan(self, client: SqlClient, plan: list[Migration], is_rollback: bool) -> None:
+        self._dispatch("after_plan", client, plan, is_rollback)
+
+    def before_migration(self, client: SqlClient, migration: Migration, is_rollback: bool) -> None:
+        self.current = migration
+        self._dispatch("before_migration", client, migration, is_rollback)
+
+    def after_migration(self, client: SqlClient, result: MigrationResult) -> None:
+        self._dispatch("after_migration", client, result)
+        self.current = None
+
+    def before_squash(self, client: SqlClient, migrations: list[Migration]) -> None:
+        self._dispatch("before_squash", client, migrations)
+
+    def after_squash(self, client: SqlClient, migrations: list[Migration], squashed: Migration) -> None:
+        self._dispatch("after_squash", client, migrations, squashed)
+
+    def on_failure(self, client: SqlClient, migration: Migration | None, error: BaseException) -> None:
+        for hook in self.hooks:
+            # a failing failure hook must not hide the original error
+            try:
+                self._call(hook, "on_failure", client, migration, error)
+            except Exception:
+                logger.exception(f"Hook {type(hook).__name__}.on_failure failed")
+
+    def close(self) -> None:
+        """Wait for the pending asynchronous callbacks."""
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+
+    def _dispatch(self, callback: str, *args: Any) -> None:
+        for hook in self.hooks:
+            self._call(hook, callback, *args)
+
+    def _call(self, hook: MigrateItHooks, callback: str, *args: Any) -> None:
+        executor = self._executors.get(id(hook))
+        if executor is None:
+            getattr(hook, callback)(*args)
+            return
+
+        future = executor.submit(getattr(hook, callback), *args)
+        future.add_done_callback(functools.partial(_report_async_error, hook, callback))
+
+
+def _report_async_error(hook: MigrateItHooks, callback: str, future: Future) -> None:
+    if error := future.exception():
+        logger.error(f"Hook {type(hook).__name__}.{callback} failed: {error!r}")
+
+
+def discover_hooks() -> list[MigrateItHooks]:
+    """
+    Load the hooks registered in the 'migrateit.hooks' entry point group.
+    Returns:
+        The hook instances, in entry point name order.
+    """
+    hooks = []
+    for entry_point in sorted(entry_points(group=HOOKS_ENTRY_POINT_GROUP), key=lambda ep: ep.name):
+        hook = entry_point.load()
+        hooks.append(hook() if isinstance(hook, type) else hook)
+    return hooks
+
+
+@contextlib.contextmanager
+def load_hooks() -> Generator[HookManager]:
+    """
+    Yield a manager for the registered hooks, waiting for their asynchronous callbacks on exit.
+    """
+    manager = HookManager(discover_hooks())
+    try:
+        yield manager
+    finally:
+        manager.close()
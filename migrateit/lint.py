@@ -0,0 +1,193 @@
+import hashlib
+import json
+import re
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from migrateit.tree import atomic_write, split_migration_file, split_sql_statements
+
+# inline COPY data and its terminator are not SQL, they are blanked (keeping the lines) before linting
+_COPY_DATA_PATTERN = re.compile(r"(^COPY\s[^;]*\sFROM\s+stdin\b[^;]*;[^\n]*\n)(.*?^\\\.[ \t\r]*$)", re.I | re.M | re.S)
+_COMMENT_PATTERN = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_IGNORE_PATTERN = re.compile(r"--\s*migrateit-lint:\s*ignore\s+([\w\-, ]+)", re.I)
+
+_CREATED_TABLE_PATTERN = re.compile(r"^CREATE\s+(?:UNLOGGED\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w.\"]+)")
+_ALTERED_TABLE_PATTERN = re.compile(r"^ALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?(?:ONLY\s+)?([\w.\"]+)")
+_INDEXED_TABLE_PATTERN = re.compile(r"^CREATE\s+(?:UNIQUE\s+)?INDEX\b.*?\sON\s+(?:ONLY\s+)?([\w.\"]+)")
+_NOT_NULL_CHECK_PATTERN = re.compile(r"CHECK\s*\(\s*\"?(\w+)\"?\s+IS\s+NOT\s+NULL\s*\)")
+_SET_NOT_NULL_PATTERN = re.compile(r"ALTER\s+(?:COLUMN\s+)?\"?(\w+)\"?\s+SET\s+NOT\s+NULL")
+_VOLATILE_DEFAULT_PATTERN = re.compile(
+    r"\bADD\s+(?:COLUMN\s+)?(?:IF\s+NOT\s+EXISTS\s+)?\S+\s+(?:(?:BIG|SMALL)?SERIAL\b|[^,]*\bDEFAULT\b[^,]*"
+    r"\b(?:RANDOM|GEN_RANDOM_UUID|UUID_GENERATE_V\d\w*|CLOCK_TIMESTAMP|TIMEOFDAY|NEXTVAL)\s*\()"
+)
+
+
+@dataclass(frozen=True, slots=True)
+class LintFinding:
+    rule: str
+    path: Path
+    line: int
+    statement: str
+    message: str
+
+    @property
+    def location(self) -> str:
+        return f"{self.path}:{self.line}"
+
+    @property
+    def fingerprint(self) -> str:
+        # line numbers shift when a file is edited, the statement identifies the finding instead
+        key = f"{self.rule}:{self.path.name}:{' '.join(self.statement.split())}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class _Statement:
+    sql: str  # without comments, uppercased and with collapsed whitespace
+    table: str | None
+    new_tables: set[str]
+    not_null_checks: set[str]
+    validated: bool
+
+    @property
+    def on_new_table(self) -> bool:
+        # new tables are empty, nothing is locked for long nor rewritten
+        return self.table is not None and self.table in self.new_tables
+
+
+@dataclass(frozen=True)
+class LintRule:
+    id: str
+    message: str
+    check: Callable[[_Statement], bool] = field(repr=False)
+
+
+LINT_RULES: dict[str, LintRule] = {
+    rule.id: rule
+    for rule in (
+        LintRule(
+            "create-index-not-concurrently",
+            "CREATE INDEX blocks writes to the table while it is built, use CREATE INDEX CONCURRENTLY",
+            lambda s: (
+                re.match(r"^CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?!CONCURRENTLY\b)", s.sql) is not None
+                and not s.on_new_table
+            ),
+        ),
+        LintRule(
+            "add-column-volatile-default",
+            "ADD COLUMN with a volatile default rewrites the table under an ACCESS EXCLUSIVE lock",
+            lambda s: (
+                s.sql.startswith("ALTER TABLE")
+                and _VOLATILE_DEFAULT_PATTERN.search(s.sql) is not None
+                and not s.on_new_table
+            ),
+        ),
+        LintRule(
+            "set-not-null",
+            "SET NOT NULL scans the table under an ACCESS EXCLUSIVE lock, validate a CHECK (column IS NOT NULL) first",
+            lambda s: (
+                s.sql.startswith("ALTER TABLE")
+                and any(
+                    column not in s.not_null_checks or not s.validated
+                    for column in _SET_NOT_NULL_PATTERN.findall(s.sql)
+                )
+                and not s.on_new_table
+            ),
+        ),
+        LintRule(
+            "add-foreign-key-valid",
+            "ADD FOREIGN KEY validates every row while locking both tables, add it NOT VALID and validate it later",
+            lambda s: (
+                s.sql.startswith("ALTER TABLE")
+                and re.search(r"\bADD\s+(?:CONSTRAINT\s+\S+\s+)?FOREIGN\s+KEY\b", s.sql) is not None
+                and "NOT VALID" not in s.sql
+                and not s.on_new_table
+            ),
+        ),
+        LintRule(
+            "alter-column-type",
+            "ALTER COLUMN TYPE usually rewrites the table under an ACCESS EXCLUSIVE lock, consider \\online_alter",
+            lambda s: (
+                s.sql.startswith("ALTER TABLE")
+                and re.search(r"\bALTER\s+(?:COLUMN\s+)?\S+\s+(?:SET\s+DATA\s+)?TYPE\b", s.sql) is not None
+                and not s.on_new_table
+            ),
+        ),
+        LintRule(
+            "update-without-where",
+            "UPDATE without WHERE rewrites every row in a single transaction, update in batches",
+            lambda s: s.sql.startswith("UPDATE ") and re.search(r"\bWHERE\b", s.sql) is None,
+        ),
+    )
+}
+
+
+def lint_migration(path: Path, rules: Iterable[str] | None = None) -> list[LintFinding]:
+    """
+    Find statements known to hold long locks or rewrite tables in the migration SQL (the rollback is not linted).
+    Statements on tables created by the same migration are not reported, and a
+    `-- migrateit-lint: ignore <rule>[, <rule>]` comment in or right before a statement silences those rules.
+    Args:
+        path: The migration file.
+        rules: The rules to check, all of them if not provided.
+    Returns:
+        The findings in file order.
+    """
+    enabled = [LINT_RULES[r] for r in (rules if rules is not None else LINT_RULES)]
+    sql, _ = split_migration_file(path)
+    sql = _COPY_DATA_PATTERN.sub(lambda m: m[1] + "\n" * m[2].count("\n"), sql)
+    lines = sql.splitlines()
+
+    findings: list[LintFinding] = []
+    new_tables: set[str] = set()
+    not_null_checks: set[str] = set()
+    validated = False
+    for line, raw in split_sql_statements(sql):
+        normalized = " ".join(_COMMENT_PATTERN.sub(" ", raw).split()).upper()
+        if created := _CREATED_TABLE_PATTERN.match(normalized):
+            new_tables.add(created[1])
+        not_null_checks.update(_NOT_NULL_CHECK_PATTERN.findall(normalized))
+        validated = validated or "VALIDATE CONSTRAINT" in normalized
+
+        table = _ALTERED_TABLE_PATTERN.match(normalized) or _INDEXED_TABLE_PATTERN.match(normalized)
+        statement = _Statement(normalized, table[1] if table else None, new_tables, not_null_checks, validated)
+        ignored = ignored_rules(lines, line, raw)
+        findings.extend(
+            LintFinding(rule.id, path, line, raw, rule.message)
+            for rule in enabled
+            if rule.id not in ignored and rule.check(statement)
+        )
+    return findings
+
+
+def ignored_rules(lines: list[str], line: int, statement: str) -> set[str]:
+    """
+    Rules silenced by `-- migrateit-lint: ignore` comments on the line before the statement or on the lines it spans.
+    Args:
+        lines: The lines of the SQL the statement belongs to.
+        line: The 1-based line the statement starts at.
+        statement: The statement.
+    """
+    context = "\n".join(lines[max(line - 2, 0) : line + statement.count("\n")])
+    return {r.strip().lower() for m in _IGNORE_PATTERN.findall(context) for r in m.split(",")}
+
+
+def load_baseline(path: Path) -> set[str]:
+    """
+    Load the fingerprints of the accepted findings, an empty set if the baseline does not exist yet.
+    """
+    if not path.exists():
+        return set()
+    return {finding["fingerprint"] for finding in json.loads(path.read_text())["findings"]}
+
+
+def save_baseline(path: Path, findings: list[LintFinding]) -> None:
+    """
+    Accept the given findings, only findings not in the baseline are reported as new.
+    """
+    entries = sorted(
+        ({"fingerprint": f.fingerprint, "rule": f.rule, "location": f.location} for f in findings),
+        key=lambda entry: (entry["location"], entry["rule"]),
+    )
+    atomic_write(path, json.dumps({"version": 1, "findings": entries}, indent=2) + "\n")
@@ -1,15 +1,19 @@
 import argparse
+import contextlib
+import sys
 from datetime import datetime
 from pathlib import Path
 
-import psycopg2
-
 import migrateit.constants as C
 from migrateit import cli as commands
-from migrateit.clients.psql import PsqlClient
-from migrateit.models import MigrateItConfig, SupportedDatabase
+from migrateit.clients import PsqlClient, SqlClient, get_client_class
+from migrateit.hooks import load_hooks
+from migrateit.lint import LINT_RULES
+from migrateit.metrics import metrics_textfile, timed
+from migrateit.models import MigrateItConfig, MigrationPhase, SupportedDatabase, TransactionMode
+from migrateit.profiling import profile
 from migrateit.reporters import FatalError, error_handler, logging_handler, print_logo
-from migrateit.tree import load_changelog_file
+from migrateit.tree import find_changelog_file, load_changelog_file
 
 
 def main() -> int:
@@ -22,86 +26,250 @@ def main() -> int:
         action="version",
         version=f"%(prog)s {C.VERSION}",
     )
+    parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        default=C.MIGRATEIT_METRICS_FILE,
+        help="Write OpenMetrics of the command to this file (i.e. for the node_exporter textfile collector).",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="Print the time spent in each phase of the command.",
+    )
+    parser.add_argument(
+        "--profile-stats",
+        type=Path,
+        default=None,
+        metavar="FILE",
+        help="Write the cProfile stats of the command to this file (implies --profile).",
+    )
+    parser.add_argument(
+        "--profile-trace",
+        type=Path,
+        default=None,
+        metavar="FILE",
+        help="Write a Chrome trace JSON of the phases of the command to this file (implies --profile).",
+    )
 
     subparsers = parser.add_subparsers(dest="command")
     _cmd_init(subparsers)
+    _cmd_convert(subparsers)
+    _cmd_lint(subparsers)
     _cmd_new(subparsers)
     _cmd_migrate(subparsers)
     _cmd_rollback(subparsers)
+    _cmd_plan(subparsers)
+    _cmd_apply(subparsers)
     _cmd_squash(subparsers)
+    _cmd_rewrite(subparsers)
     _cmd_show(subparsers)
+    _cmd_check(subparsers)
+    _cmd_drift(subparsers)
+    _cmd_template(subparsers)
+    _cmd_serve(subparsers)
     args = parser.parse_args()
 
-    print_logo()
-    with error_handler(), logging_handler(True):
-        if hasattr(args, "func"):
-            root = Path(C.MIGRATEIT_ROOT_DIR)
-            if args.command == "init":
-                if args.database not in [db.value for db in SupportedDatabase]:
-                    raise FatalError(f"Unsupported database type: {args.database}.")
-                return commands.cmd_init(
-                    table_name=C.MIGRATEIT_MIGRATIONS_TABLE,
-                    migrations_dir=root / "migrations",
-                    migrations_file=root / "changelog.json",
-                    database=SupportedDatabase(args.database),
-                )
+    # machine readable output must be the only thing written to stdout
+    is_machine_output = getattr(args, "format", "text") in ("json", "ndjson")
+    if not is_machine_output:
+        print_logo()
+    with (
+        error_handler(),
+        logging_handler(True, stream=sys.stderr.buffer if is_machine_output else None),
+        metrics_textfile(args.metrics_file, args.command or "") as metrics,
+        _profile(args),
+    ):
+        exit_code = _run_command(parser, args)
+        metrics.success = exit_code == 0
+        return exit_code
+
 
-            changelog = load_changelog_file(root / "changelog.json")
-            config = MigrateItConfig(
+def _run_command(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    if hasattr(args, "func"):
+        root = Path(C.MIGRATEIT_ROOT_DIR)
+        if args.command == "init":
+            if args.database not in [db.value for db in SupportedDatabase]:
+                raise FatalError(f"Unsupported database type: {args.database}.")
+            return commands.cmd_init(
                 table_name=C.MIGRATEIT_MIGRATIONS_TABLE,
                 migrations_dir=root / "migrations",
-                changelog=changelog,
+                migrations_file=root / ("changelog.jsonl" if args.jsonl else "changelog.json"),
+                database=SupportedDatabase(args.database),
+            )
+        if args.command == "convert":
+            return commands.cmd_convert(find_changelog_file(root), target_format=args.format)
+        if args.command == "lint":
+            return commands.cmd_lint(
+                load_changelog_file(find_changelog_file(root)),
+                migrations_dir=root / "migrations",
+                names=args.names,
+                disabled_rules=args.disable,
+                baseline=args.baseline,
+                update_baseline=args.update_baseline,
             )
-            with _get_connection(changelog.database) as conn:
-                client = PsqlClient(conn, config)
-                if args.command == "new":
-                    return commands.cmd_new(
-                        client,
-                        name=args.name,
-                        dependencies=args.dependecies,
-                        no_edit=args.no_edit,
-                    )
-                elif args.command == "show":
-                    return commands.cmd_show(
-                        client,
-                        list_mode=args.list,
-                        validate_sql=args.validate_sql,
-                    )
-                elif args.command == "migrate":
-                    return commands.cmd_run(
-                        client,
-                        args.name,
-                        is_fake=args.fake,
-                        is_hash_update=args.update_hash,
-                    )
-                elif args.command == "rollback":
-                    return commands.cmd_run(
-                        client,
-                        args.name,
-                        is_fake=args.fake,
-                        is_rollback=True,
-                    )
-                elif args.command == "squash":
-                    return commands.cmd_squash(
-                        client,
-                        start_migration=args.start_migration,
-                        end_migration=args.end_migration,
-                        name=args.name,
-                    )
-                else:
-                    raise NotImplementedError(f"Command {args.command} not implemented.")
-        else:
-            parser.print_help()
-            return 1
+
+        with timed("changelog_load"):
+            changelog = load_changelog_file(find_changelog_file(root))
+        config = MigrateItConfig(
+            table_name=C.MIGRATEIT_MIGRATIONS_TABLE,
+            migrations_dir=root / "migrations",
+            changelog=changelog,
+        )
+        if args.command == "template" and changelog.database != SupportedDatabase.POSTGRES:
+            raise FatalError("Template databases are only supported on PostgreSQL.")
+        client_class = get_client_class(changelog.database)
+        with timed("connect"):
+            conn = client_class.connect()
+        with conn, load_hooks() as hooks:
+            client = client_class(conn, config)
+            if args.command in ("migrate", "rollback", "apply"):
+                _configure_throttle(client, args)
+            if args.command in ("migrate", "apply"):
+                _configure_parallel_ddl(client, args)
+            if args.command == "new":
+                return commands.cmd_new(
+                    client,
+                    name=args.name,
+                    dependencies=args.dependecies,
+                    no_edit=args.no_edit,
+                    phase=MigrationPhase(args.phase),
+                )
+            elif args.command == "show":
+                return commands.cmd_show(
+                    client,
+                    list_mode=args.list,
+                    validate_sql=args.validate_sql,
+                    output_format=args.format,
+                    collapse=args.collapse,
+                )
+            elif args.command == "check":
+                return commands.cmd_check(client)
+            elif args.command == "drift":
+                return commands.cmd_drift(client, accept=args.accept)
+            elif args.command == "rewrite":
+                return commands.cmd_rewrite(client, names=args.names, dry_run=args.dry_run)
+            elif args.command == "migrate":
+                if args.rewrite_ddl:
+                    if not isinstance(client, PsqlClient):
+                        raise FatalError("--rewrite-ddl is only supported on PostgreSQL.")
+                    if args.transaction_mode != TransactionMode.STATEMENT.value:
+                        raise FatalError("--rewrite-ddl requires --transaction-mode statement.")
+                    client.rewrite_ddl = True
+                return commands.cmd_run(
+                    client,
+                    args.name,
+                    is_fake=args.fake,
+                    is_hash_update=args.update_hash,
+                    hooks=hooks,
+                    transaction_mode=TransactionMode(args.transaction_mode),
+                    phase=MigrationPhase(args.phase) if args.phase else None,
+                )
+            elif args.command == "plan":
+                return commands.cmd_plan(
+                    client,
+                    args.output,
+                    name=args.name,
+                    is_rollback=args.rollback,
+                    phase=MigrationPhase(args.phase) if args.phase else None,
+                )
+            elif args.command == "apply":
+                return commands.cmd_apply(
+                    client,
+                    args.plan,
+                    hooks=hooks,
+                    transaction_mode=TransactionMode(args.transaction_mode),
+                )
+            elif args.command == "rollback":
+                return commands.cmd_run(
+                    client,
+                    args.name,
+                    is_fake=args.fake,
+                    is_rollback=True,
+                    hooks=hooks,
+                    transaction_mode=TransactionMode(args.transaction_mode),
+                )
+            elif args.command == "squash":
+                return commands.cmd_squash(
+                    client,
+                    start_migration=args.start_migration,
+                    end_migration=args.end_migration,
+                    name=args.name,
+                    hooks=hooks,
+                )
+            elif args.command == "serve":
+                return commands.cmd_serve(
+                    client,
+                    host=args.host,
+                    port=args.port,
+                    socket_path=args.socket,
+                    poll_interval=args.poll_interval,
+                )
+            elif args.command == "template":
+                if not isinstance(client, PsqlClient):
+                    raise FatalError("Template databases are only supported on PostgreSQL.")
+                return commands.cmd_template(
+                    client,
+                    template_name=args.template,
+                    clone=args.clone,
+                    force=args.force,
+                )
+            else:
+                raise NotImplementedError(f"Command {args.command} not implemented.")
+    else:
+        parser.print_help()
+        return 1
 
 
 def _cmd_init(subparsers) -> argparse.ArgumentParser:
     parser = subparsers.add_parser("init", help="Initialize the migration directory and database")
     parser.add_argument("database", help="Database type to use", choices=[db.value for db in SupportedDatabase])
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        default=False,
+        help="Use the append-only JSON Lines changelog format.",
+    )
     parser.set_defaults(func=commands.cmd_init)
     return parser
 
 
+def _cmd_convert(subparsers) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser("convert", help="Convert the changelog file between JSON and JSON Lines formats")
+    parser.add_argument("format", help="Target changelog format", choices=["json", "jsonl"])
+    parser.set_defaults(func=commands.cmd_convert)
+    return parser
+
+
+def _cmd_lint(subparsers) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser("lint", help="Find statements that lock or rewrite tables in the migrations")
+    parser.add_argument("names", type=str, nargs="*", help="Migrations to lint, all of them if not provided.")
+    parser.add_argument(
+        "--disable",
+        nargs="*",
+        choices=list(LINT_RULES),
+        default=C.MIGRATEIT_LINT_DISABLE,
+        metavar="RULE",
+        help=f"Rules to skip, one of: {', '.join(LINT_RULES)}.",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        metavar="FILE",
+        help="Only fail on findings that are not in this baseline file.",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        default=False,
+        help="Accept the current findings writing them into the baseline file.",
+    )
+    parser.set_defaults(func=commands.cmd_lint)
+    return parser
+
+
 def _cmd_new(subparsers) -> argparse.ArgumentParser:
     parser = subparsers.add_parser("new", help="Create a new migration")
     parser.add_argument(
@@ -123,6 +291,12 @@ def _cmd_new(subparsers) -> argparse.ArgumentParser:
         default=False,
         help="Avoid opening the migration file in an editor after creation.",
     )
+    parser.add_argument(
+        "--phase",
+        choices=[phase.value for phase in MigrationPhase],
+        default=MigrationPhase.PRE.value,
+        help="Run the migration before the new code is deployed (pre) or after the rollout (post).",
+    )
     parser.set_defaults(func=commands.cmd_new)
     return parser
 
@@ -137,6 +311,16 @@ def _cmd_migrate(subparsers) -> argparse.ArgumentParser:
         default=False,
         help="Update the hash of the migration.",
     )
+    parser.add_argument(
+        "--rewrite-ddl",
+        action="store_true",
+        default=False,
+        help="Rewrite lock-heavy DDL into its low-lock equivalent when applying (needs --transaction-mode statement).",
+    )
+    _add_phase(parser)
+    _add_transaction_mode(parser)
+    _add_replication_throttle(parser)
+    _add_parallel_ddl(parser)
     parser.set_defaults(func=commands.cmd_run)
     return parser
 
@@ -150,10 +334,117 @@ def _cmd_rollback(subparsers) -> argparse.ArgumentParser:
         default=False,
         help="Fakes the migration marking it as ran.",
     )
+    _add_transaction_mode(parser)
+    _add_replication_throttle(parser)
     parser.set_defaults(func=commands.cmd_run)
     return parser
 
 
+def _cmd_plan(subparsers) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser("plan", help="Write the migrations to run into a plan file for `apply`")
+    parser.add_argument("name", type=str, nargs="?", default=None, help="Name of the migration to run")
+    parser.add_argument(
+        "--rollback",
+        action="store_true",
+        default=False,
+        help="Plan the rollback of the given migration.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=Path("plan.json"),
+        metavar="FILE",
+        help="Plan file to write.",
+    )
+    _add_phase(parser)
+    parser.set_defaults(func=commands.cmd_plan)
+    return parser
+
+
+def _cmd_apply(subparsers) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser("apply", help="Run a plan file if the database did not change since it was built")
+    parser.add_argument("plan", type=Path, help="Plan file written by `plan`.")
+    _add_transaction_mode(parser)
+    _add_replication_throttle(parser)
+    _add_parallel_ddl(parser)
+    parser.set_defaults(func=commands.cmd_apply)
+    return parser
+
+
+def _add_replication_throttle(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--max-replication-lag",
+        type=float,
+        default=C.MIGRATEIT_MAX_REPLICATION_LAG,
+        metavar="SECONDS",
+        help="Pause between migrations (--transaction-mode migration) or statements (statement) while a streaming "
+        "replica replays more than this behind (PostgreSQL), a plan applied in a single transaction is not paused.",
+    )
+    parser.add_argument(
+        "--max-replication-lag-bytes",
+        type=int,
+        default=C.MIGRATEIT_MAX_REPLICATION_LAG_BYTES,
+        metavar="BYTES",
+        help="Pause between migrations (--transaction-mode migration) or statements (statement) while a streaming "
+        "replica is more than this WAL behind (PostgreSQL), a plan applied in a single transaction is not paused.",
+    )
+
+
+def _configure_throttle(client: SqlClient, args: argparse.Namespace) -> None:
+    if not (args.max_replication_lag or args.max_replication_lag_bytes):
+        return
+    if not isinstance(client, PsqlClient):
+        raise FatalError("Replication lag throttling is only supported on PostgreSQL.")
+    client.max_replication_lag = args.max_replication_lag
+    client.max_replication_lag_bytes = args.max_replication_lag_bytes
+
+
+def _configure_parallel_ddl(client: SqlClient, args: argparse.Namespace) -> None:
+    if args.parallel_ddl is None:
+        return
+    if not isinstance(client, PsqlClient):
+        raise FatalError("Parallel DDL is only supported on PostgreSQL.")
+    if args.parallel_ddl > 1 and args.transaction_mode != TransactionMode.STATEMENT.value:
+        raise FatalError("--parallel-ddl requires --transaction-mode statement.")
+    client.parallel_ddl = args.parallel_ddl
+
+
+def _add_parallel_ddl(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--parallel-ddl",
+        type=int,
+        default=None,
+        metavar="CONNECTIONS",
+        help=(
+            "Run consecutive CREATE INDEX CONCURRENTLY and VALIDATE CONSTRAINT statements on different tables, or "
+            "marked with '-- migrateit: parallel', on up to this many extra connections (needs --transaction-mode "
+            "statement, PostgreSQL)."
+        ),
+    )
+
+
+def _add_phase(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--phase",
+        choices=[phase.value for phase in MigrationPhase],
+        default=None,
+        help="Only run the pending migrations of the pre-deploy or post-deploy phase, all of them if not provided.",
+    )
+
+
+def _add_transaction_mode(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--transaction-mode",
+        choices=[mode.value for mode in TransactionMode],
+        default=TransactionMode.PLAN.value,
+        help=(
+            "Commit the whole plan at once (plan), each migration with its changelog row so a re-run resumes "
+            "where it failed (migration) or every statement on its own (statement)."
+        ),
+    )
+
+
 def _cmd_squash(subparsers) -> argparse.ArgumentParser:
     parser = subparsers.add_parser("squash", help="Squash migrations into a single file")
     parser.add_argument(
@@ -177,6 +468,21 @@ def _cmd_squash(subparsers) -> argparse.ArgumentParser:
     return parser
 
 
+def _cmd_rewrite(subparsers) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser("rewrite", help="Rewrite lock-heavy DDL of pending migrations in place")
+    parser.add_argument(
+        "names", type=str, nargs="*", help="Migrations to rewrite, all the pending ones if not provided."
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        default=False,
+        help="Only print the rewrites without changing the files.",
+    )
+    parser.set_defaults(func=commands.cmd_rewrite)
+    return parser
+
+
 def _cmd_show(subparsers) -> argparse.ArgumentParser:
     parser = subparsers.add_parser("show", help="Show migration status")
     parser.add_argument(
@@ -192,20 +498,103 @@ def _cmd_show(subparsers) -> argparse.ArgumentParser:
         default=False,
         help="Validate SQL migration syntax.",
     )
+    parser.add_argument(
+        "--format",
+        choices=["text", "json", "ndjson"],
+        default="text",
+        help="Output format, json and ndjson are meant to be consumed by other tools.",
+    )
+    parser.add_argument(
+        "--collapse",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Collapse linear chains of more than N migrations in the DAG.",
+    )
     parser.set_defaults(func=commands.cmd_show)
     return parser
 
 
-# TODO: add support for other databases
-def _get_connection(database: SupportedDatabase):
-    match database:
-        case SupportedDatabase.POSTGRES:
-            db_url = PsqlClient.get_environment_url()
-            conn = psycopg2.connect(db_url)
-            conn.autocommit = False
-            return conn
-        case _:
-            raise NotImplementedError(f"Database {database} is not supported")
+def _cmd_check(subparsers) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser(
+        "check",
+        help="Check the database has every migration of the changelog applied, without reading the files",
+        description=(
+            f"Exits with {commands.CHECK_UP_TO_DATE} if the database is up to date (or ahead of the changelog), "
+            f"{commands.CHECK_BEHIND} if migrations are pending and {commands.CHECK_DIVERGED} if the database "
+            "has migrations the changelog does not know about."
+        ),
+    )
+    parser.set_defaults(func=commands.cmd_check)
+    return parser
+
+
+def _cmd_drift(subparsers) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser(
+        "drift", help="Report the schema objects changed outside of the migrations since the last run"
+    )
+    parser.add_argument(
+        "--accept",
+        action="store_true",
+        default=False,
+        help="Record the live schema as the expected one, the drift found so far is no longer reported",
+    )
+    parser.set_defaults(func=commands.cmd_drift)
+    return parser
+
+
+def _cmd_template(subparsers) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser("template", help="Build a migrated template database and clone it")
+    parser.add_argument(
+        "-t",
+        "--template",
+        type=str,
+        default=C.MIGRATEIT_TEMPLATE_DATABASE,
+        help="Name of the template database.",
+    )
+    parser.add_argument(
+        "-c",
+        "--clone",
+        type=str,
+        default=None,
+        help="Name of a new database to create as a copy of the template.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        default=False,
+        help="Rebuild the template even if the changelog digest did not change.",
+    )
+    parser.set_defaults(func=commands.cmd_template)
+    return parser
+
+
+def _cmd_serve(subparsers) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser("serve", help="Serve the migrations status as JSON over HTTP")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to listen on.")
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="Listen on this Unix socket instead of TCP.",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=C.MIGRATEIT_SERVE_POLL_INTERVAL,
+        metavar="SECONDS",
+        help="Seconds between checks of the migration files and the migrations table.",
+    )
+    parser.set_defaults(func=commands.cmd_serve)
+    return parser
+
+
+def _profile(args: argparse.Namespace) -> contextlib.AbstractContextManager:
+    if not (args.profile or args.profile_stats or args.profile_trace):
+        return contextlib.nullcontext()
+    return profile(stats_file=args.profile_stats, trace_file=args.profile_trace)
 
 
 if __name__ == "__main__":
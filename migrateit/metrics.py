@@ -0,0 +1,159 @@
+import contextlib
+import time
+from collections.abc import Generator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from migrateit.models import MigrationStatus
+from migrateit.tree import atomic_write
+
+APPLY_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+
+@dataclass
+class RunMetrics:
+    command: str = ""
+    started_at: float = field(default_factory=time.time)
+    success: bool = False
+    statuses: dict[MigrationStatus, int] = field(default_factory=dict)
+    migration_durations: dict[str, float] = field(default_factory=dict)
+    phases: dict[str, float] = field(default_factory=dict)
+    # (phase, start, duration) of every timed block, starts relative to `origin` (perf_counter)
+    spans: list[tuple[str, float, float]] = field(default_factory=list)
+    origin: float = field(default_factory=time.perf_counter)
+
+    @property
+    def pending(self) -> int:
+        return self.statuses.get(MigrationStatus.NOT_APPLIED, 0)
+
+
+_metrics = RunMetrics()
+
+
+def get_metrics() -> RunMetrics:
+    return _metrics
+
+
+def reset_metrics(command: str = "") -> RunMetrics:
+    global _metrics
+    _metrics = RunMetrics(command=command)
+    return _metrics
+
+
+@contextlib.contextmanager
+def timed(phase: str) -> Generator[None]:
+    """
+    Accumulate the time spent inside the block into the given phase of the current run.
+    """
+    metrics = _metrics
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.phases[phase] = metrics.phases.get(phase, 0.0) + elapsed
+        metrics.spans.append((phase, started - metrics.origin, elapsed))
+
+
+def record_statuses(status_map: dict[str, MigrationStatus]) -> None:
+    _metrics.statuses = {status: 0 for status in MigrationStatus}
+    for status in status_map.values():
+        _metrics.statuses[status] += 1
+
+
+def record_migration(name: str, seconds: float) -> None:
+    _metrics.migration_durations[name] = seconds
+
+
+def render_openmetrics(metrics: RunMetrics) -> str:
+    """
+    Render the metrics of a run in the Prometheus/OpenMetrics text format.
+    """
+    command = _escape(metrics.command)
+    lines: list[str] = []
+
+    def metric(name: str, kind: str, description: str, samples: list[tuple[str, float]]) -> None:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+    metric(
+        "migrateit_last_run_timestamp_seconds",
+        "gauge",
+        "Unix time the last migrateit command started.",
+        [(f'{{command="{command}"}}', metrics.started_at)],
+    )
+    metric(
+        "migrateit_last_run_success",
+        "gauge",
+        "Whether the last migrateit command succeeded.",
+        [(f'{{command="{command}"}}', int(metrics.success))],
+    )
+    if metrics.statuses:
+        metric(
+            "migrateit_migrations",
+            "gauge",
+            "Number of migrations by status.",
+            [(f'{{status="{status.value}"}}', count) for status, count in metrics.statuses.items()],
+        )
+        metric("migrateit_migrations_pending", "gauge", "Number of migrations not applied.", [("", metrics.pending)])
+
+    for phase, description in (
+        ("lock_wait", "Time waiting for the migrations lock."),
+        ("planning", "Time building the migration plan."),
+        ("hash_check", "Time hashing migration files to check their status."),
+    ):
+        if phase in metrics.phases:
+            metric(
+                f"migrateit_{phase}_seconds",
+                "gauge",
+                description,
+                [(f'{{command="{command}"}}', metrics.phases[phase])],
+            )
+
+    if metrics.migration_durations:
+        durations = metrics.migration_durations.values()
+        buckets = [(f'{{le="{b:g}"}}', sum(1 for d in durations if d <= b)) for b in APPLY_DURATION_BUCKETS]
+        buckets.append(('{le="+Inf"}', len(durations)))
+        lines.append("# HELP migrateit_migration_apply_duration_seconds Time applying each migration of the run.")
+        lines.append("# TYPE migrateit_migration_apply_duration_seconds histogram")
+        lines.extend(f"migrateit_migration_apply_duration_seconds_bucket{labels} {value}" for labels, value in buckets)
+        lines.append(f"migrateit_migration_apply_duration_seconds_sum {sum(durations)}")
+        lines.append(f"migrateit_migration_apply_duration_seconds_count {len(durations)}")
+        metric(
+            "migrateit_migration_last_apply_duration_seconds",
+            "gauge",
+            "Time applying a migration in the last run.",
+            [(f'{{migration="{_escape(name)}"}}', d) for name, d in metrics.migration_durations.items()],
+        )
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: Path, metrics: RunMetrics | None = None) -> None:
+    """
+    Atomically write the metrics of a run for the node_exporter textfile collector.
+    Args:
+        path: The .prom file to write.
+        metrics: The metrics to write, the current run ones if not provided.
+    """
+    atomic_write(path, render_openmetrics(metrics or _metrics))
+
+
+@contextlib.contextmanager
+def metrics_textfile(path: Path | None, command: str) -> Generator[RunMetrics]:
+    """
+    Collect the metrics of a command and write them to the textfile once it finishes, even if it fails.
+    The caller marks the run as successful from the exit code of the command, a raised error leaves it failed.
+    """
+    metrics = reset_metrics(command)
+    try:
+        yield metrics
+    finally:
+        if path:
+            write_textfile(path, metrics)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
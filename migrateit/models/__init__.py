@@ -1,11 +1,25 @@
 from .migration import (
+    CopyBlock as CopyBlock,
     Migration as Migration,
+    MigrationPhase as MigrationPhase,
     MigrationStatus as MigrationStatus,
+    OnlineAlter as OnlineAlter,
 )
 from .config import (
     MigrateItConfig as MigrateItConfig,
+    TransactionMode as TransactionMode,
 )
 from .changelog import (
     ChangelogFile as ChangelogFile,
     SupportedDatabase as SupportedDatabase,
 )
+from .graph import (
+    MigrationGraph as MigrationGraph,
+)
+from .index import (
+    MigrationsIndex as MigrationsIndex,
+)
+from .plan import (
+    MigrationPlan as MigrationPlan,
+    PlannedMigration as PlannedMigration,
+)
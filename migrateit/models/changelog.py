@@ -1,5 +1,6 @@
 import json
 import os
+from collections.abc import Iterable
 from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
@@ -9,6 +10,7 @@ from .migration import Migration
 
 class SupportedDatabase(Enum):
     POSTGRES = "postgres"
+    SQLITE = "sqlite"
 
 
 @dataclass
@@ -38,6 +40,25 @@ class ChangelogFile:
         except (KeyError, TypeError, ValueError) as e:
             raise ValueError(f"Invalid JSON for MigrationsFile: {e}")
 
+    @staticmethod
+    def from_jsonl(lines: Iterable[str], file_path: Path) -> "ChangelogFile":
+        # first line is the header, every other line is a migration
+        records = (json.loads(line) for line in lines if line.strip())
+        try:
+            header = next(records)
+            return ChangelogFile(
+                version=header["version"],
+                database=SupportedDatabase(header.get("database", SupportedDatabase.POSTGRES.value)),
+                migrations=[Migration(**m) for m in records],
+                path=file_path,
+            )
+        except (StopIteration, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid JSON Lines for MigrationsFile: {e}")
+
+    @property
+    def is_jsonl(self) -> bool:
+        return self.path.suffix == ".jsonl"
+
     def to_dict(self) -> dict:
         return {
             "version": self.version,
@@ -48,6 +69,13 @@ class ChangelogFile:
     def to_json(self) -> str:
         return json.dumps(self.to_dict(), indent=4)
 
+    def to_jsonl(self) -> str:
+        header = json.dumps({"version": self.version, "database": self.database.value})
+        return "".join([f"{header}\n"] + [f"{json.dumps(m.to_dict())}\n" for m in self.migrations])
+
+    def serialize(self) -> str:
+        return self.to_jsonl() if self.is_jsonl else self.to_json()
+
     def exist_migration_by_name(self, name: str) -> bool:
         name = os.path.basename(name) if os.path.isabs(name) else name
         prefix = name.split("_", 1)[0]
@@ -1,9 +1,16 @@
 from dataclasses import dataclass
+from enum import Enum
 from pathlib import Path
 
 from .changelog import ChangelogFile
 
 
+class TransactionMode(Enum):
+    PLAN = "plan"  # the whole plan is applied in a single transaction
+    MIGRATION = "migration"  # each migration is committed with its changelog row
+    STATEMENT = "statement"  # each statement is committed on its own (autocommit)
+
+
 @dataclass
 class MigrateItConfig:
     table_name: str
@@ -0,0 +1,78 @@
+from array import array
+from collections.abc import Iterator
+
+from .migration import Migration, MigrationStatus
+
+STATUS_CODES: tuple[MigrationStatus, ...] = tuple(MigrationStatus)
+_STATUS_BYTES = {status: code for code, status in enumerate(STATUS_CODES)}
+
+
+class MigrationGraph:
+    """
+    Compact representation of the migrations DAG.
+
+    Migrations are identified by their position in the changelog and the parent/child adjacency is stored in
+    CSR form (an offsets array indexing into a flat ids array) so no per-node containers are allocated.
+    Statuses are stored as one byte per migration (the index of the status in STATUS_CODES).
+    """
+
+    __slots__ = ("migrations", "ids", "parent_offsets", "parent_ids", "child_offsets", "child_ids", "statuses")
+
+    def __init__(self, migrations: list[Migration], statuses: dict[str, MigrationStatus] | None = None) -> None:
+        self.migrations = migrations
+        self.ids = {m.name: i for i, m in enumerate(migrations)}
+
+        self.parent_offsets = array("I", [0])
+        self.parent_ids = array("I")
+        child_counts = array("I", [0]) * len(migrations)
+        for migration in migrations:
+            for parent in migration.parents:
+                parent_id = self.ids[parent]
+                self.parent_ids.append(parent_id)
+                child_counts[parent_id] += 1
+            self.parent_offsets.append(len(self.parent_ids))
+
+        # children are laid out in changelog order, like the parents are
+        self.child_offsets = array("I", [0])
+        for count in child_counts:
+            self.child_offsets.append(self.child_offsets[-1] + count)
+        self.child_ids = array("I", [0]) * len(self.parent_ids)
+        cursor = array("I", self.child_offsets[:-1])
+        for child_id in range(len(migrations)):
+            for parent_id in self.parents(child_id):
+                self.child_ids[cursor[parent_id]] = child_id
+                cursor[parent_id] += 1
+
+        self.statuses = bytearray([_STATUS_BYTES[MigrationStatus.NOT_APPLIED]]) * len(migrations)
+        if statuses:
+            self.set_statuses(statuses)
+
+    def __len__(self) -> int:
+        return len(self.migrations)
+
+    def __iter__(self) -> Iterator[str]:
+        return (m.name for m in self.migrations)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.ids
+
+    def id_of(self, name: str) -> int:
+        return self.ids[name]
+
+    def name_of(self, migration_id: int) -> str:
+        return self.migrations[migration_id].name
+
+    def parents(self, migration_id: int) -> array:
+        return self.parent_ids[self.parent_offsets[migration_id] : self.parent_offsets[migration_id + 1]]
+
+    def children(self, migration_id: int) -> array:
+        return self.child_ids[self.child_offsets[migration_id] : self.child_offsets[migration_id + 1]]
+
+    def status(self, migration_id: int) -> MigrationStatus:
+        return STATUS_CODES[self.statuses[migration_id]]
+
+    def set_statuses(self, statuses: dict[str, MigrationStatus]) -> None:
+        for name, status in statuses.items():
+            migration_id = self.ids.get(name)
+            if migration_id is not None:
+                self.statuses[migration_id] = _STATUS_BYTES[status]
@@ -0,0 +1,41 @@
+import os
+import stat
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from migrateit.models.migration import COMPRESSION_SUFFIXES
+
+
+@dataclass
+class MigrationsIndex:
+    """
+    Snapshot of the migrations directory taken with a single scan, shared by every command of a run.
+    """
+
+    directory: Path
+    files: dict[str, os.stat_result] = field(default_factory=dict)
+    orphans: list[str] = field(default_factory=list)
+    missing: list[str] = field(default_factory=list)
+    # file names of the migrations stored compressed, by migration name
+    compressed: dict[str, str] = field(default_factory=dict)
+
+    def path(self, name: str) -> Path:
+        return self.directory / self.compressed.get(name, name)
+
+    def stat(self, name: str) -> os.stat_result | None:
+        if name in self.files:
+            return self.files[name]
+
+        # the file may have been created after the directory was scanned (i.e. new or squash commands)
+        for filename in (name, *(f"{name}{suffix}" for suffix in COMPRESSION_SUFFIXES)):
+            try:
+                result = os.stat(self.directory / filename)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            if not stat.S_ISREG(result.st_mode):
+                continue
+            self.files[name] = result
+            if filename != name:
+                self.compressed[name] = filename
+            return result
+        return None
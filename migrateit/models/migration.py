@@ -1,8 +1,18 @@
 import re
+import sys
 from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
 
+# migration files may be stored compressed, the changelog and the database keep the name of the plain SQL file
+COMPRESSION_SUFFIXES = (".gz", ".zst")
+
+
+class MigrationPhase(Enum):
+    # pre-deploy migrations keep the schema compatible with the running code, post-deploy ones can wait for rollout
+    PRE = "pre"
+    POST = "post"
+
 
 class MigrationStatus(Enum):
     APPLIED = "applied"
@@ -11,23 +21,67 @@ class MigrationStatus(Enum):
     NOT_APPLIED = "not_applied"
 
 
-@dataclass
+@dataclass(slots=True)
 class Migration:
     name: str
     initial: bool = False
     parents: list[str] = field(default_factory=list)
+    phase: MigrationPhase = MigrationPhase.PRE
+
+    def __post_init__(self) -> None:
+        # names are repeated as parents of other migrations, share a single string for all of them
+        self.name = sys.intern(self.name)
+        self.parents = [sys.intern(p) for p in self.parents]
+        self.phase = MigrationPhase(self.phase)
 
     @staticmethod
     def is_valid_name(path: Path) -> bool:
-        return path.is_file() and path.name.endswith(".sql") and re.match(r"^\d{4}_", path.name) is not None
+        return path.is_file() and Migration.is_valid_filename(path.name)
+
+    @staticmethod
+    def is_valid_filename(name: str) -> bool:
+        return Migration.logical_name(name).endswith(".sql") and re.match(r"^\d{4}_", name) is not None
+
+    @staticmethod
+    def logical_name(filename: str) -> str:
+        for suffix in COMPRESSION_SUFFIXES:
+            if filename.endswith(suffix):
+                return filename[: -len(suffix)]
+        return filename
 
     @staticmethod
     def is_same_migration_name(name1: str, name2: str) -> bool:
         return name1 == name2 or name1.startswith(name2.split("_")[0])
 
     def to_dict(self) -> dict:
-        return {
+        data = {
             "name": self.name,
             "initial": self.initial,
             "parents": self.parents,
         }
+        # pre-deploy is the default, existing changelogs are serialized as before
+        if self.phase != MigrationPhase.PRE:
+            data["phase"] = self.phase.value
+        return data
+
+
+@dataclass
+class CopyBlock:
+    """
+    COPY ... FROM STDIN statement fed with the bytes [start, end) of a file (the whole file if end is None).
+    """
+
+    statement: str
+    path: Path
+    start: int = 0
+    end: int | None = None
+
+
+@dataclass
+class OnlineAlter:
+    """
+    ALTER TABLE actions applied without blocking the table: through a shadow table kept in sync by triggers.
+    """
+
+    table: str
+    actions: str
@@ -0,0 +1,59 @@
+import json
+from dataclasses import asdict, dataclass, field
+
+from .changelog import SupportedDatabase
+
+PLAN_VERSION = 1
+
+
+@dataclass(frozen=True, slots=True)
+class PlannedMigration:
+    name: str
+    hash: str
+    initial: bool = False
+
+
+@dataclass
+class MigrationPlan:
+    """
+    Migrations to apply (or roll back) in order, built ahead of time against a known state of the migrations table.
+    """
+
+    database: SupportedDatabase
+    table_name: str
+    status_digest: str
+    is_rollback: bool = False
+    migrations: list[PlannedMigration] = field(default_factory=list)
+    created_at: str = ""
+    version: int = PLAN_VERSION
+
+    @staticmethod
+    def from_json(json_str: str) -> "MigrationPlan":
+        data = json.loads(json_str)
+        try:
+            if data["version"] != PLAN_VERSION:
+                raise ValueError(f"unsupported version {data['version']}")
+            return MigrationPlan(
+                database=SupportedDatabase(data["database"]),
+                table_name=data["table_name"],
+                status_digest=data["status_digest"],
+                is_rollback=data["is_rollback"],
+                migrations=[PlannedMigration(**m) for m in data["migrations"]],
+                created_at=data.get("created_at", ""),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid JSON for MigrationPlan: {e}")
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "version": self.version,
+                "database": self.database.value,
+                "table_name": self.table_name,
+                "status_digest": self.status_digest,
+                "is_rollback": self.is_rollback,
+                "created_at": self.created_at,
+                "migrations": [asdict(m) for m in self.migrations],
+            },
+            indent=4,
+        )
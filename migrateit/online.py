@@ -0,0 +1,436 @@
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from psycopg2 import errors, sql
+from psycopg2.extensions import connection as Connection
+from psycopg2.extensions import cursor as Cursor
+
+import migrateit.constants as C
+from migrateit.models import OnlineAlter
+from migrateit.reporters import write_line
+
+ONLINE_STATE_TABLE_SUFFIX = "_online"
+SWAP_ATTEMPTS = 5
+
+PHASE_COPYING = "copying"
+PHASE_DONE = "done"
+
+
+@dataclass
+class OnlineTable:
+    oid: int
+    schema: str
+    name: str
+    primary_key: str
+
+    @property
+    def identifier(self) -> sql.Identifier:
+        return sql.Identifier(self.schema, self.name)
+
+    @property
+    def shadow(self) -> sql.Identifier:
+        return sql.Identifier(self.schema, f"{self.name}__migrateit_shadow")
+
+    @property
+    def sync_function(self) -> sql.Identifier:
+        return sql.Identifier(self.schema, f"{self.name}__migrateit_sync")
+
+    @property
+    def sync_trigger(self) -> sql.Identifier:
+        return sql.Identifier(f"{self.name}__migrateit_sync")
+
+
+def online_state_table(table_name: str) -> str:
+    return f"{table_name}{ONLINE_STATE_TABLE_SUFFIX}"
+
+
+def run_online_alter(
+    connection: Connection,
+    state_table: str,
+    migration_name: str,
+    alter: OnlineAlter,
+    chunk_size: int = C.MIGRATEIT_ONLINE_CHUNK_SIZE,
+    chunk_sleep: float = C.MIGRATEIT_ONLINE_CHUNK_SLEEP,
+    lock_timeout: str = C.MIGRATEIT_ONLINE_LOCK_TIMEOUT,
+    throttle: Callable[[], float] | None = None,
+) -> int:
+    """
+    Apply ALTER TABLE actions without holding an ACCESS EXCLUSIVE lock while the table is rewritten.
+
+    A shadow table with the new definition is kept in sync with triggers while the rows are copied in throttled
+    chunks, then swapped with the original one under a short lock. Every step commits its progress in the state
+    table so an interrupted change resumes where it stopped.
+    Args:
+        connection: A connection dedicated to the change, it is committed after every step.
+        state_table: The table tracking the progress of the online changes.
+        migration_name: The migration the change belongs to.
+        alter: The table and ALTER TABLE actions to apply.
+        chunk_size: The number of rows copied per transaction.
+        chunk_sleep: Seconds to wait between chunks to throttle the copy.
+        lock_timeout: Maximum wait for the locks taken when creating the triggers and swapping the tables.
+        throttle: Called between chunks, blocks while the copy must pause (i.e. replicas lagging behind).
+    Returns:
+        The number of rows copied.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql.SQL(
+                """CREATE TABLE IF NOT EXISTS {} (
+                    migration_name TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    phase TEXT NOT NULL,
+                    last_key TEXT,
+                    rows_copied BIGINT NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (migration_name, table_name)
+                );"""
+            ).format(sql.SQL(state_table))
+        )
+        cursor.execute(
+            sql.SQL("SELECT phase FROM {} WHERE migration_name = %s AND table_name = %s;").format(sql.SQL(state_table)),
+            (migration_name, alter.table),
+        )
+        state = cursor.fetchone()
+    connection.commit()
+
+    if state and state[0] == PHASE_DONE:
+        write_line(f"\tOnline change of {alter.table} already done")
+        return 0
+
+    with connection.cursor() as cursor:
+        table = _get_online_table(cursor, alter.table)
+        if not state:
+            _create_shadow(cursor, state_table, migration_name, alter, table, lock_timeout)
+    connection.commit()
+
+    rows = _copy_chunks(
+        connection, state_table, migration_name, alter.table, table, chunk_size, chunk_sleep, throttle=throttle
+    )
+    _swap(connection, state_table, migration_name, alter.table, table, lock_timeout, chunk_sleep)
+    return rows
+
+
+def clear_online_alters(cursor: Cursor, state_table: str, migration_name: str) -> None:
+    """
+    Forget the online changes of a rolled back migration so they run again when it is reapplied.
+    """
+    cursor.execute("SELECT to_regclass(%s);", (state_table,))
+    row = cursor.fetchone()
+    if row and row[0]:
+        cursor.execute(
+            sql.SQL("DELETE FROM {} WHERE migration_name = %s;").format(sql.SQL(state_table)),
+            (migration_name,),
+        )
+
+
+def _get_online_table(cursor: Cursor, table_name: str) -> OnlineTable:
+    cursor.execute(
+        """SELECT c.oid, n.nspname, c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.oid = to_regclass(%s);""",
+        (table_name,),
+    )
+    row = cursor.fetchone()
+    if not row:
+        raise ValueError(f"Table {table_name} does not exist")
+    oid, schema, name = row
+
+    cursor.execute(
+        """SELECT a.attname FROM pg_index i JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = %s AND i.indisprimary;""",
+        (oid,),
+    )
+    primary_key = [r[0] for r in cursor.fetchall()]
+    if len(primary_key) != 1:
+        raise ValueError(f"Online changes require {table_name} to have a single column primary key")
+
+    return OnlineTable(oid=oid, schema=schema, name=name, primary_key=primary_key[0])
+
+
+def _get_columns(cursor: Cursor, relation: sql.Identifier) -> dict[str, str]:
+    cursor.execute(
+        sql.SQL(
+            """SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute
+            WHERE attrelid = {}::regclass AND attnum > 0 AND NOT attisdropped AND attgenerated = '' ORDER BY attnum;"""
+        ).format(sql.Literal(relation.as_string(cursor))),
+    )
+    return dict(cursor.fetchall())
+
+
+def _get_shared_columns(cursor: Cursor, table: OnlineTable) -> dict[str, str]:
+    """The columns of the shadow table also in the original one, with their new type."""
+    original = _get_columns(cursor, table.identifier)
+    return {name: type_ for name, type_ in _get_columns(cursor, table.shadow).items() if name in original}
+
+
+def _cast_columns(columns: dict[str, str], prefix: str = "") -> sql.Composable:
+    return sql.SQL(", ").join(
+        sql.SQL("{}{}::{}").format(sql.SQL(prefix), sql.Identifier(name), sql.SQL(type_))
+        for name, type_ in columns.items()
+    )
+
+
+def _create_shadow(
+    cursor: Cursor,
+    state_table: str,
+    migration_name: str,
+    alter: OnlineAlter,
+    table: OnlineTable,
+    lock_timeout: str,
+) -> None:
+    # the original table is dropped on swap, anything pointing to it would break
+    cursor.execute("SELECT conname FROM pg_constraint WHERE contype = 'f' AND confrelid = %s;", (table.oid,))
+    if references := [r[0] for r in cursor.fetchall()]:
+        raise ValueError(f"Table {alter.table} is referenced by foreign keys: {', '.join(references)}")
+    cursor.execute(
+        """SELECT DISTINCT r.ev_class::regclass::text FROM pg_depend d JOIN pg_rewrite r ON r.oid = d.objid
+        WHERE d.refobjid = %s AND r.ev_class <> %s;""",
+        (table.oid, table.oid),
+    )
+    if views := [r[0] for r in cursor.fetchall()]:
+        raise ValueError(f"Table {alter.table} is used by views: {', '.join(views)}")
+    # the shadow table is created with LIKE, which does not copy triggers nor row level security
+    cursor.execute("SELECT tgname FROM pg_trigger WHERE tgrelid = %s AND NOT tgisinternal;", (table.oid,))
+    if triggers := [r[0] for r in cursor.fetchall()]:
+        raise ValueError(f"Table {alter.table} has triggers: {', '.join(triggers)}")
+    cursor.execute(
+        """SELECT c.relrowsecurity OR c.relforcerowsecurity OR EXISTS (SELECT FROM pg_policy WHERE polrelid = c.oid)
+        FROM pg_class c WHERE c.oid = %s;""",
+        (table.oid,),
+    )
+    row = cursor.fetchone()
+    if row and row[0]:
+        raise ValueError(f"Table {alter.table} has row level security policies")
+
+    write_line(f"\tCreating shadow table for {alter.table}")
+    cursor.execute(sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING ALL);").format(table.shadow, table.identifier))
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE contype = 'f' AND conrelid = %s;",
+        (table.oid,),
+    )
+    for name, definition in cursor.fetchall():
+        cursor.execute(
+            sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {};").format(
+                table.shadow, sql.Identifier(name), sql.SQL(definition)
+            )
+        )
+    cursor.execute(sql.SQL("ALTER TABLE {} {};").format(table.shadow, sql.SQL(alter.actions)))
+
+    columns = _get_shared_columns(cursor, table)
+    primary_key = sql.Identifier(table.primary_key)
+    cursor.execute(
+        sql.SQL(
+            """CREATE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $sync$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    DELETE FROM {shadow} WHERE {pk} = OLD.{pk};
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO {shadow} ({columns}) OVERRIDING SYSTEM VALUE VALUES ({values});
+                END IF;
+                RETURN NULL;
+            END
+            $sync$;"""
+        ).format(
+            function=table.sync_function,
+            shadow=table.shadow,
+            pk=primary_key,
+            columns=sql.SQL(", ").join(map(sql.Identifier, columns)),
+            values=_cast_columns(columns, prefix="NEW."),
+        )
+    )
+    cursor.execute("SELECT set_config('lock_timeout', %s, true);", (lock_timeout,))
+    cursor.execute(
+        sql.SQL("CREATE TRIGGER {} AFTER INSERT OR UPDATE OR DELETE ON {} FOR EACH ROW EXECUTE FUNCTION {}();").format(
+            table.sync_trigger, table.identifier, table.sync_function
+        )
+    )
+    cursor.execute(
+        sql.SQL("INSERT INTO {} (migration_name, table_name, phase) VALUES (%s, %s, %s);").format(sql.SQL(state_table)),
+        (migration_name, alter.table, PHASE_COPYING),
+    )
+
+
+def _copy_chunks(
+    connection: Connection,
+    state_table: str,
+    migration_name: str,
+    table_name: str,
+    table: OnlineTable,
+    chunk_size: int,
+    chunk_sleep: float,
+    throttle: Callable[[], float] | None = None,
+) -> int:
+    state = sql.SQL(state_table)
+    with connection.cursor() as cursor:
+        columns = _get_shared_columns(cursor, table)
+        cursor.execute(
+            sql.SQL("SELECT last_key, rows_copied FROM {} WHERE migration_name = %s AND table_name = %s;").format(
+                state
+            ),
+            (migration_name, table_name),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            raise ValueError(f"Online change of {table_name} has no saved progress")
+        last_key, rows_copied = row
+    connection.commit()
+
+    # rows are locked while copied so concurrent changes wait for the chunk and are then synced by the triggers
+    pk = sql.Identifier(table.primary_key)
+    copy_chunk = sql.SQL(
+        """WITH chunk AS (
+            SELECT {columns} FROM {table} WHERE {after} ORDER BY {pk} LIMIT %(limit)s FOR SHARE
+        ), copied AS (
+            INSERT INTO {shadow} ({columns}) OVERRIDING SYSTEM VALUE SELECT {values} FROM chunk
+            ON CONFLICT DO NOTHING
+        )
+        SELECT max({pk})::text, count(*) FROM chunk;"""
+    )
+    update_state = sql.SQL(
+        """UPDATE {} SET last_key = %s, rows_copied = rows_copied + %s, updated_at = CURRENT_TIMESTAMP
+        WHERE migration_name = %s AND table_name = %s;"""
+    ).format(state)
+
+    copied, reported = 0, time.monotonic()
+    while True:
+        after = sql.SQL("{} > %(last_key)s").format(pk) if last_key is not None else sql.SQL("true")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                copy_chunk.format(
+                    columns=sql.SQL(", ").join(map(sql.Identifier, columns)),
+                    values=_cast_columns(columns),
+                    table=table.identifier,
+                    after=after,
+                    pk=pk,
+                    shadow=table.shadow,
+                ),
+                {"limit": chunk_size, "last_key": last_key},
+            )
+            row = cursor.fetchone()
+            assert row is not None  # an aggregate always returns a row
+            chunk_last_key, count = row
+            if count:
+                cursor.execute(update_state, (chunk_last_key, count, migration_name, table_name))
+        connection.commit()
+        if not count:
+            return copied
+
+        last_key = chunk_last_key
+        copied += count
+        if time.monotonic() - reported >= C.MIGRATEIT_PROGRESS_INTERVAL:
+            write_line(f"\tCopied {rows_copied + copied} rows of {table_name} into its shadow table")
+            reported = time.monotonic()
+        if chunk_sleep:
+            time.sleep(chunk_sleep)
+        if throttle is not None:
+            throttle()
+
+
+def _swap(
+    connection: Connection,
+    state_table: str,
+    migration_name: str,
+    table_name: str,
+    table: OnlineTable,
+    lock_timeout: str,
+    retry_sleep: float,
+) -> None:
+    for attempt in range(1, SWAP_ATTEMPTS + 1):
+        try:
+            with connection.cursor() as cursor:
+                _swap_tables(cursor, table, lock_timeout)
+                cursor.execute(
+                    sql.SQL(
+                        """UPDATE {} SET phase = %s, updated_at = CURRENT_TIMESTAMP
+                        WHERE migration_name = %s AND table_name = %s;"""
+                    ).format(sql.SQL(state_table)),
+                    (PHASE_DONE, migration_name, table_name),
+                )
+            connection.commit()
+            write_line(f"\tSwapped {table_name} with its shadow table")
+            return
+        except errors.LockNotAvailable:
+            connection.rollback()
+            if attempt == SWAP_ATTEMPTS:
+                raise
+            write_line(f"\tCould not lock {table_name} to swap it within {lock_timeout}, retrying")
+            time.sleep(max(retry_sleep, 1.0) * attempt)
+
+
+def _swap_tables(cursor: Cursor, table: OnlineTable, lock_timeout: str) -> None:
+    cursor.execute("SELECT set_config('lock_timeout', %s, true);", (lock_timeout,))
+    cursor.execute(sql.SQL("LOCK TABLE {} IN ACCESS EXCLUSIVE MODE;").format(table.identifier))
+
+    # sequences: serial ones move to the shadow table, identity ones continue where the original ones were
+    shadow_name = table.shadow.as_string(cursor)
+    for column in _get_shared_columns(cursor, table):
+        cursor.execute(
+            "SELECT pg_get_serial_sequence(%s, %s), pg_get_serial_sequence(%s, %s);",
+            (table.identifier.as_string(cursor), column, shadow_name, column),
+        )
+        row = cursor.fetchone()
+        assert row is not None
+        original, shadow = row
+        if original and not shadow:
+            cursor.execute(
+                sql.SQL("ALTER SEQUENCE {} OWNED BY {}.{};").format(
+                    sql.SQL(original), table.shadow, sql.Identifier(column)
+                )
+            )
+        elif original and shadow and original != shadow:
+            cursor.execute(
+                sql.SQL("SELECT setval(%s, last_value, is_called) FROM {};").format(sql.SQL(original)), (shadow,)
+            )
+
+    _copy_privileges(cursor, table)
+    indexes = _get_index_names(cursor, table.identifier)
+    cursor.execute(sql.SQL("DROP TRIGGER {} ON {};").format(table.sync_trigger, table.identifier))
+    cursor.execute(sql.SQL("DROP FUNCTION {}();").format(table.sync_function))
+    cursor.execute(sql.SQL("DROP TABLE {};").format(table.identifier))
+    cursor.execute(sql.SQL("ALTER TABLE {} RENAME TO {};").format(table.shadow, sql.Identifier(table.name)))
+    for definition, name in _get_index_names(cursor, table.identifier).items():
+        if definition in indexes and indexes[definition] != name:
+            cursor.execute(
+                sql.SQL("ALTER INDEX {} RENAME TO {};").format(
+                    sql.Identifier(table.schema, name), sql.Identifier(indexes[definition])
+                )
+            )
+
+
+def _copy_privileges(cursor: Cursor, table: OnlineTable) -> None:
+    # grants are read under the swap lock, so the ones changed while copying the rows are not lost
+    columns = _get_shared_columns(cursor, table)
+    cursor.execute(
+        """SELECT NULL, r.rolname, a.privilege_type, a.is_grantable
+        FROM pg_class c CROSS JOIN aclexplode(c.relacl) a LEFT JOIN pg_roles r ON r.oid = a.grantee
+        WHERE c.oid = %s
+        UNION ALL
+        SELECT att.attname, r.rolname, a.privilege_type, a.is_grantable
+        FROM pg_attribute att CROSS JOIN aclexplode(att.attacl) a LEFT JOIN pg_roles r ON r.oid = a.grantee
+        WHERE att.attrelid = %s AND att.attnum > 0 AND NOT att.attisdropped;""",
+        (table.oid, table.oid),
+    )
+    for column, grantee, privilege, grantable in cursor.fetchall():
+        if column is not None and column not in columns:
+            continue  # dropped by the change
+        cursor.execute(
+            sql.SQL("GRANT {}{} ON {} TO {}{};").format(
+                sql.SQL(privilege),
+                sql.SQL(" ({})").format(sql.Identifier(column)) if column is not None else sql.SQL(""),
+                table.shadow,
+                sql.Identifier(grantee) if grantee is not None else sql.SQL("PUBLIC"),
+                sql.SQL(" WITH GRANT OPTION") if grantable else sql.SQL(""),
+            )
+        )
+
+
+def _get_index_names(cursor: Cursor, relation: sql.Identifier) -> dict[str, str]:
+    # indexes are matched by their definition without the index and table names
+    cursor.execute(
+        sql.SQL(
+            """SELECT c.relname, i.indisunique, substring(pg_get_indexdef(i.indexrelid) FROM ' USING .*$')
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE i.indrelid = {}::regclass;"""
+        ).format(sql.Literal(relation.as_string(cursor)))
+    )
+    return {f"{unique}{definition}": name for name, unique, definition in cursor.fetchall()}
@@ -0,0 +1,76 @@
+import contextlib
+import cProfile
+import json
+import os
+import sys
+from collections.abc import Generator, Iterator
+from pathlib import Path
+
+from migrateit.metrics import RunMetrics, get_metrics, timed
+from migrateit.reporters import write_lines
+from migrateit.tree import atomic_write
+
+
+def render_profile(metrics: RunMetrics) -> Iterator[str]:
+    """
+    Render the time breakdown by phase of a run, phases are listed in the order they first started.
+    Nested phases (i.e. hash_check inside a status query) are also included in their parent total.
+    """
+    calls: dict[str, int] = {}
+    for phase, _, _ in sorted(metrics.spans, key=lambda span: span[1]):
+        calls[phase] = calls.get(phase, 0) + 1
+    total = metrics.phases.get("total") or sum(metrics.phases.values()) or 1.0
+
+    yield f"\n{'Phase':<20} | {'Calls':>8} | {'Seconds':>10} | {'%':>6}"
+    yield "-" * 54
+    for phase, count in calls.items():
+        seconds = metrics.phases[phase]
+        yield f"{phase:<20} | {count:>8} | {seconds:>10.4f} | {100 * seconds / total:>6.1f}"
+
+
+def write_chrome_trace(path: Path, metrics: RunMetrics) -> None:
+    """
+    Write the spans of a run in the Chrome trace event format (chrome://tracing, Perfetto, speedscope).
+    Args:
+        path: The .json file to write.
+        metrics: The metrics of the run.
+    """
+    pid = os.getpid()
+    events = [
+        {"name": phase, "cat": "migrateit", "ph": "X", "ts": start * 1e6, "dur": duration * 1e6, "pid": pid, "tid": 0}
+        for phase, start, duration in sorted(metrics.spans, key=lambda span: span[1])
+    ]
+    atomic_write(path, json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+
+
+@contextlib.contextmanager
+def profile(
+    enabled: bool = True,
+    stats_file: Path | None = None,
+    trace_file: Path | None = None,
+) -> Generator[None]:
+    """
+    Time the whole command and, once it finishes, print the breakdown by phase to stderr.
+    Args:
+        enabled: Whether to print the breakdown table.
+        stats_file: Optional file to dump the cProfile stats of the command to (readable with pstats/snakeviz).
+        trace_file: Optional file to write the Chrome trace of the phases to.
+    """
+    profiler = cProfile.Profile() if stats_file else None
+    try:
+        with timed("total"):
+            if profiler:
+                profiler.enable()
+            try:
+                yield
+            finally:
+                if profiler:
+                    profiler.disable()
+    finally:
+        metrics = get_metrics()
+        if profiler and stats_file:
+            profiler.dump_stats(stats_file)
+        if trace_file:
+            write_chrome_trace(trace_file, metrics)
+        if enabled:
+            write_lines(render_profile(metrics), stream=sys.stderr.buffer)
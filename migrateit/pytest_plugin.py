@@ -0,0 +1,75 @@
+import uuid
+from collections.abc import Generator
+from pathlib import Path
+
+import psycopg2
+import pytest
+
+import migrateit.constants as C
+from migrateit.cli import cmd_template
+from migrateit.clients import PsqlClient
+from migrateit.models import MigrateItConfig
+from migrateit.template import clone_template, database_url, drop_database
+from migrateit.tree import find_changelog_file, load_changelog_file
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addini(
+        "migrateit_template",
+        help="Name of the migrated template database cloned by the migrateit fixtures.",
+        default=C.MIGRATEIT_TEMPLATE_DATABASE,
+    )
+
+
+@pytest.fixture(scope="session")
+def migrateit_template(request: pytest.FixtureRequest) -> str:
+    """
+    Make sure the template database is migrated to the current changelog. Rebuilt only when the digest changes.
+    """
+    template_name = request.config.getini("migrateit_template")
+    client = _get_client()
+    try:
+        cmd_template(client, template_name=template_name)
+    finally:
+        client.connection.close()
+    return template_name
+
+
+@pytest.fixture(scope="session")
+def migrateit_worker_db(request: pytest.FixtureRequest, migrateit_template: str) -> Generator[str]:
+    """
+    Connection string of a migrated database shared by all the tests of a pytest-xdist worker.
+    """
+    worker_id = getattr(request.config, "workerinput", {}).get("workerid", "master")
+    yield from _clone(migrateit_template, f"{migrateit_template}_{worker_id}")
+
+
+@pytest.fixture
+def migrateit_db(migrateit_template: str) -> Generator[str]:
+    """
+    Connection string of a fresh migrated database for a single test.
+    """
+    yield from _clone(migrateit_template, f"{migrateit_template}_{uuid.uuid4().hex[:12]}")
+
+
+def _clone(template_name: str, name: str) -> Generator[str]:
+    client = _get_client()
+    try:
+        drop_database(client, name)
+        clone_template(client, template_name, name)
+        yield database_url(name)
+        drop_database(client, name)
+    finally:
+        client.connection.close()
+
+
+def _get_client() -> PsqlClient:
+    root = Path(C.MIGRATEIT_ROOT_DIR)
+    config = MigrateItConfig(
+        table_name=C.MIGRATEIT_MIGRATIONS_TABLE,
+        migrations_dir=root / "migrations",
+        changelog=load_changelog_file(find_changelog_file(root)),
+    )
+    conn = psycopg2.connect(PsqlClient.get_environment_url())
+    conn.autocommit = False
+    return PsqlClient(conn, config)
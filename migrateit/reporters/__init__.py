@@ -13,6 +13,7 @@ from .errors import (
     error_handler as error_handler,
 )
 from .logs import (
+    logger as logger,
     logging_handler as logging_handler,
 )
 from .output import (
@@ -20,8 +21,11 @@ from .output import (
     write as write,
     write_line as write_line,
     write_line_b as write_line_b,
+    write_lines as write_lines,
     print_logo as print_logo,
     print_dag as print_dag,
     print_list as print_list,
+    print_json as print_json,
+    render_dag as render_dag,
     pretty_print_sql_error as pretty_print_sql_error,
 )
@@ -1,6 +1,8 @@
 import contextlib
 import logging
+import sys
 from collections.abc import Generator
+from typing import IO
 
 from ._utils import RED, YELLOW, format_color
 from .output import write_line
@@ -16,9 +18,10 @@ LOG_LEVEL_COLORS = {
 
 
 class LoggingHandler(logging.Handler):
-    def __init__(self, use_color: bool) -> None:
+    def __init__(self, use_color: bool, stream: IO[bytes] | None = None) -> None:
         super().__init__()
         self.use_color = use_color
+        self.stream = stream
 
     def emit(self, record: logging.LogRecord) -> None:
         level_msg = format_color(
@@ -26,12 +29,12 @@ class LoggingHandler(logging.Handler):
             LOG_LEVEL_COLORS[record.levelname],
             self.use_color,
         )
-        write_line(f"{level_msg} {record.getMessage()}")
+        write_line(f"{level_msg} {record.getMessage()}", stream=self.stream or sys.stdout.buffer)
 
 
 @contextlib.contextmanager
-def logging_handler(use_color: bool) -> Generator[None]:
-    handler = LoggingHandler(use_color)
+def logging_handler(use_color: bool, stream: IO[bytes] | None = None) -> Generator[None]:
+    handler = LoggingHandler(use_color, stream)
     logger.addHandler(handler)
     logger.setLevel(logging.INFO)
     try:
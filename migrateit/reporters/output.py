@@ -1,11 +1,12 @@
 import contextlib
+import json
 import re
 import sys
+from collections.abc import Iterable, Iterator
 from typing import IO, Any
 
-from psycopg2 import ProgrammingError
-
-from migrateit.models.migration import Migration, MigrationStatus
+from migrateit.models.graph import MigrationGraph
+from migrateit.models.migration import MigrationStatus
 
 from ._utils import GREEN, NORMAL
 
@@ -58,38 +59,122 @@ def print_logo() -> None:
     write_line(NORMAL)
 
 
-def print_dag(
-    name: str,
-    children: dict[str, list[Migration]],
+def write_lines(lines: Iterable[str], stream: IO[bytes] | None = None) -> None:
+    """Write many lines through the buffered stream, flushing only once at the end."""
+    out = stream if stream is not None else sys.stdout.buffer
+    for line in lines:
+        out.write(line.encode())
+        out.write(b"\n")
+    out.flush()
+
+
+def render_dag(graph: MigrationGraph, collapse: int | None = None) -> Iterator[str]:
+    """Render the migrations DAG depth first, optionally collapsing linear chains longer than `collapse`."""
+    seen = bytearray(len(graph))
+    stack: list[tuple[int, int]] = [(0, 0)] if len(graph) else []
+
+    while stack:
+        migration_id, level = stack.pop()
+
+        # indicate repeated visit
+        name = graph.name_of(migration_id)
+        repeat_marker = " (*)" if seen[migration_id] else ""
+        yield f"{_indent(level)}{name:<40} | {_status_str(graph.status(migration_id))}{repeat_marker}"
+        if seen[migration_id]:
+            continue
+        seen[migration_id] = 1
+
+        chain = _linear_chain(graph, migration_id) if collapse else []
+        if collapse and len(chain) > collapse:
+            hidden = chain[:-1]
+            for hidden_id in hidden:
+                seen[hidden_id] = 1
+            yield f"{_indent(level + 1)}{f'... {len(hidden)} migrations':<40} | {_chain_summary(graph, hidden)}"
+            stack.append((chain[-1], level + 1))
+            continue
+
+        for child in reversed(graph.children(migration_id)):
+            stack.append((child, level + 1))
+
+
+def print_dag(graph: MigrationGraph, collapse: int | None = None, stream: IO[bytes] | None = None) -> None:
+    write_lines(render_dag(graph, collapse), stream)
+
+
+def print_list(graph: MigrationGraph, stream: IO[bytes] | None = None) -> None:
+    write_lines(
+        (f"{graph.name_of(i):<40} | {_status_str(graph.status(i))}" for i in range(len(graph))),
+        stream,
+    )
+
+
+def print_json(
+    graph: MigrationGraph,
     status_map: dict[str, MigrationStatus],
-    level: int = 0,
-    seen: set[str] = set(),
+    ndjson: bool = False,
+    extra: dict[str, Any] | None = None,
+    stream: IO[bytes] | None = None,
 ) -> None:
-    indent = "  " * level + ("└─ " if level > 0 else "")
-    status = status_map[name]
-    status_str = f"{STATUS_COLORS[status]}{status.name.replace('_', ' ').title()}{STATUS_COLORS['reset']}"
+    """Print the migrations as a JSON document or as one JSON object per line (ndjson)."""
+    records: list[dict[str, Any]] = [
+        {
+            "name": migration.name,
+            "status": graph.status(i).value,
+            "initial": migration.initial,
+            "parents": migration.parents,
+            "phase": migration.phase.value,
+        }
+        for i, migration in enumerate(graph.migrations)
+    ] + [
+        {"name": name, "status": status.value, "initial": False, "parents": [], "phase": None}
+        for name, status in status_map.items()
+        if name not in graph
+    ]
+
+    if ndjson:
+        write_lines((json.dumps(r) for r in records), stream)
+        return
 
-    # indicate repeated visit
-    repeat_marker = " (*)" if name in seen else ""
-    write_line(f"{indent}{name:<40} | {status_str}{repeat_marker}")
+    summary = {status.value: 0 for status in MigrationStatus}
+    for record in records:
+        summary[record["status"]] += 1
+    document = {
+        "migrations": records,
+        "summary": summary,
+        "pending": summary[MigrationStatus.NOT_APPLIED.value],
+        **(extra or {}),
+    }
+    write_lines([json.dumps(document)], stream)
+
+
+def _indent(level: int) -> str:
+    return "  " * level + ("└─ " if level > 0 else "")
+
+
+def _status_str(status: MigrationStatus) -> str:
+    return f"{STATUS_COLORS[status]}{status.name.replace('_', ' ').title()}{STATUS_COLORS['reset']}"
 
-    if name in seen:
-        return
-    seen.add(name)
 
-    for child in children.get(name, []):
-        print_dag(child.name, children, status_map, level + 1, seen)
+def _linear_chain(graph: MigrationGraph, migration_id: int) -> list[int]:
+    # descendants reached following single child -> single parent links
+    chain: list[int] = []
+    children = graph.children(migration_id)
+    while len(children) == 1 and len(graph.parents(children[0])) == 1:
+        chain.append(children[0])
+        children = graph.children(children[0])
+    return chain
 
 
-def print_list(children: dict[str, list[Migration]], status_map: dict[str, MigrationStatus]) -> None:
-    for name in children.keys():
-        status = status_map[name]
-        status_str = f"{STATUS_COLORS[status]}{status.name.replace('_', ' ').title()}{STATUS_COLORS['reset']}"
-        write_line(f"{name:<40} | {status_str}")
+def _chain_summary(graph: MigrationGraph, migration_ids: list[int]) -> str:
+    counts: dict[MigrationStatus, int] = {}
+    for migration_id in migration_ids:
+        status = graph.status(migration_id)
+        counts[status] = counts.get(status, 0) + 1
+    return ", ".join(f"{count} {_status_str(status)}" for status, count in counts.items())
 
 
-def pretty_print_sql_error(error: ProgrammingError, sql_query: str):
-    error_message = error.pgerror or str(error)
+def pretty_print_sql_error(error: Exception, sql_query: str):
+    error_message = getattr(error, "pgerror", None) or str(error)
 
     write_line("❌ SQL Syntax Error:")
     write_line("-" * 80)
@@ -0,0 +1,197 @@
+import re
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from migrateit.lint import ignored_rules
+from migrateit.tree import ROLLBACK_SPLIT_TAG, split_migration_file, split_sql_statements, write_migration_file
+
+_IDENTIFIER = r'(?:"(?:[^"]|"")+"|[^\W\d][\w$]*)'
+_QUALIFIED = rf"{_IDENTIFIER}(?:\.{_IDENTIFIER})?"
+_ALTER_TABLE = rf"(?P<prefix>ALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?(?:ONLY\s+)?(?P<table>{_QUALIFIED}))\s+"
+_CREATED_TABLE_PATTERN = re.compile(
+    rf"CREATE\s+(?:UNLOGGED\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?P<table>{_QUALIFIED})", re.I
+)
+_TRANSACTION_CONTROL_PATTERN = re.compile(r"(?:BEGIN|START\s+TRANSACTION|COMMIT|END|ROLLBACK|ABORT)\b", re.I)
+_QUOTED_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\$(\w*)\$.*?\$\1\$", re.S)
+
+MAX_IDENTIFIER_LENGTH = 63
+
+
+@dataclass(frozen=True)
+class RewriteRule:
+    """
+    Replace a statement fully matching the pattern by its low-lock equivalent statements.
+    The pattern is matched on the whole statement without its semicolon.
+    """
+
+    id: str
+    pattern: re.Pattern[str]
+    rewrite: Callable[[re.Match[str]], list[str]] = field(repr=False)
+
+
+@dataclass(frozen=True, slots=True)
+class Rewrite:
+    rule: str
+    line: int
+    statement: str
+    statements: list[str]
+
+
+def _concurrent_index(match: re.Match[str]) -> list[str]:
+    return [f"{match['head']} CONCURRENTLY {match['rest']}"]
+
+
+def _not_valid_foreign_key(match: re.Match[str]) -> list[str]:
+    prefix, name = match["prefix"], match["name"]
+    return [
+        f"{prefix} ADD CONSTRAINT {name} {match['foreign_key']} NOT VALID",
+        f"{prefix} VALIDATE CONSTRAINT {name}",
+    ]
+
+
+def _checked_not_null(match: re.Match[str]) -> list[str]:
+    # a validated CHECK (column IS NOT NULL) lets SET NOT NULL skip the full table scan
+    prefix, column = match["prefix"], match["column"]
+    name = _constraint_name(match["table"], column, "not_null")
+    return [
+        f"{prefix} ADD CONSTRAINT {name} CHECK ({column} IS NOT NULL) NOT VALID",
+        f"{prefix} VALIDATE CONSTRAINT {name}",
+        f"{prefix} ALTER COLUMN {column} SET NOT NULL",
+        f"{prefix} DROP CONSTRAINT {name}",
+    ]
+
+
+REWRITE_RULES: dict[str, RewriteRule] = {
+    rule.id: rule
+    for rule in (
+        RewriteRule(
+            "create-index-not-concurrently",
+            re.compile(
+                rf"(?P<head>CREATE\s+(?:UNIQUE\s+)?INDEX)\s+(?!CONCURRENTLY\b)"
+                rf"(?P<rest>(?:.*?\s)?ON\s+(?!ONLY\b)(?P<table>{_QUALIFIED}).*)",
+                re.I | re.S,
+            ),
+            _concurrent_index,
+        ),
+        RewriteRule(
+            "add-foreign-key-valid",
+            re.compile(
+                rf"{_ALTER_TABLE}ADD\s+CONSTRAINT\s+(?P<name>{_IDENTIFIER})\s+"
+                r"(?P<foreign_key>FOREIGN\s+KEY\s*\((?!.*\bNOT\s+VALID\b).*)",
+                re.I | re.S,
+            ),
+            _not_valid_foreign_key,
+        ),
+        RewriteRule(
+            "set-not-null",
+            re.compile(
+                rf"{_ALTER_TABLE}ALTER\s+(?:COLUMN\s+)?(?P<column>{_IDENTIFIER})\s+SET\s+NOT\s+NULL", re.I | re.S
+            ),
+            _checked_not_null,
+        ),
+    )
+}
+
+
+def rewrite_sql(sql: str, rules: Iterable[str] | None = None) -> tuple[str, list[Rewrite]]:
+    """
+    Rewrite the statements that hold long locks into their low-lock equivalents.
+    The rewritten statements split the work over several transactions (and CREATE INDEX CONCURRENTLY cannot run in
+    one at all), so they only keep their guarantees when every statement commits on its own.
+    Statements on tables created in the same SQL, holding several actions or comments, and the ones silenced with a
+    `-- migrateit-lint: ignore <rule>` comment are left untouched. Indexes are not built concurrently if the SQL
+    controls its own transactions, as CREATE INDEX CONCURRENTLY would fail inside its BEGIN/COMMIT block.
+    Args:
+        sql: The SQL to rewrite.
+        rules: The rules to apply, all of them if not provided.
+    Returns:
+        The rewritten SQL and the rewrites done, in order.
+    """
+    enabled = [REWRITE_RULES[r] for r in (rules if rules is not None else REWRITE_RULES)]
+    if any(_TRANSACTION_CONTROL_PATTERN.match(statement) for _, statement in split_sql_statements(sql)):
+        enabled = [r for r in enabled if r.id != "create-index-not-concurrently"]
+    lines = sql.splitlines()
+
+    parts: list[str] = []
+    rewrites: list[Rewrite] = []
+    new_tables: set[str] = set()
+    position = 0
+    for line, statement in split_sql_statements(sql):
+        start = sql.index(statement, position)
+        parts.append(sql[position:start])
+        position = start + len(statement)
+
+        code = statement.removesuffix(";").rstrip()
+        if created := _CREATED_TABLE_PATTERN.match(code):
+            new_tables.add(_unquote(created["table"]))
+        # comments inside the statement would be lost
+        has_comments = "--" in statement or "/*" in statement
+        ignored = ignored_rules(lines, line, statement)
+        rewrite = None if has_comments else _rewrite_statement(enabled, code, new_tables, ignored)
+        if not rewrite:
+            parts.append(statement)
+            continue
+
+        rule, statements = rewrite
+        rewrites.append(Rewrite(rule.id, line, statement, statements))
+        parts.append("\n".join(f"{s};" for s in statements))
+    parts.append(sql[position:])
+    return "".join(parts), rewrites
+
+
+def rewrite_migration_file(path: Path, rules: Iterable[str] | None = None, dry_run: bool = False) -> list[Rewrite]:
+    """
+    Rewrite the migration SQL of a migration file in place, the rollback is kept as is.
+    Args:
+        path: The migration file.
+        rules: The rules to apply, all of them if not provided.
+        dry_run: Only report the rewrites without changing the file.
+    Returns:
+        The rewrites done.
+    """
+    sql, rollback = split_migration_file(path)
+    new_sql, rewrites = rewrite_sql(sql, rules)
+    if rewrites and not dry_run:
+        write_migration_file(path, f"{new_sql}{ROLLBACK_SPLIT_TAG}{rollback}")
+    return rewrites
+
+
+def _rewrite_statement(
+    rules: list[RewriteRule],
+    code: str,
+    new_tables: set[str],
+    ignored: set[str],
+) -> tuple[RewriteRule, list[str]] | None:
+    if "," in _strip_parentheses(code):
+        return None  # several actions in one ALTER TABLE, rewriting one would reorder them
+    for rule in rules:
+        match = rule.pattern.fullmatch(code)
+        if not match or rule.id in ignored:
+            continue
+        if _unquote(match["table"]) in new_tables:
+            return None  # new tables are empty, the plain statement is already cheap
+        return rule, rule.rewrite(match)
+    return None
+
+
+def _strip_parentheses(code: str) -> str:
+    code = _QUOTED_PATTERN.sub("''", code)
+    while (stripped := re.sub(r"\([^()]*\)", "", code)) != code:
+        code = stripped
+    return code
+
+
+def _unquote(name: str) -> str:
+    return ".".join(
+        part[1:-1].replace('""', '"') if part.startswith('"') else part.lower()
+        for part in re.findall(_IDENTIFIER, name)
+    )
+
+
+def _constraint_name(table: str, column: str, suffix: str) -> str:
+    name = f"{_unquote(table).split('.')[-1]}_{_unquote(column)}"[: MAX_IDENTIFIER_LENGTH - len(suffix) - 1]
+    name = f"{name}_{suffix}"
+    if re.fullmatch(r"[a-z_][a-z0-9_$]*", name):
+        return name
+    return '"' + name.replace('"', '""') + '"'
@@ -0,0 +1,206 @@
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import socketserver
+import threading
+import time
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+from migrateit.clients import SqlClient
+from migrateit.models import MigrationStatus
+from migrateit.reporters import logger, print_json
+from migrateit.tree import (
+    build_migration_plan,
+    build_migrations_tree,
+    load_changelog_file,
+)
+
+JSON_CONTENT_TYPE = "application/json"
+
+
+class StatusCache:
+    """
+    Keep the status documents of a changelog ready to be served.
+    The changelog and migration files are watched by their stat results and the database by the single row marker
+    of the migrations table, both checked by `refresh`. The documents are only rebuilt when one of them changes, so
+    requests never touch the files nor the database.
+    """
+
+    def __init__(self, client: SqlClient, connect: Callable[[], Any] | None = None) -> None:
+        # read only, a transaction must not stay open between refreshes
+        client.connection.rollback()
+        client.connection.autocommit = True
+        self.client = client
+        self.connect = connect
+        self.documents: dict[str, bytes] = {}
+        self.error: str | None = None
+        self.refreshed_at: float | None = None
+        self._files_key: tuple | None = None
+        self._database_key: str | None = None
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> bytes | None:
+        return self.documents.get(path)
+
+    def refresh(self) -> bool:
+        """
+        Rebuild the documents if the files or the migrations table changed.
+        Returns:
+            True if the documents were rebuilt.
+        """
+        with self._lock:
+            try:
+                return self._refresh()
+            except Exception as e:
+                self.error = str(e)
+                logger.error(f"Status refresh failed: {e}")
+                # a broken file must not tear down a healthy connection
+                if isinstance(e, self.client.connection.Error):
+                    self._reconnect()
+                return False
+
+    def _refresh(self) -> bool:
+        files_key = self._watch_files()
+        database_key = self.client.retrieve_status_marker()
+        if files_key == self._files_key and database_key == self._database_key and not self.error:
+            return False
+
+        if files_key != self._files_key:
+            changelog = load_changelog_file(self.client.changelog.path)
+            config = dataclasses.replace(self.client.config, changelog=changelog)
+            self.client = type(self.client)(self.client.connection, config)
+
+        statuses = self.client.retrieve_migration_statuses()
+        graph = build_migrations_tree(self.client.changelog, statuses)
+        index = self.client.migrations_index
+        status = io.BytesIO()
+        print_json(graph, statuses, extra={"orphans": index.orphans, "missing": index.missing}, stream=status)
+
+        pending = [name for name, s in statuses.items() if s == MigrationStatus.NOT_APPLIED]
+        documents = {
+            "/status": status.getvalue(),
+            "/pending": json.dumps({"pending": len(pending), "migrations": pending}).encode("utf-8"),
+            "/plan": json.dumps({"migrations": self._plan(statuses)}).encode("utf-8"),
+        }
+        self.documents = {path: document.rstrip(b"\n") + b"\n" for path, document in documents.items()}
+        self._files_key, self._database_key, self.error = files_key, database_key, None
+        self.refreshed_at = time.monotonic()
+        return True
+
+    def _plan(self, statuses: dict[str, MigrationStatus]) -> list[str] | None:
+        try:
+            self.client.validate_migrations(statuses)
+        except ValueError:
+            return None  # nothing can be applied until the changelog and database agree
+        plan = build_migration_plan(
+            self.client.changelog,
+            migration_tree=build_migrations_tree(self.client.changelog),
+            statuses_map=statuses,
+        )
+        return [migration.name for migration in plan]
+
+    def _watch_files(self) -> tuple:
+        changelog = self.client.changelog.path.stat()
+        files = []
+        with contextlib.suppress(FileNotFoundError), os.scandir(self.client.migrations_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    result = entry.stat()
+                    files.append((entry.name, result.st_mtime_ns, result.st_size))
+        return changelog.st_mtime_ns, changelog.st_size, tuple(sorted(files))
+
+    def _reconnect(self) -> None:
+        if self.connect is None:
+            return
+        with contextlib.suppress(Exception):
+            self.client.connection.close()
+        try:
+            connection = self.connect()
+        except Exception as e:
+            logger.error(f"Reconnection failed: {e}")
+            return
+        connection.autocommit = True
+        self.client = type(self.client)(connection, self.client.config)
+
+
+class StatusWatcher(threading.Thread):
+    """
+    Refresh the cache every interval until stopped.
+    """
+
+    def __init__(self, cache: StatusCache, interval: float) -> None:
+        super().__init__(name="migrateit-watcher", daemon=True)
+        self.cache = cache
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.cache.refresh()
+
+
+class StatusRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        cache: StatusCache = self.server.cache  # type: ignore[attr-defined]
+        path = self.path.split("?", 1)[0].rstrip("/") or "/status"
+        document = cache.get(path)
+        if cache.error:
+            # the last documents may be outdated, do not serve them as if they were current
+            age = time.monotonic() - cache.refreshed_at if cache.refreshed_at is not None else None
+            body = {"error": cache.error, "last_refresh_age": round(age, 3) if age is not None else None}
+            self._send(503, json.dumps(body).encode("utf-8") + b"\n")
+        elif document is not None:
+            self._send(200, document)
+        else:
+            self._send(404, json.dumps({"error": f"Unknown path {path}"}).encode("utf-8") + b"\n")
+
+    def _send(self, code: int, body: bytes) -> None:
+        self.send_response(code)
+        self.send_header("Content-Type", JSON_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(
+    cache: StatusCache,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    socket_path: Path | None = None,
+) -> ThreadingHTTPServer | UnixHTTPServer:
+    """
+    Create the HTTP server answering the status, pending and plan requests from the cache.
+    Args:
+        cache: The cache the documents are served from.
+        host: The address to listen on.
+        port: The TCP port to listen on, 0 picks a free one.
+        socket_path: Listen on this Unix socket instead of TCP.
+    """
+    if socket_path is not None:
+        with contextlib.suppress(FileNotFoundError):
+            socket_path.unlink()
+        server: ThreadingHTTPServer | UnixHTTPServer = UnixHTTPServer(str(socket_path), StatusRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), StatusRequestHandler)
+    server.cache = cache  # type: ignore[attr-defined]
+    return server
@@ -0,0 +1,144 @@
+import contextlib
+from collections.abc import Generator
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import connection as Connection
+from psycopg2.extensions import make_dsn
+
+from migrateit.clients import PsqlClient
+
+TEMPLATE_DIGEST_PREFIX = "migrateit:"
+
+
+@contextlib.contextmanager
+def autocommit(connection: Connection) -> Generator[Connection]:
+    """
+    Temporarily switch a connection to autocommit mode.
+    Required by statements that cannot run inside a transaction block (CREATE/DROP DATABASE).
+    Args:
+        connection: The connection to switch.
+    """
+    previous = connection.autocommit
+    connection.rollback()
+    connection.autocommit = True
+    try:
+        yield connection
+    finally:
+        connection.autocommit = previous
+
+
+@contextlib.contextmanager
+def template_lock(client: PsqlClient, template_name: str) -> Generator[None]:
+    """
+    Hold a session advisory lock for the given template so concurrent builders (i.e. pytest-xdist workers)
+    wait for each other instead of racing to create the same database.
+    Args:
+        client: The client connected to the maintenance database.
+        template_name: The name of the template database.
+    """
+    with autocommit(client.connection) as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(hashtext(%s));", (template_name,))
+        try:
+            yield
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s));", (template_name,))
+
+
+def database_url(name: str) -> str:
+    """
+    Build a connection string for the given database reusing the environment configuration.
+    Args:
+        name: The name of the database.
+    Returns:
+        The connection string.
+    """
+    return make_dsn(PsqlClient.get_environment_url(), dbname=name)
+
+
+def get_template_digest(client: PsqlClient, template_name: str) -> str | None:
+    """
+    Retrieve the changelog digest the template database was built from.
+    Args:
+        client: The client connected to the maintenance database.
+        template_name: The name of the template database.
+    Returns:
+        The stored digest or None if the template does not exist or was not built by migrateit.
+    """
+    with client.connection.cursor() as cursor:
+        cursor.execute(
+            """SELECT shobj_description(oid, 'pg_database') FROM pg_database WHERE datname = %s;""",
+            (template_name,),
+        )
+        result = cursor.fetchone()
+    client.connection.rollback()
+
+    if not result or not result[0] or not result[0].startswith(TEMPLATE_DIGEST_PREFIX):
+        return None
+    return result[0].removeprefix(TEMPLATE_DIGEST_PREFIX)
+
+
+@contextlib.contextmanager
+def build_template(client: PsqlClient, template_name: str, digest: str) -> Generator[PsqlClient]:
+    """
+    Recreate the template database and yield a client connected to it.
+    The template is only marked with the digest once the block exits successfully, otherwise it is dropped.
+    Args:
+        client: The client connected to the maintenance database.
+        template_name: The name of the template database.
+        digest: The changelog digest the template is built from.
+    Yields:
+        A client connected to the empty template database.
+    """
+    drop_database(client, template_name)
+    with autocommit(client.connection) as conn, conn.cursor() as cursor:
+        cursor.execute(sql.SQL("CREATE DATABASE {};").format(sql.Identifier(template_name)))
+
+    template_conn = psycopg2.connect(database_url(template_name))
+    template_conn.autocommit = False
+    try:
+        yield PsqlClient(template_conn, client.config)
+        template_conn.commit()
+    except BaseException:
+        template_conn.close()
+        drop_database(client, template_name)
+        raise
+    template_conn.close()
+
+    with autocommit(client.connection) as conn, conn.cursor() as cursor:
+        cursor.execute(
+            sql.SQL("COMMENT ON DATABASE {} IS {};").format(
+                sql.Identifier(template_name),
+                sql.Literal(f"{TEMPLATE_DIGEST_PREFIX}{digest}"),
+            )
+        )
+        cursor.execute(sql.SQL("ALTER DATABASE {} WITH IS_TEMPLATE true;").format(sql.Identifier(template_name)))
+
+
+def clone_template(client: PsqlClient, template_name: str, name: str) -> None:
+    """
+    Create a new database as a copy of the template database.
+    Args:
+        client: The client connected to the maintenance database.
+        template_name: The name of the template database.
+        name: The name of the new database.
+    """
+    with autocommit(client.connection) as conn, conn.cursor() as cursor:
+        cursor.execute(
+            sql.SQL("CREATE DATABASE {} TEMPLATE {};").format(sql.Identifier(name), sql.Identifier(template_name))
+        )
+
+
+def drop_database(client: PsqlClient, name: str) -> None:
+    """
+    Drop a database (template or clone) if it exists.
+    Args:
+        client: The client connected to the maintenance database.
+        name: The name of the database to drop.
+    """
+    with autocommit(client.connection) as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT datistemplate FROM pg_database WHERE datname = %s;", (name,))
+        result = cursor.fetchone()
+        if result and result[0]:
+            cursor.execute(sql.SQL("ALTER DATABASE {} WITH IS_TEMPLATE false;").format(sql.Identifier(name)))
+        cursor.execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE);").format(sql.Identifier(name)))
@@ -1,11 +1,24 @@
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import mmap
+import os
 import re
-from collections import OrderedDict, deque
+import secrets
+import shutil
+import tempfile
+from array import array
+from collections import deque
+from collections.abc import Generator, Iterable
 from datetime import datetime
 from pathlib import Path
+from types import ModuleType
 
-from migrateit.models import ChangelogFile, Migration
+from migrateit.models import ChangelogFile, CopyBlock, Migration, MigrationGraph, MigrationsIndex, OnlineAlter
 from migrateit.models.changelog import SupportedDatabase
-from migrateit.models.migration import MigrationStatus
+from migrateit.models.migration import COMPRESSION_SUFFIXES, MigrationPhase, MigrationStatus
 from migrateit.reporters import write_line
 
 
@@ -19,6 +32,28 @@ def create_migration_directory(migrations_dir: Path) -> None:
 
 
 ROLLBACK_SPLIT_TAG = "-- Rollback migration"
+HASH_CHUNK_SIZE = 1024 * 1024
+EMPTY_NAMES_DIGEST = "0" * 64
+# levels of the Merkle tree of the applied migrations below its root, 16^3 leaves
+MERKLE_DEPTH = 3
+CHANGELOG_FILE_NAMES = ("changelog.jsonl", "changelog.json")
+
+# `\copy table [(columns)] FROM 'file' [WITH (...)]` streams a file relative to the migration
+# `COPY table [(columns)] FROM stdin;` is followed by inline data ended by a `\.` line (pg_dump format)
+# `\online_alter table actions;` runs the ALTER TABLE actions through the online schema change engine
+_COPY_BLOCK_PATTERN = re.compile(
+    rb"^(?:\\copy\s+(?P<target>[^\n]+?)\s+from\s+'(?P<file>[^'\n]+)'(?P<options>[^\n;]*);?"
+    rb"|(?P<statement>copy\s+[^;]+?\s+from\s+stdin\b[^\n;]*;)"
+    rb"|\\online_alter\s+(?P<table>\S+)\s+(?P<actions>[^;]+);)[ \t\r]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+_COPY_DATA_END_PATTERN = re.compile(rb"^\\\.[ \t\r]*$", re.MULTILINE)
+# everything a statement separator can hide in: comments, quoted strings and identifiers and dollar quoted bodies
+_SQL_TOKEN_PATTERN = re.compile(
+    r"--[^\n]*|/\*.*?\*/|(?<!\w)[Ee]'(?:[^'\\]|\\.|'')*'|'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\""
+    r"|\$((?:[A-Za-z_]\w*)?)\$.*?\$\1\$|;",
+    re.DOTALL,
+)
 
 
 def create_new_migration(
@@ -26,6 +61,7 @@ def create_new_migration(
     migrations_dir: Path,
     name: str,
     dependencies: list[str] | None = None,
+    phase: MigrationPhase = MigrationPhase.PRE,
 ) -> Migration:
     """
     Create a new migration file in the given directory.
@@ -34,6 +70,7 @@ def create_new_migration(
         migrations_dir: Path to the migrations directory.
         name: The name of the new migration (must be a valid identifier).
         dependencies: List of migration names that this migration depends on.
+        phase: The deploy phase the migration runs in.
     Returns:
         A new Migration instance.
     """
@@ -51,6 +88,8 @@ def create_new_migration(
     is_initial = len(migration_files) == 0
     if is_initial and dependencies:
         raise ValueError("Initial migration cannot have dependencies")
+    if is_initial and phase != MigrationPhase.PRE:
+        raise ValueError("Initial migration must run in the pre-deploy phase")
 
     # check if the name already exists (only can happen if a file was manually created)
     new_filepath = migrations_dir / f"{len(migration_files):04d}_{name}.sql"
@@ -65,9 +104,9 @@ def create_new_migration(
         name=new_filepath.name,
         initial=is_initial,
         parents=[] if is_initial else (dependencies or [migration_files[-1]]),
+        phase=phase,
     )
-    changelog.migrations.append(new_migration)
-    save_changelog_file(changelog)
+    append_changelog_migration(changelog, new_migration)
     write_line(f"\tMigration {new_migration.name} created successfully")
     if dependencies:
         write_line(f"\tAdded dependencies to: {', '.join(dependencies)}")
@@ -123,10 +162,14 @@ def retrieve_migration_sqls(migration_file: Path) -> tuple[str | None, str | Non
             ]
         )
 
-    if not migration_file.is_file() or not migration_file.name.endswith(".sql"):
+    if not Migration.logical_name(migration_file.name).endswith(".sql"):
         raise ValueError(f"Migration {migration_file.name} is not a valid SQL file")
 
-    content = migration_file.read_text(encoding="utf-8")
+    try:
+        with open_migration_file(resolve_migration_file(migration_file)) as f:
+            content = _normalize_newlines(f.read().decode("utf-8"))
+    except (FileNotFoundError, IsADirectoryError):
+        raise ValueError(f"Migration {migration_file.name} is not a valid SQL file")
     if ROLLBACK_SPLIT_TAG not in content:
         return remove_description_comments(content).strip(), None
 
@@ -134,6 +177,379 @@ def retrieve_migration_sqls(migration_file: Path) -> tuple[str | None, str | Non
     return remove_description_comments(sql).strip(), rollback_sql.strip()
 
 
+def scan_migrations_directory(migrations_dir: Path, changelog: ChangelogFile) -> MigrationsIndex:
+    """
+    Index the migration files of a directory with a single scandir pass.
+    Args:
+        migrations_dir: Path to the migrations directory.
+        changelog: The changelog the files are checked against.
+    Returns:
+        The index of the SQL files with their stat results, the files not in the changelog (orphans) and
+        the changelog migrations without a file (missing). Compressed files are indexed by their plain name.
+    """
+    index = MigrationsIndex(directory=migrations_dir)
+    with contextlib.suppress(FileNotFoundError), os.scandir(migrations_dir) as entries:
+        for entry in entries:
+            name = Migration.logical_name(entry.name)
+            if not name.endswith(".sql") or not entry.is_file():
+                continue
+            if name == entry.name:
+                index.compressed.pop(name, None)  # a plain file takes precedence over its compressed copy
+            elif name in index.files and name not in index.compressed:
+                continue
+            else:
+                index.compressed[name] = entry.name
+            index.files[name] = entry.stat()
+
+    changelog_names = {m.name for m in changelog.migrations}
+    index.orphans = sorted(n for n in index.files if n not in changelog_names and Migration.is_valid_filename(n))
+    index.missing = [m.name for m in changelog.migrations if m.name not in index.files]
+    return index
+
+
+def hash_migration_file(migration_file: Path) -> str:
+    """
+    Compute the SHA-256 of a migration file reading its raw bytes in fixed size chunks.
+    Line endings are normalized to '\\n' so the digest is the same as hashing the file read as text.
+    Compressed files are hashed over their decompressed content, so compressing a migration keeps its hash.
+    Args:
+        migration_file: The path to the migration file.
+    Returns:
+        The hexadecimal digest of the file.
+    """
+    with open_migration_file(resolve_migration_file(migration_file)) as f:
+        return _hash_stream(f)
+
+
+def _hash_stream(f: io.RawIOBase | io.BufferedIOBase) -> str:
+    digest = hashlib.sha256()
+    buffer = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    pending_cr = False  # previous chunk ended in '\r', it may be the first half of a '\r\n'
+
+    while n := f.readinto(buffer):
+        start = 0
+        if pending_cr:
+            pending_cr = False
+            digest.update(b"\n")
+            start = 1 if buffer[0] == ord("\n") else 0
+
+        if buffer.find(b"\r", start, n) == -1:
+            digest.update(view[start:n])
+            continue
+
+        end = n
+        if buffer[n - 1] == ord("\r"):
+            pending_cr = True
+            end = n - 1
+        digest.update(bytes(view[start:end]).replace(b"\r\n", b"\n").replace(b"\r", b"\n"))
+
+    if pending_cr:
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def split_migration_file(migration_file: Path) -> tuple[str, str]:
+    """
+    Read the migration and rollback SQL of a migration file.
+    The file is memory mapped and the rollback tag searched in place, only the two halves are decoded.
+    Args:
+        migration_file: The path to the migration file.
+    Returns:
+        A tuple of (SQL, rollback SQL).
+    """
+    with _map_migration_file(migration_file) as (content, position):
+        with memoryview(content) as view:
+            sql = str(view[:position], "utf-8")
+            rollback = str(view[position + len(ROLLBACK_SPLIT_TAG) :], "utf-8")
+    return _normalize_newlines(sql), _normalize_newlines(rollback)
+
+
+def read_migration_segments(migration_file: Path, is_rollback: bool = False) -> list[str | CopyBlock | OnlineAlter]:
+    """
+    Split a migration into the SQL to execute, the COPY blocks to stream and the online ALTER directives.
+    COPY data is never decoded, blocks only reference the file and byte range holding it. The range of blocks inlined
+    in a compressed migration is an offset into its decompressed content.
+    Args:
+        migration_file: The path to the migration file.
+        is_rollback: Whether to read the rollback section instead of the migration one.
+    Returns:
+        The SQL strings, COPY blocks and online ALTER directives in file order.
+    """
+    migration_file = resolve_migration_file(migration_file)
+    with _map_migration_file(migration_file) as (content, position), memoryview(content) as view:
+        if is_rollback:
+            return [_normalize_newlines(str(view[position + len(ROLLBACK_SPLIT_TAG) :], "utf-8"))]
+
+        segments: list[str | CopyBlock | OnlineAlter] = []
+        start = 0
+        while match := _COPY_BLOCK_PATTERN.search(content, start, position):
+            sql = _normalize_newlines(str(view[start : match.start()], "utf-8"))
+            if sql.strip():
+                segments.append(sql)
+
+            if match["table"]:
+                segments.append(OnlineAlter(table=match["table"].decode(), actions=match["actions"].decode().strip()))
+                start = match.end()
+                continue
+
+            if match["file"]:
+                target, options = match["target"].decode(), match["options"].decode().strip()
+                segments.append(
+                    CopyBlock(
+                        statement=f"COPY {target} FROM STDIN{f' {options}' if options else ''}",
+                        path=migration_file.parent / match["file"].decode(),
+                    )
+                )
+                start = match.end()
+                continue
+
+            data_start = min(match.end() + 1, position)
+            data_end = _COPY_DATA_END_PATTERN.search(content, data_start, position)
+            if not data_end:
+                raise ValueError(f"Migration {migration_file.name} has a COPY block without its '\\.' terminator")
+            segments.append(CopyBlock(match["statement"].decode(), migration_file, data_start, data_end.start()))
+            start = data_end.end()
+
+        sql = _normalize_newlines(str(view[start:position], "utf-8"))
+        if not segments or sql.strip():
+            segments.append(sql)
+        return segments
+
+
+def split_sql_statements(sql: str) -> list[tuple[int, str]]:
+    """
+    Split SQL into its statements, ignoring the semicolons inside comments, quotes and dollar quoted bodies.
+    Args:
+        sql: The SQL to split.
+    Returns:
+        The 1-based line each statement starts at and the statement, without its leading comments.
+        Chunks holding only comments are skipped.
+    """
+    statements: list[tuple[int, str]] = []
+    line, counted = 1, 0
+    code_start: int | None = None
+    position = 0
+    for match in _SQL_TOKEN_PATTERN.finditer(sql):
+        if code_start is None:
+            gap = sql[position : match.start()]
+            if gap.strip():
+                code_start = position + len(gap) - len(gap.lstrip())
+            elif not match[0].startswith(("--", "/*", ";")):
+                code_start = match.start()
+
+        if match[0] == ";":
+            if code_start is not None:
+                line += sql.count("\n", counted, code_start)
+                counted = code_start
+                statements.append((line, sql[code_start : match.end()]))
+            code_start = None
+        position = match.end()
+
+    tail = sql[position:]
+    if code_start is None and tail.strip():
+        code_start = position + len(tail) - len(tail.lstrip())
+    if code_start is not None:
+        line += sql.count("\n", counted, code_start)
+        statements.append((line, sql[code_start:].rstrip()))
+    return statements
+
+
+def hash_migration(migration_file: Path) -> str:
+    """
+    Compute the change hash of a migration, including the data files its COPY blocks reference.
+    Migrations without referenced data files keep the plain file hash.
+    Args:
+        migration_file: The path to the migration file.
+    Returns:
+        The hexadecimal digest of the migration.
+    """
+    data_files: list[Path] = []
+    with _open_mappable(resolve_migration_file(migration_file)) as f:
+        migration_hash = _hash_stream(f)
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                position = content.find(ROLLBACK_SPLIT_TAG.encode("utf-8"))
+                for match in _COPY_BLOCK_PATTERN.finditer(content, 0, position if position != -1 else len(content)):
+                    if match["file"]:
+                        data_files.append(migration_file.parent / match["file"].decode())
+    if not data_files:
+        return migration_hash
+
+    digest = hashlib.sha256(migration_hash.encode("utf-8"))
+    for data_file in data_files:
+        digest.update(hash_migration_file(data_file).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _LimitedReader:
+    def __init__(self, stream: io.BufferedIOBase, size: int) -> None:
+        self.stream = stream
+        self.remaining = size
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(self._limit(size))
+        self.remaining -= len(data)
+        return data
+
+    def readline(self, size: int = -1) -> bytes:
+        data = self.stream.readline(self._limit(size))
+        self.remaining -= len(data)
+        return data
+
+    def _limit(self, size: int) -> int:
+        return self.remaining if size < 0 or size > self.remaining else size
+
+
+@contextlib.contextmanager
+def open_copy_block(block: CopyBlock) -> Generator[io.BufferedIOBase | _LimitedReader]:
+    """
+    Open the data of a COPY block as a binary stream.
+    Args:
+        block: The COPY block to read.
+    Yields:
+        A file object limited to the block data.
+    """
+    with open_migration_file(resolve_migration_file(block.path)) as f:
+        if block.end is None:
+            yield f
+            return
+        f.seek(block.start)
+        yield _LimitedReader(f, block.end - block.start)
+
+
+@contextlib.contextmanager
+def _map_migration_file(migration_file: Path) -> Generator[tuple[mmap.mmap, int]]:
+    missing_tag_error = ValueError(
+        f"Migration {migration_file.name} does not contain a rollback section ({ROLLBACK_SPLIT_TAG})"
+    )
+    with _open_mappable(resolve_migration_file(migration_file)) as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise missing_tag_error
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            position = content.find(ROLLBACK_SPLIT_TAG.encode("utf-8"))
+            if position == -1:
+                raise missing_tag_error
+            yield content, position
+
+
+def resolve_migration_file(migration_file: Path) -> Path:
+    """
+    Find the file holding a migration, which may be stored compressed next to its plain name.
+    Args:
+        migration_file: The path to the migration file, usually its plain .sql name.
+    Returns:
+        The existing file, preferring the plain one, or the given path if none exists.
+    """
+    if migration_file.name.endswith(COMPRESSION_SUFFIXES) or migration_file.exists():
+        return migration_file
+    for suffix in COMPRESSION_SUFFIXES:
+        compressed = migration_file.with_name(f"{migration_file.name}{suffix}")
+        if compressed.exists():
+            return compressed
+    return migration_file
+
+
+def open_migration_file(migration_file: Path) -> io.BufferedIOBase:
+    """
+    Open a migration or COPY data file as a binary stream, decompressing .gz and .zst files as they are read.
+    Args:
+        migration_file: The path to the file, already resolved.
+    Returns:
+        A buffered binary file object over the plain content.
+    """
+    if migration_file.name.endswith(".gz"):
+        return gzip.open(migration_file, "rb")
+    if migration_file.name.endswith(".zst"):
+        return _zstd(migration_file).open(migration_file, "rb")
+    return migration_file.open("rb")
+
+
+def migration_compression(migration_file: Path) -> str | None:
+    """
+    Returns:
+        The compression suffix of the file holding a migration, None if it's stored as plain SQL.
+    """
+    resolved = resolve_migration_file(migration_file)
+    return next((suffix for suffix in COMPRESSION_SUFFIXES if resolved.name.endswith(suffix)), None)
+
+
+def compress_migration_file(migration_file: Path, suffix: str) -> Path:
+    """
+    Replace a plain migration file with its compressed copy, the migration keeps its name and hash.
+    Args:
+        migration_file: The path to the plain migration file.
+        suffix: The compression suffix, one of COMPRESSION_SUFFIXES.
+    Returns:
+        The path to the compressed file.
+    """
+    if suffix not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unsupported compression {suffix}, use one of {', '.join(COMPRESSION_SUFFIXES)}")
+
+    compressed = migration_file.with_name(f"{migration_file.name}{suffix}")
+    atomic_write(compressed, _compress(compressed, migration_file.read_bytes()))
+    migration_file.unlink()
+    return compressed
+
+
+def write_migration_file(migration_file: Path, content: str) -> None:
+    """
+    Atomically replace the content of a migration file, compressed migrations are compressed again.
+    Args:
+        migration_file: The path to the migration file.
+        content: The new content of the migration.
+    """
+    migration_file = resolve_migration_file(migration_file)
+    if migration_file.name.endswith(COMPRESSION_SUFFIXES):
+        atomic_write(migration_file, _compress(migration_file, content.encode("utf-8")))
+    else:
+        atomic_write(migration_file, content)
+
+
+def _compress(migration_file: Path, content: bytes) -> bytes:
+    if migration_file.name.endswith(".gz"):
+        # no timestamp in the header, compressing the same migration twice gives the same file
+        return gzip.compress(content, mtime=0)
+    return _zstd(migration_file).compress(content)
+
+
+def _zstd(migration_file: Path) -> ModuleType:
+    try:
+        from compression import zstd  # type: ignore[import-not-found]  # Python 3.14+
+
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard  # type: ignore[import-not-found]
+
+        return zstandard
+    except ImportError:
+        raise ValueError(f"Migration {migration_file.name} is zstd compressed, install zstandard to read it")
+
+
+@contextlib.contextmanager
+def _open_mappable(migration_file: Path) -> Generator[io.RawIOBase | io.BufferedIOBase]:
+    # compressed files can't be memory mapped, their content is streamed into an anonymous temporary file instead
+    if not migration_file.name.endswith(COMPRESSION_SUFFIXES):
+        with migration_file.open("rb", buffering=0) as f:
+            yield f
+        return
+
+    with tempfile.TemporaryFile() as spool:
+        with open_migration_file(migration_file) as f:
+            shutil.copyfileobj(f, spool, HASH_CHUNK_SIZE)
+        spool.flush()
+        spool.seek(0)
+        yield spool
+
+
+def _normalize_newlines(content: str) -> str:
+    if "\r" not in content:
+        return content
+    return content.replace("\r\n", "\n").replace("\r", "\n")
+
+
 def create_changelog_file(migrations_file: Path, database: SupportedDatabase) -> ChangelogFile:
     """
     Create a new changelog file with the initial version.
@@ -143,13 +559,27 @@ def create_changelog_file(migrations_file: Path, database: SupportedDatabase) ->
     """
     if migrations_file.exists():
         raise ValueError(f"File {migrations_file.name} already exists")
-    if not migrations_file.name.endswith(".json"):
-        raise ValueError(f"File {migrations_file.name} must be a JSON file")
-    changelog = ChangelogFile(version=1, database=database)
-    migrations_file.write_text(changelog.to_json())
+    if migrations_file.suffix not in (".json", ".jsonl"):
+        raise ValueError(f"File {migrations_file.name} must be a JSON or JSON Lines file")
+    changelog = ChangelogFile(version=1, database=database, path=migrations_file)
+    atomic_write(migrations_file, changelog.serialize())
     return load_changelog_file(migrations_file)
 
 
+def find_changelog_file(root: Path) -> Path:
+    """
+    Find the changelog file inside the given directory, preferring the JSON Lines format.
+    Args:
+        root: The migrateit root directory.
+    Returns:
+        The path to the existing changelog file, or the default JSON one if none exists.
+    """
+    for name in CHANGELOG_FILE_NAMES:
+        if (root / name).exists():
+            return root / name
+    return root / "changelog.json"
+
+
 def load_changelog_file(file_path: Path) -> ChangelogFile:
     """
     Load a changelog file from the specified path.
@@ -160,7 +590,11 @@ def load_changelog_file(file_path: Path) -> ChangelogFile:
     """
     if not file_path.exists():
         raise FileNotFoundError(f"File {file_path.name} does not exist")
-    changelog = ChangelogFile.from_json(file_path.read_text(), file_path)
+    if file_path.suffix == ".jsonl":
+        with file_path.open(encoding="utf-8") as f:
+            changelog = ChangelogFile.from_jsonl(f, file_path)
+    else:
+        changelog = ChangelogFile.from_json(file_path.read_text(), file_path)
     if not changelog.migrations:
         return changelog
 
@@ -184,102 +618,274 @@ def save_changelog_file(changelog: ChangelogFile) -> None:
     """
     if not changelog.path.exists():
         raise FileNotFoundError(f"File {changelog.path.name} does not exist")
-    changelog.path.write_text(changelog.to_json())
+    atomic_write(changelog.path, changelog.serialize())
+    write_line(f"\tMigrations file updated: {changelog.path}")
+
+
+def append_changelog_migration(changelog: ChangelogFile, migration: Migration) -> None:
+    """
+    Add a migration to the changelog and persist it.
+    JSON Lines changelogs only get the new record appended, JSON ones are fully rewritten.
+    Args:
+        changelog: The changelog file to update.
+        migration: The migration to add.
+    """
+    changelog.migrations.append(migration)
+    if not changelog.is_jsonl:
+        save_changelog_file(changelog)
+        return
+
+    if not changelog.path.exists():
+        raise FileNotFoundError(f"File {changelog.path.name} does not exist")
+    with changelog.path.open("a", encoding="utf-8") as f:
+        f.write(f"{json.dumps(migration.to_dict())}\n")
+        f.flush()
+        os.fsync(f.fileno())
     write_line(f"\tMigrations file updated: {changelog.path}")
 
 
-def build_migrations_tree(changelog: ChangelogFile) -> OrderedDict[str, list[Migration]]:
+def atomic_write(path: Path, content: str | bytes) -> None:
+    """
+    Write a file through a fsync'd sibling temporary file renamed over it, so readers never see a partial file.
+    Args:
+        path: The path of the file to write.
+        content: The text or binary content of the file.
+    """
+    fd, tmp_path = _create_temporary_file(path)
+    try:
+        if isinstance(content, bytes):
+            with os.fdopen(fd, "wb") as binary:
+                binary.write(content)
+                binary.flush()
+                os.fsync(binary.fileno())
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as text:
+                text.write(content)
+                text.flush()
+                os.fsync(text.fileno())
+        if path.exists():
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+
+
+def _create_temporary_file(path: Path) -> tuple[int, str]:
+    # unlike mkstemp (0o600) new files get the permissions of the current umask, applied by the kernel
+    for _ in range(tempfile.TMP_MAX):
+        tmp_path = os.path.join(path.parent, f".{path.name}.{secrets.token_hex(4)}.tmp")
+        try:
+            return os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666), tmp_path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"No usable temporary file name found for {path}")
+
+
+def compute_changelog_digest(changelog: ChangelogFile, migrations_dir: Path) -> str:
     """
-    Build a tree of migrations and their childrens.
+    Compute an aggregate digest of the changelog and the content of all its migration files.
+    Args:
+        changelog: The changelog file.
+        migrations_dir: Path to the migrations directory.
+    Returns:
+        The SHA-256 hex digest, changing whenever a migration is added, removed or edited.
     """
-    d = OrderedDict()
+    digest = hashlib.sha256(changelog.to_json().encode("utf-8"))
     for migration in changelog.migrations:
-        if migration.name not in d:
-            d[migration.name] = []
-        for parent in migration.parents:
-            d[parent].append(migration)
-    return d
+        digest.update(migration.name.encode("utf-8"))
+        digest.update(hash_migration(migrations_dir / migration.name).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def compute_status_digest(applied: list[tuple[str, str]]) -> str:
+    """
+    Compute a digest of the state of the migrations table.
+    Args:
+        applied: The (migration name, change hash) rows of the migrations table, in any order.
+    Returns:
+        The SHA-256 hex digest, changing whenever a migration is applied, rolled back or its hash updated.
+    """
+    digest = hashlib.sha256()
+    for name, change_hash in sorted(applied):
+        digest.update(f"{name}:{change_hash}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def compute_names_digest(names: Iterable[str], digest: str = EMPTY_NAMES_DIGEST) -> str:
+    """
+    Compute an order independent digest of a set of migration names.
+    The digest is the XOR of the SHA-256 of each name, adding or removing a name toggles it without reading the
+    rest of the set, so the database can keep it up to date on every apply and rollback.
+    Args:
+        names: The migration names to toggle.
+        digest: The digest to toggle the names in, the empty set by default.
+    Returns:
+        The 64 characters hex digest.
+    """
+    value = int(digest, 16)
+    for name in names:
+        value ^= int.from_bytes(hashlib.sha256(name.encode("utf-8")).digest())
+    return f"{value:064x}"
+
+
+def merkle_bucket(name: str) -> str:
+    """
+    Returns:
+        The leaf node of the Merkle tree holding a migration, the first MERKLE_DEPTH hex digits of its name hash.
+    """
+    return hashlib.sha256(name.encode("utf-8")).hexdigest()[:MERKLE_DEPTH]
+
+
+def merkle_children(node: str) -> list[str]:
+    return [f"{node}{digit}" for digit in "0123456789abcdef"]
+
+
+def build_merkle_tree(rows: Iterable[tuple[str, str]]) -> dict[str, str]:
+    """
+    Build the Merkle tree of a set of (migration_name, change_hash) rows.
+    Migrations are placed by the hash of their name in a tree of fixed depth and fan-out 16, the root being "". Each
+    node is the XOR of the SHA-256 of the rows below it, so applying, rolling back or rehashing a migration only
+    toggles the nodes on its path and the database keeps the tree up to date without reading the other rows.
+    Args:
+        rows: The rows to build the tree of, or to toggle in an existing one.
+    Returns:
+        The 64 characters hex digest of each non empty node.
+    """
+    nodes: dict[str, int] = {}
+    for name, change_hash in rows:
+        leaf = int.from_bytes(hashlib.sha256(f"{name}:{change_hash}".encode("utf-8")).digest())
+        bucket = merkle_bucket(name)
+        for depth in range(MERKLE_DEPTH + 1):
+            nodes[bucket[:depth]] = nodes.get(bucket[:depth], 0) ^ leaf
+    return {node: f"{value:064x}" for node, value in nodes.items()}
+
+
+def toggle_merkle_nodes(nodes: dict[str, str], changes: dict[str, str]) -> dict[str, str]:
+    """
+    Returns:
+        The nodes with the tree of the changed rows (see build_merkle_tree) toggled in, the missing ones are empty.
+    """
+    return {
+        node: f"{int(nodes.get(node, EMPTY_NAMES_DIGEST), 16) ^ int(change, 16):064x}"
+        for node, change in changes.items()
+    }
+
+
+def build_migrations_tree(
+    changelog: ChangelogFile,
+    statuses_map: dict[str, MigrationStatus] | None = None,
+) -> MigrationGraph:
+    """
+    Build the compact graph of migrations and their childrens.
+    Args:
+        changelog: The changelog file containing migrations.
+        statuses_map: Optional map of migration names to their statuses to store in the graph.
+    Returns:
+        The migrations graph.
+    """
+    return MigrationGraph(changelog.migrations, statuses_map)
 
 
 def build_migration_plan(
     changelog: ChangelogFile,
-    migration_tree: OrderedDict[str, list[Migration]],
+    migration_tree: MigrationGraph,
     statuses_map: dict[str, MigrationStatus],
     target_migration: Migration | None = None,
     is_rollback: bool = False,
+    phase: MigrationPhase | None = None,
 ) -> list[Migration]:
     """
     Build a migration plan based on the changelog and migration tree.
     Args:
         changelog: The changelog file containing migrations.
-        migration_tree: An ordered dictionary representing the migration tree.
+        migration_tree: The graph of the changelog migrations.
         statuses_map: A map of migration names to their statuses.
         target_migration: The target migration to apply or rollback to.
         is_rollback: Whether the plan is for a rollback operation.
+        phase: Only plan the pending migrations of this deploy phase, all of them if not provided.
     Returns:
         A list of migrations to apply or rollback, in the correct order.
     """
-    plan: list[Migration] = []
-    visited: set[str] = set()
-    queue: deque[Migration] = deque([changelog.migrations[0]])
+    graph = migration_tree
     is_bottom_up = target_migration is not None and not is_rollback
 
-    if is_rollback:
-        if not target_migration:
-            raise ValueError("Target migration is required for rollback plan")
-        queue = deque([target_migration])
-
-    def get_neighbors(m: Migration) -> list[str]:
-        # get the children of the migration
-        return [m.name for m in migration_tree.get(m.name, [])]
-
-    if is_bottom_up:
-        if not target_migration:
-            raise ValueError("Target migration is required for bottom-up plan")
-        queue = deque([target_migration])
-
-        def get_neighbors(m: Migration) -> list[str]:
-            return list(reversed(m.parents))
-
-    while queue:
-        current = queue.popleft()
-        if current.name in visited:
-            continue
-
-        if not is_bottom_up and not is_rollback and not all(p in visited for p in current.parents):
-            queue.append(current)  # requeue
-            continue
-
-        visited.add(current.name)
-        plan.append(current)
-        for neighbor_name in get_neighbors(current):
-            neighbor = changelog.get_migration_by_name(neighbor_name)
-            if neighbor.name in visited:
+    if is_rollback and not target_migration:
+        raise ValueError("Target migration is required for rollback plan")
+
+    if is_rollback or is_bottom_up:
+        assert target_migration is not None
+        # walk the children (rollback) or the parents (bottom-up) of the target and reverse the walk
+        plan_ids: list[int] = []
+        visited = bytearray(len(graph))
+        queue: deque[int] = deque([graph.id_of(target_migration.name)])
+        while queue:
+            current = queue.popleft()
+            if visited[current]:
                 continue
-            queue.append(neighbor)
-
-    plan = list(reversed(plan)) if is_bottom_up or is_rollback else plan
+            visited[current] = 1
+            plan_ids.append(current)
+            neighbors = graph.children(current) if is_rollback else reversed(graph.parents(current))
+            queue.extend(n for n in neighbors if not visited[n])
+        plan_ids.reverse()
+    else:
+        # topological order, a migration is only planned once all its parents are
+        pending_parents = array("I", (len(graph.parents(i)) for i in range(len(graph))))
+        plan_ids = []
+        queue = deque([0] if len(graph) else [])
+        while queue:
+            current = queue.popleft()
+            plan_ids.append(current)
+            for child in graph.children(current):
+                pending_parents[child] -= 1
+                if pending_parents[child] == 0:
+                    queue.append(child)
+
+    plan = [changelog.migrations[i] for i in plan_ids]
     if is_rollback:
         return [p for p in plan if statuses_map[p.name] == MigrationStatus.APPLIED]
-    return [p for p in plan if statuses_map[p.name] != MigrationStatus.APPLIED]
-
-
-def find_path(tree: OrderedDict[str, list[Migration]], parent: str, child: str, path: list[str] = []) -> list[str]:
+    plan = [p for p in plan if statuses_map[p.name] != MigrationStatus.APPLIED]
+    if phase is None:
+        return plan
+
+    # a migration of the phase can't run while one of its ancestors waits for the other phase
+    other = MigrationPhase.POST if phase == MigrationPhase.PRE else MigrationPhase.PRE
+    waiting: dict[str, str] = {}
+    for migration in plan:
+        blocker = next((waiting[p] for p in migration.parents if p in waiting), None)
+        if migration.phase == phase and blocker is not None:
+            raise ValueError(
+                f"Migration {migration.name} depends on {blocker}, which is pending in the {other.value}-deploy phase."
+            )
+        if migration.phase != phase:
+            waiting[migration.name] = blocker or migration.name
+    return [p for p in plan if p.phase == phase]
+
+
+def find_path(tree: MigrationGraph, parent: str, child: str) -> list[str]:
     """
     Find a path from parent to child in the migration tree.
     Args:
-        tree: The migration tree as an OrderedDict.
+        tree: The migrations graph.
         parent: The starting migration name.
         child: The target migration name.
     Returns:
         A list of migration names representing the path from parent to child, or an empty list if no path exists.
     """
-    path.append(parent)
-    if parent == child:
-        return path
-    for next_child in tree.get(parent, []):
-        result = find_path(tree, next_child.name, child, path)
-        if result:
-            return result
-    path.pop()
+    target = tree.id_of(child)
+    path = [tree.id_of(parent)]
+    next_child = [0]  # index of the next child to explore for each node of the path
+    while path:
+        current = path[-1]
+        if current == target:
+            return [tree.name_of(i) for i in path]
+        children = tree.children(current)
+        if next_child[-1] < len(children):
+            path.append(children[next_child[-1]])
+            next_child[-1] += 1
+            next_child.append(0)
+            continue
+        path.pop()
+        next_child.pop()
     return []
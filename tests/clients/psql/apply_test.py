@@ -1,7 +1,8 @@
 import os
+from unittest.mock import patch
 
-from migrateit.models import Migration
-from migrateit.tree import ROLLBACK_SPLIT_TAG
+from migrateit.models import Migration, MigrationStatus
+from migrateit.tree import ROLLBACK_SPLIT_TAG, build_merkle_tree
 from tests.clients.psql._base_test import BasePsqlTest
 
 
@@ -17,6 +18,13 @@ class TestPsqlClientApplyMigrations(BasePsqlTest):
             cursor.execute(sql)
             self.connection.commit()
 
+    def tearDown(self):
+        self.connection.rollback()
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.TEST_TABLE}")
+        self.connection.commit()
+        super().tearDown()
+
     def test_apply_migration_success(self):
         filename = "0000_init.sql"
         self._create_migrations_file(
@@ -47,6 +55,64 @@ class TestPsqlClientApplyMigrations(BasePsqlTest):
             result = cursor.fetchone()
             self.assertTrue(result[0] if result else None)
 
+    def test_status_marker(self):
+        self.assertIsNone(self.client.retrieve_status_marker())
+        filename = "0000_init.sql"
+        self._create_migrations_file(filename, sql="SELECT 1;")
+        migration = Migration(name=filename, initial=True)
+
+        self.client.apply_migration(migration, is_fake=True)
+        self.connection.commit()
+        marker = self.client.retrieve_status_marker()
+        self.assertIsNotNone(marker)
+
+        self._create_migrations_file(filename, sql="SELECT 2;")
+        self.client.update_migration_hash(migration)
+        self.connection.commit()
+        self.assertNotEqual(self.client.retrieve_status_marker(), marker)
+        self.connection.rollback()
+
+    def test_merkle_tree_follows_migrations_table(self):
+        self.assertIsNone(self.client._get_merkle_nodes([""]))
+        changelog = self._create_empty_changelog()
+        self._create_migrations_file(self.INIT_MIGRATION)
+        for filename in ("0001_first.sql", "0002_second.sql"):
+            self._create_migrations_file(filename, sql="SELECT 1;")
+            changelog.migrations.append(Migration(name=filename, parents=[changelog.migrations[-1].name]))
+        self.client.config.changelog = changelog
+        for migration in changelog.migrations:
+            self.client.apply_migration(migration, is_fake=True)
+
+        self._create_migrations_file("0002_second.sql", sql="SELECT 2;")
+        self.client.update_migration_hash(changelog.migrations[2])
+        self.client.apply_migration(changelog.migrations[1], is_fake=True, is_rollback=True)
+        self.connection.commit()
+
+        expected = build_merkle_tree(self.client.retrieve_applied_migrations())
+        self.assertEqual(self.client._get_merkle_nodes(list(expected)), expected)
+        statuses = self.client.retrieve_migration_statuses()
+        self.assertEqual(
+            list(statuses.values()), [MigrationStatus.APPLIED, MigrationStatus.NOT_APPLIED, MigrationStatus.APPLIED]
+        )
+
+    def test_bookkeeping_committed_together(self):
+        filename = "0000_init.sql"
+        self._create_migrations_file(filename, sql="SELECT 1;")
+        migration = Migration(name=filename, initial=True)
+        self.connection.autocommit = True
+        try:
+            with patch.object(self.client, "_update_changelog_digest", side_effect=RuntimeError("crash")):
+                with self.assertRaises(RuntimeError):
+                    self.client.apply_migration(migration)
+            self.assertTrue(self.connection.autocommit)
+            self.assertFalse(self.client.is_migration_applied(migration))
+
+            self.client.apply_migration(migration)
+            self.assertTrue(self.client.is_migration_applied(migration))
+            self.assertIsNotNone(self.client.retrieve_changelog_digest())
+        finally:
+            self.connection.autocommit = False
+
     def test_apply_migration_fake(self):
         filename = "0000_init.sql"
         self._create_migrations_file(
@@ -210,3 +276,69 @@ class TestPsqlClientApplyMigrations(BasePsqlTest):
             cursor.execute(f"SELECT COUNT(*) FROM {self.TEST_MIGRATIONS_TABLE} WHERE migration_name = %s", (filename,))
             result = cursor.fetchone()
             self.assertEqual(result[0] if result else None, 0)
+
+    def _count_test_table_rows(self) -> int:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {self.TEST_TABLE}")
+            result = cursor.fetchone()
+            return result[0] if result else 0
+
+    def test_apply_migration_inline_copy_block(self):
+        filename = "0008_inline_copy.sql"
+        self._create_migrations_file(
+            filename,
+            sql=(
+                f"CREATE TABLE {self.TEST_TABLE} (id INT PRIMARY KEY, data TEXT);\n"
+                f"COPY {self.TEST_TABLE} (id, data) FROM stdin;\n"
+                "1\tfirst\n"
+                "2\tsecond\n"
+                "\\.\n"
+                f"UPDATE {self.TEST_TABLE} SET data = upper(data);\n"
+            ),
+        )
+        changelog = self._create_empty_changelog()
+        migration = Migration(name=filename, parents=[self.INIT_MIGRATION])
+        changelog.migrations.append(migration)
+        self.client.config.changelog = changelog
+
+        self.client.apply_migration(migration, is_fake=False)
+
+        self.assertEqual(self._count_test_table_rows(), 2)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT data FROM {self.TEST_TABLE} ORDER BY id")
+            self.assertEqual([r[0] for r in cursor.fetchall()], ["FIRST", "SECOND"])
+
+    def test_apply_migration_copy_from_data_file(self):
+        filename = "0009_file_copy.sql"
+        data_path = self.migrations_dir / "0009_data.csv"
+        data_path.write_text("id,data\n1,first\n2,second\n3,third\n")
+        self._create_migrations_file(
+            filename,
+            sql=(
+                f"CREATE TABLE {self.TEST_TABLE} (id INT PRIMARY KEY, data TEXT);\n"
+                f"\\copy {self.TEST_TABLE} (id, data) FROM '0009_data.csv' WITH (FORMAT csv, HEADER true)\n"
+            ),
+        )
+        changelog = self._create_empty_changelog()
+        migration = Migration(name=filename, parents=[self.INIT_MIGRATION])
+        changelog.migrations.append(migration)
+        self.client.config.changelog = changelog
+
+        self.client.apply_migration(migration, is_fake=False)
+        self.assertEqual(self._count_test_table_rows(), 3)
+
+        # the data file is part of the migration hash
+        applied_hash = self.client._get_file_hash(self.migrations_dir / filename)
+        data_path.write_text("id,data\n1,first\n")
+        self.assertNotEqual(self.client._get_file_hash(self.migrations_dir / filename), applied_hash)
+
+    def test_apply_migration_unterminated_copy_block(self):
+        filename = "0010_unterminated_copy.sql"
+        self._create_migrations_file(filename, sql=f"COPY {self.TEST_TABLE} (id) FROM stdin;\n1\n2\n")
+        changelog = self._create_empty_changelog()
+        migration = Migration(name=filename, parents=[self.INIT_MIGRATION])
+        changelog.migrations.append(migration)
+        self.client.config.changelog = changelog
+
+        with self.assertRaises(ValueError):
+            self.client.apply_migration(migration, is_fake=False)
@@ -0,0 +1,202 @@
+import os
+from unittest.mock import patch
+
+import psycopg2
+
+from migrateit.clients import PsqlClient
+from migrateit.models import Migration
+from migrateit.online import online_state_table
+from tests.clients.psql._base_test import BasePsqlTest
+
+
+class Interrupted(Exception):
+    pass
+
+
+class TestPsqlOnlineAlter(BasePsqlTest):
+    TEST_TABLE = "test_online"
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(self.migrations_dir)
+        self.client.online_chunk_size = 100
+        self.client.online_chunk_sleep = 0
+        self.client.progress_interval = 0
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.client.create_migrations_table_str(self.TEST_MIGRATIONS_TABLE)[0])
+            cursor.execute(f"DROP TABLE IF EXISTS {online_state_table(self.TEST_MIGRATIONS_TABLE)}")
+            cursor.execute(f"DROP TABLE IF EXISTS {self.TEST_TABLE}")
+            cursor.execute(f"CREATE TABLE {self.TEST_TABLE} (id serial PRIMARY KEY, val int NOT NULL, name text)")
+            cursor.execute(f"CREATE INDEX {self.TEST_TABLE}_val_idx ON {self.TEST_TABLE} (val)")
+            cursor.execute(
+                f"INSERT INTO {self.TEST_TABLE} (val, name) SELECT g, 'n' || g FROM generate_series(1, 1000) g"
+            )
+        self.connection.commit()
+
+        self._create_migrations_file(
+            "0001_online.sql",
+            sql=f"\\online_alter {self.TEST_TABLE} ALTER COLUMN val TYPE bigint, ADD COLUMN note text DEFAULT 'x';\n",
+            rollback_sql=f"ALTER TABLE {self.TEST_TABLE} DROP COLUMN note;",
+        )
+        self.migration = Migration(name="0001_online.sql", parents=[])
+        self.connection.autocommit = True
+
+    def tearDown(self):
+        self.connection.autocommit = False
+        self.connection.rollback()
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.TEST_TABLE}, {self.TEST_TABLE}__migrateit_shadow")
+            cursor.execute(f"DROP FUNCTION IF EXISTS {self.TEST_TABLE}__migrateit_sync()")
+            cursor.execute(f"DROP TABLE IF EXISTS {online_state_table(self.TEST_MIGRATIONS_TABLE)}")
+        self.connection.commit()
+        super().tearDown()
+
+    def _fetch(self, query: str) -> list[tuple]:
+        with self.connection.cursor() as cursor:
+            cursor.execute(query)
+            rows = cursor.fetchall()
+        self.connection.rollback()
+        return rows
+
+    def test_online_alter(self):
+        rows = self.client.apply_migration(self.migration)
+        self.connection.commit()
+
+        self.assertEqual(rows, 1000)
+        self.assertEqual(
+            self._fetch(
+                f"SELECT column_name, data_type FROM information_schema.columns "
+                f"WHERE table_name = '{self.TEST_TABLE}' ORDER BY ordinal_position"
+            ),
+            [("id", "integer"), ("val", "bigint"), ("name", "text"), ("note", "text")],
+        )
+        self.assertEqual(self._fetch(f"SELECT count(*), sum(val) FROM {self.TEST_TABLE}"), [(1000, 500500)])
+        self.assertEqual(
+            sorted(self._fetch(f"SELECT indexname FROM pg_indexes WHERE tablename = '{self.TEST_TABLE}'")),
+            [(f"{self.TEST_TABLE}_pkey",), (f"{self.TEST_TABLE}_val_idx",)],
+        )
+        # the serial sequence moved with the table
+        self.assertEqual(
+            self._fetch(f"INSERT INTO {self.TEST_TABLE} (val) VALUES (0) RETURNING id, note"), [(1001, "x")]
+        )
+        self.assertEqual(
+            self._fetch(f"SELECT phase, rows_copied FROM {online_state_table(self.TEST_MIGRATIONS_TABLE)}"),
+            [("done", 1000)],
+        )
+
+    def test_online_alter_syncs_concurrent_changes(self):
+        other = psycopg2.connect(PsqlClient.get_environment_url())
+        calls = []
+
+        def change_rows(_):
+            if not calls:
+                with other.cursor() as cursor:
+                    cursor.execute(f"UPDATE {self.TEST_TABLE} SET val = -1 WHERE id IN (1, 900)")
+                    cursor.execute(f"DELETE FROM {self.TEST_TABLE} WHERE id IN (2, 901)")
+                    cursor.execute(f"INSERT INTO {self.TEST_TABLE} (val) VALUES (5000)")
+                other.commit()
+            calls.append(1)
+
+        self.client.online_chunk_sleep = 0.001
+        with patch("migrateit.online.time.sleep", change_rows):
+            self.client.apply_migration(self.migration)
+        self.connection.commit()
+        other.close()
+
+        self.assertEqual(
+            self._fetch(f"SELECT val FROM {self.TEST_TABLE} WHERE id IN (1, 2, 900, 901, 1001) ORDER BY id"),
+            [(-1,), (-1,), (5000,)],
+        )
+        self.assertEqual(self._fetch(f"SELECT count(*) FROM {self.TEST_TABLE}"), [(999,)])
+
+    def test_online_alter_resumes(self):
+        self.client.online_chunk_sleep = 0.001
+        with patch("migrateit.online.time.sleep", side_effect=[None, Interrupted()]):
+            with self.assertRaises(Interrupted):
+                self.client.apply_migration(self.migration)
+
+        self.assertEqual(
+            self._fetch(f"SELECT phase, last_key, rows_copied FROM {online_state_table(self.TEST_MIGRATIONS_TABLE)}"),
+            [("copying", "200", 200)],
+        )
+
+        rows = self.client.apply_migration(self.migration)
+        self.connection.commit()
+        self.assertEqual(rows, 800)
+        self.assertEqual(self._fetch(f"SELECT count(*), sum(val) FROM {self.TEST_TABLE}"), [(1000, 500500)])
+
+    def test_online_alter_rollback_clears_state(self):
+        self.client.apply_migration(self.migration)
+        self.connection.commit()
+        self.client.apply_migration(self.migration, is_rollback=True)
+        self.connection.commit()
+
+        self.assertEqual(self._fetch(f"SELECT count(*) FROM {online_state_table(self.TEST_MIGRATIONS_TABLE)}"), [(0,)])
+
+    def test_online_alter_requires_primary_key(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {self.TEST_TABLE} DROP CONSTRAINT {self.TEST_TABLE}_pkey")
+        self.connection.commit()
+
+        with self.assertRaises(ValueError) as ctx:
+            self.client.apply_migration(self.migration)
+        self.assertIn("single column primary key", str(ctx.exception))
+
+    def test_online_alter_keeps_grants(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"GRANT SELECT ON {self.TEST_TABLE} TO PUBLIC")
+            cursor.execute(f"GRANT UPDATE (name) ON {self.TEST_TABLE} TO PUBLIC")
+
+        self.client.apply_migration(self.migration)
+
+        self.assertEqual(
+            self._fetch(
+                f"SELECT privilege_type FROM information_schema.role_table_grants "
+                f"WHERE table_name = '{self.TEST_TABLE}' AND grantee = 'PUBLIC'"
+            ),
+            [("SELECT",)],
+        )
+        self.assertEqual(
+            self._fetch(
+                f"SELECT column_name, privilege_type FROM information_schema.column_privileges "
+                f"WHERE table_name = '{self.TEST_TABLE}' AND grantee = 'PUBLIC' AND privilege_type = 'UPDATE'"
+            ),
+            [("name", "UPDATE")],
+        )
+
+    def test_online_alter_rejects_triggers(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE FUNCTION {self.TEST_TABLE}_audit() RETURNS trigger LANGUAGE plpgsql AS "
+                "$$ BEGIN RETURN NEW; END $$"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER {self.TEST_TABLE}_audit BEFORE UPDATE ON {self.TEST_TABLE} "
+                f"FOR EACH ROW EXECUTE FUNCTION {self.TEST_TABLE}_audit()"
+            )
+
+        try:
+            with self.assertRaises(ValueError) as ctx:
+                self.client.apply_migration(self.migration)
+            self.assertIn(f"has triggers: {self.TEST_TABLE}_audit", str(ctx.exception))
+        finally:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE {self.TEST_TABLE}")
+                cursor.execute(f"DROP FUNCTION {self.TEST_TABLE}_audit()")
+
+    def test_online_alter_rejects_row_level_security(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {self.TEST_TABLE} ENABLE ROW LEVEL SECURITY")
+            cursor.execute(f"CREATE POLICY {self.TEST_TABLE}_positive ON {self.TEST_TABLE} USING (val > 0)")
+
+        with self.assertRaises(ValueError) as ctx:
+            self.client.apply_migration(self.migration)
+        self.assertIn("row level security", str(ctx.exception))
+
+    def test_online_alter_requires_statement_mode(self):
+        self.connection.autocommit = False
+
+        with self.assertRaises(ValueError) as ctx:
+            self.client.apply_migration(self.migration)
+        self.assertIn("--transaction-mode statement", str(ctx.exception))
+        self.assertEqual(self._fetch(f"SELECT to_regclass('{self.TEST_TABLE}__migrateit_shadow')"), [(None,)])
@@ -0,0 +1,106 @@
+import os
+from unittest.mock import patch
+
+from psycopg2 import errors
+
+from migrateit.clients._parallel import ParallelStatement, group_parallel_statements, run_parallel_statements
+from migrateit.models import Migration
+from tests.clients.psql._base_test import BasePsqlTest
+
+
+class TestPsqlParallel(BasePsqlTest):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(self.migrations_dir)
+        self._execute(
+            "DROP TABLE IF EXISTS parallel_b, parallel_a;"
+            "CREATE TABLE parallel_a (id int PRIMARY KEY, name text);"
+            "CREATE TABLE parallel_b (id int PRIMARY KEY, a_id int, name text);"
+            "ALTER TABLE parallel_b ADD CONSTRAINT parallel_b_a FOREIGN KEY (a_id) REFERENCES parallel_a NOT VALID;"
+        )
+
+    def tearDown(self):
+        self.connection.autocommit = False
+        self._execute("DROP TABLE IF EXISTS parallel_b, parallel_a;")
+        super().tearDown()
+
+    def _execute(self, sql: str) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql)
+        self.connection.commit()
+
+    def _indexes(self) -> list[str]:
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname FROM pg_indexes WHERE tablename LIKE 'parallel_%' AND indexname LIKE '%_name'"
+            )
+            return sorted(name for (name,) in cursor.fetchall())
+
+    def test_group_parallel_statements(self):
+        sql = (
+            "CREATE TABLE c (id int);\n"
+            "CREATE INDEX CONCURRENTLY a_name ON parallel_a (name);\n"
+            'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS b_name ON "Parallel_B" (name);\n'
+            "ALTER TABLE parallel_b VALIDATE CONSTRAINT parallel_b_a;\n"
+            "-- migrateit: parallel\n"
+            "ANALYZE parallel_a;\n"
+            "SELECT 1;\n"
+            "CREATE INDEX CONCURRENTLY c_id ON c (id);\n"
+        )
+
+        self.assertEqual(
+            group_parallel_statements(sql),
+            [
+                "CREATE TABLE c (id int);",
+                [
+                    ParallelStatement("CREATE INDEX CONCURRENTLY a_name ON parallel_a (name);", "parallel_a"),
+                    ParallelStatement(
+                        'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS b_name ON "Parallel_B" (name);', "parallel_b"
+                    ),
+                    ParallelStatement("ALTER TABLE parallel_b VALIDATE CONSTRAINT parallel_b_a;", "parallel_b"),
+                    ParallelStatement("ANALYZE parallel_a;"),
+                ],
+                "SELECT 1;",
+                "CREATE INDEX CONCURRENTLY c_id ON c (id);",
+            ],
+        )
+
+    def test_apply_migration_parallel_ddl(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.client.create_migrations_table_str(self.TEST_MIGRATIONS_TABLE)[0])
+        self.connection.commit()
+        self.connection.autocommit = True
+        self.client.parallel_ddl = 2
+        self._create_migrations_file(
+            "0000_init.sql",
+            sql="CREATE INDEX CONCURRENTLY parallel_a_name ON parallel_a (name);\n"
+            "CREATE INDEX CONCURRENTLY parallel_b_name ON parallel_b (name);\n"
+            "ALTER TABLE parallel_b VALIDATE CONSTRAINT parallel_b_a;\n",
+        )
+        migration = Migration(name="0000_init.sql", initial=True)
+
+        with patch("migrateit.clients.psql.run_parallel_statements", wraps=run_parallel_statements) as run:
+            self.client.apply_migration(migration)
+        self.assertEqual(len(run.call_args.args[1]), 3)
+        self.assertEqual(self._indexes(), ["parallel_a_name", "parallel_b_name"])
+        self.assertTrue(self.client.is_migration_applied(migration))
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT convalidated FROM pg_constraint WHERE conname = 'parallel_b_a'")
+            self.assertEqual(cursor.fetchone(), (True,))
+
+    def test_parallel_failure_not_recorded(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.client.create_migrations_table_str(self.TEST_MIGRATIONS_TABLE)[0])
+        self.connection.commit()
+        self.connection.autocommit = True
+        self.client.parallel_ddl = 4
+        self._create_migrations_file(
+            "0000_init.sql",
+            sql="CREATE INDEX CONCURRENTLY parallel_a_name ON parallel_a (name);\n"
+            "CREATE INDEX CONCURRENTLY parallel_b_name ON parallel_b (missing);\n",
+        )
+        migration = Migration(name="0000_init.sql", initial=True)
+
+        with self.assertRaises(errors.UndefinedColumn):
+            self.client.apply_migration(migration)
+        self.assertFalse(self.client.is_migration_applied(migration))
@@ -0,0 +1,62 @@
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+from migrateit.clients._progress import PROGRESS_QUERY, Progress, estimate_eta, progress_monitor, render_progress
+from migrateit.models import Migration
+from tests.clients.psql._base_test import BasePsqlTest
+
+
+class TestPsqlProgress(BasePsqlTest):
+    def test_progress_query(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(PROGRESS_QUERY, {"pid": self.connection.get_backend_pid()})
+            self.assertEqual(cursor.fetchall(), [])
+        self.connection.rollback()
+
+    def test_render_progress(self):
+        start = Progress("CREATE INDEX", "building index: scanning table", 100, 1000, 0, 0)
+        current = Progress("CREATE INDEX", "building index: scanning table", 400, 1000, 0, 0)
+
+        eta = estimate_eta(start, 10.0, current, 40.0)
+        assert eta is not None
+        self.assertAlmostEqual(eta, 60.0)
+        self.assertEqual(
+            render_progress(current, eta),
+            "\tCREATE INDEX: building index: scanning table | blocks 400/1000 (40.0%) | ETA 1m00s",
+        )
+        self.assertIsNone(estimate_eta(start, 10.0, Progress("CREATE INDEX", "other", 0, 0, 5, 10), 40.0))
+
+    def test_monitor_reports_changes(self):
+        rows = [
+            ("CLUSTER", "seq scanning heap", 10, 100, 50, 0),
+            ("CLUSTER", "seq scanning heap", 10, 100, 50, 0),
+            ("CLUSTER", "seq scanning heap", 60, 100, 300, 0),
+        ]
+        conn = MagicMock()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.fetchone.side_effect = rows + [None] * 1000
+
+        with patch("migrateit.clients._progress.write_line") as write_line:
+            with progress_monitor(lambda: conn, pid=42, interval=0.01):
+                time.sleep(0.2)
+
+        cursor.execute.assert_called_with(PROGRESS_QUERY, {"pid": 42})
+        lines = [call.args[0] for call in write_line.call_args_list]
+        self.assertEqual(len(lines), 2)
+        self.assertIn("blocks 10/100 (10.0%) | tuples 50", lines[0])
+        self.assertIn("ETA", lines[1])
+        conn.close.assert_called_once()
+
+    def test_apply_migration_with_monitor(self):
+        os.makedirs(self.migrations_dir)
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.client.create_migrations_table_str(self.TEST_MIGRATIONS_TABLE)[0])
+        self.client.progress_interval = 0.05
+        self._create_migrations_file("0000_init.sql", sql="SELECT pg_sleep(0.2);")
+        migration = Migration(name="0000_init.sql", initial=True)
+
+        with patch.object(self.client, "_open_connection", wraps=self.client._open_connection) as connect:
+            self.client.apply_migration(migration)
+        connect.assert_called_once()
+        self.connection.rollback()
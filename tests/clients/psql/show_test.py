@@ -22,12 +22,12 @@ class TestPsqlClientShowMigrations(BasePsqlTest):
             )
         self.connection.commit()
 
-    @patch.object(PsqlClient, "_get_content_hash")
-    def test_show_migrations_applied_and_not_applied(self, mock_get_content_hash):
+    @patch.object(PsqlClient, "_get_file_hash")
+    def test_show_migrations_applied_and_not_applied(self, mock_get_file_hash):
         migration_applied = Migration(name="001_init.sql")
         migration_not_applied = Migration(name="002_more.sql")
 
-        mock_get_content_hash.return_value = ("dummy_content", "dummy_reverse_content", "hash1")
+        mock_get_file_hash.return_value = "hash1"
         self._insert_migration_row("001_init.sql", "hash1")
 
         changelog = ChangelogFile(version=1, migrations=[migration_applied, migration_not_applied])
@@ -41,9 +41,9 @@ class TestPsqlClientShowMigrations(BasePsqlTest):
         }
         self.assertEqual(result, expected)
 
-    @patch.object(PsqlClient, "_get_content_hash")
-    def test_show_migrations_conflict_and_removed(self, mock_get_content_hash):
-        mock_get_content_hash.return_value = ("dummy_content", "dummy_reverse_content", "expected_hash")
+    @patch.object(PsqlClient, "_get_file_hash")
+    def test_show_migrations_conflict_and_removed(self, mock_get_file_hash):
+        mock_get_file_hash.return_value = "expected_hash"
 
         self._insert_migration_row("001_init.sql", "different_hash")  # mismatch
         self._insert_migration_row("ghost.sql", "ghost_hash")
@@ -56,11 +56,11 @@ class TestPsqlClientShowMigrations(BasePsqlTest):
         self.assertEqual(result["001_init.sql"], MigrationStatus.CONFLICT)
         self.assertEqual(result["ghost.sql"], MigrationStatus.REMOVED)
 
-    @patch.object(PsqlClient, "_get_content_hash")
-    def test_show_migrations_order_error(self, mock_get_content_hash):
-        mock_get_content_hash.side_effect = [
-            ("dummy_content", "dummy_reverse_content", "hash2"),  # for 002_second.sql
-            ("dummy_content", "dummy_reverse_content", "hash1"),  # for 001_second.sql
+    @patch.object(PsqlClient, "_get_file_hash")
+    def test_show_migrations_order_error(self, mock_get_file_hash):
+        mock_get_file_hash.side_effect = [
+            "hash2",  # for 002_second.sql
+            "hash1",  # for 001_second.sql
         ]
         self._insert_migration_row("002_second.sql", "hash2")
         changelog = ChangelogFile(
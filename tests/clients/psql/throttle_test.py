@@ -0,0 +1,82 @@
+import os
+from unittest.mock import MagicMock, patch
+
+from migrateit.clients._throttle import ReplicationLag, ReplicationThrottle, get_replication_lag
+from migrateit.models import Migration
+from tests.clients.psql._base_test import BasePsqlTest
+
+
+class TestPsqlThrottle(BasePsqlTest):
+    def test_replication_lag_query(self):
+        # no streaming replicas in the test database
+        self.assertEqual(get_replication_lag(self.connection), ReplicationLag(seconds=0.0, bytes=0))
+        self.connection.rollback()
+
+    def test_lag_exceeds(self):
+        lag = ReplicationLag(seconds=3.0, bytes=2048)
+        self.assertTrue(lag.exceeds(2, 0))
+        self.assertTrue(lag.exceeds(0, 1024))
+        self.assertFalse(lag.exceeds(5, 4096))
+        self.assertFalse(lag.exceeds(0, 0))
+
+    def test_throttle_waits_until_caught_up(self):
+        lags = [ReplicationLag(10.0, 0), ReplicationLag(4.0, 0), ReplicationLag(0.5, 0)]
+        throttle = ReplicationThrottle(MagicMock(), max_lag=1, interval=0.05)
+
+        with (
+            patch("migrateit.clients._throttle.get_replication_lag", side_effect=lags) as get_lag,
+            patch("migrateit.clients._throttle.write_line") as write_line,
+        ):
+            self.assertGreater(throttle.wait(), 0)
+            # checked at most once per interval
+            self.assertEqual(throttle.wait(), 0)
+
+        self.assertEqual(get_lag.call_count, 3)
+        self.assertGreater(throttle.throttled, 0)
+        self.assertEqual(write_line.call_count, 2)
+        self.assertIn("10.0s / 0 bytes", write_line.call_args_list[0].args[0])
+
+    def test_throttle_disabled(self):
+        throttle = ReplicationThrottle(MagicMock())
+        with patch("migrateit.clients._throttle.get_replication_lag") as get_lag:
+            self.assertEqual(throttle.wait(), 0)
+        get_lag.assert_not_called()
+
+    def test_apply_migration_throttled_between_statements(self):
+        os.makedirs(self.migrations_dir)
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.client.create_migrations_table_str(self.TEST_MIGRATIONS_TABLE)[0])
+        self.connection.commit()
+        self.connection.autocommit = True
+        self.client.max_replication_lag = 1
+        self.client.replication_check_interval = 0
+        self._create_migrations_file("0000_init.sql", sql="SELECT 1;\nSELECT 2;\nSELECT 3;")
+
+        with patch.object(self.client.throttle, "wait", return_value=0.0) as wait:
+            self.client.apply_migration(Migration(name="0000_init.sql", initial=True))
+        self.assertEqual(wait.call_count, 3)
+
+    def test_throttle_between_migrations(self):
+        self.client.max_replication_lag = 1
+
+        def wait():
+            self.assertTrue(self.connection.autocommit)
+            return 0.0
+
+        with patch.object(self.client.throttle, "wait", side_effect=wait) as mock_wait:
+            self.client.throttle_between_migrations()
+        mock_wait.assert_called_once()
+        self.assertFalse(self.connection.autocommit)
+
+    def test_apply_migration_not_throttled_in_transaction(self):
+        os.makedirs(self.migrations_dir)
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.client.create_migrations_table_str(self.TEST_MIGRATIONS_TABLE)[0])
+        self.connection.commit()
+        self.client.max_replication_lag = 1
+        self._create_migrations_file("0000_init.sql", sql="SELECT 1;\nSELECT 2;")
+
+        with patch.object(self.client.throttle, "wait", return_value=0.0) as wait:
+            self.client.apply_migration(Migration(name="0000_init.sql", initial=True))
+        wait.assert_not_called()
+        self.connection.rollback()
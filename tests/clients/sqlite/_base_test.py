@@ -0,0 +1,55 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from migrateit.clients import SqliteClient
+from migrateit.models import MigrateItConfig, SupportedDatabase
+from migrateit.models.migration import Migration
+from migrateit.tree import ROLLBACK_SPLIT_TAG, create_changelog_file
+
+
+@patch("migrateit.reporters.output.write_line_b", lambda *_: None)
+class BaseSqliteTest(unittest.TestCase):
+    INIT_MIGRATION = "0000_migrateit.sql"
+    TEST_MIGRATIONS_TABLE = "migrations"
+
+    def setUp(self):
+        self.connection = sqlite3.connect(":memory:", autocommit=False)
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.migrations_dir = self.temp_dir / "migrations"
+        os.makedirs(self.migrations_dir)
+        self.changelog = create_changelog_file(self.temp_dir / "changelog.json", SupportedDatabase.SQLITE)
+
+        self.config = MigrateItConfig(
+            table_name=self.TEST_MIGRATIONS_TABLE,
+            migrations_dir=self.migrations_dir,
+            changelog=self.changelog,
+        )
+        self.client = SqliteClient(connection=self.connection, config=self.config)
+
+        sql, rollback = self.client.create_migrations_table_str(self.TEST_MIGRATIONS_TABLE)
+        self._create_migrations_file(self.INIT_MIGRATION, sql=sql, rollback_sql=rollback)
+        self.changelog.migrations.append(Migration(name=self.INIT_MIGRATION, initial=True))
+
+    def tearDown(self):
+        self.connection.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _add_migration(self, filename: str, sql: str, rollback_sql: str | None = None) -> Migration:
+        self._create_migrations_file(filename, sql=sql, rollback_sql=rollback_sql)
+        migration = Migration(name=filename, parents=[self.changelog.migrations[-1].name])
+        self.changelog.migrations.append(migration)
+        return migration
+
+    def _create_migrations_file(self, filename: str, sql: str | None = None, rollback_sql: str | None = None) -> str:
+        path = os.path.join(self.migrations_dir, filename)
+        with open(path, "w") as f:
+            f.write(sql or f"-- Migration {filename}\n")
+            f.write(f"{ROLLBACK_SPLIT_TAG}")
+            if rollback_sql:
+                f.write(f"\n\n{rollback_sql}")
+        return path
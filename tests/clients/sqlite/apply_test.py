@@ -0,0 +1,189 @@
+import sqlite3
+from unittest.mock import patch
+
+from migrateit.models import MigrationStatus
+from migrateit.tree import EMPTY_NAMES_DIGEST, build_merkle_tree, compress_migration_file, compute_names_digest
+from tests.clients.sqlite._base_test import BaseSqliteTest
+
+
+class TestSqliteClient(BaseSqliteTest):
+    TEST_TABLE = "test_entity"
+
+    def setUp(self):
+        super().setUp()
+        self.client.apply_migration(self.changelog.migrations[0])
+        self.connection.commit()
+        self.migration = self._add_migration(
+            "0001_entity.sql",
+            sql=f"CREATE TABLE {self.TEST_TABLE} (id INTEGER PRIMARY KEY, data TEXT);\n"
+            f"INSERT INTO {self.TEST_TABLE} (data) VALUES ('a'), ('b');",
+            rollback_sql=f"DROP TABLE {self.TEST_TABLE};",
+        )
+
+    def _tables(self) -> list[str]:
+        rows = self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")
+        bookkeeping = (self.client.digest_table_name, self.client.merkle_table_name)
+        return [name for (name,) in rows if not name.startswith("sqlite_") and name not in bookkeeping]
+
+    def test_apply_and_rollback_migration(self):
+        self.assertEqual(self.client.apply_migration(self.migration), 2)
+        self.connection.commit()
+
+        self.assertTrue(self.client.is_migration_applied(self.migration))
+        self.assertEqual(self._tables(), [self.TEST_MIGRATIONS_TABLE, self.TEST_TABLE])
+        with self.assertRaises(ValueError):
+            self.client.apply_migration(self.migration)
+
+        self.client.apply_migration(self.migration, is_rollback=True)
+        self.connection.commit()
+        self.assertFalse(self.client.is_migration_applied(self.migration))
+        self.assertEqual(self._tables(), [self.TEST_MIGRATIONS_TABLE])
+
+    def test_apply_compressed_migration(self):
+        compress_migration_file(self.migrations_dir / self.migration.name, ".gz")
+
+        self.assertEqual(self.client.apply_migration(self.migration), 2)
+        self.assertEqual(self._tables(), [self.TEST_MIGRATIONS_TABLE, self.TEST_TABLE])
+        self.assertEqual(self.client.retrieve_migration_statuses()[self.migration.name], MigrationStatus.APPLIED)
+
+        self.client.apply_migration(self.migration, is_rollback=True)
+        self.assertEqual(self._tables(), [self.TEST_MIGRATIONS_TABLE])
+
+    def test_bookkeeping_committed_together(self):
+        self.connection.autocommit = True
+        with patch.object(self.client, "_update_changelog_digest", side_effect=RuntimeError("crash")):
+            with self.assertRaises(RuntimeError):
+                self.client.apply_migration(self.migration)
+        self.assertIs(self.connection.autocommit, True)
+        self.assertFalse(self.client.is_migration_applied(self.migration))
+
+    def test_changelog_digest(self):
+        self.assertEqual(self.client.retrieve_changelog_digest(), (compute_names_digest([self.INIT_MIGRATION]), 1))
+
+        self.client.apply_migration(self.migration)
+        self.assertEqual(
+            self.client.retrieve_changelog_digest(),
+            (compute_names_digest([self.INIT_MIGRATION, self.migration.name]), 2),
+        )
+
+        self.client.apply_migration(self.migration, is_rollback=True)
+        self.assertEqual(self.client.retrieve_changelog_digest(), (compute_names_digest([self.INIT_MIGRATION]), 1))
+
+    def test_apply_migration_error_rolls_back(self):
+        broken = self._add_migration(
+            "0002_broken.sql", sql="CREATE TABLE broken (id int);\nINSERT INTO missing VALUES (1);"
+        )
+        self.connection.commit()
+
+        with self.assertRaises(sqlite3.OperationalError):
+            self.client.apply_migration(broken)
+        self.assertEqual(self._tables(), [self.TEST_MIGRATIONS_TABLE])
+
+    def test_apply_migration_fake(self):
+        self.client.apply_migration(self.migration, is_fake=True)
+
+        self.assertTrue(self.client.is_migration_applied(self.migration))
+        self.assertEqual(self._tables(), [self.TEST_MIGRATIONS_TABLE])
+
+    def test_retrieve_migration_statuses(self):
+        self.client.apply_migration(self.migration)
+        gone = self._add_migration("0009_gone.sql", sql="SELECT 1;")
+        self.client.apply_migration(gone)
+        self.changelog.migrations.remove(gone)
+        with open(self.migrations_dir / self.migration.name, "a") as f:
+            f.write("\n-- changed")
+
+        self.assertEqual(
+            self.client.retrieve_migration_statuses(),
+            {
+                self.INIT_MIGRATION: MigrationStatus.APPLIED,
+                self.migration.name: MigrationStatus.CONFLICT,
+                "0009_gone.sql": MigrationStatus.REMOVED,
+            },
+        )
+
+    def test_validate_migrations_conflicts(self):
+        self.client.apply_migration(self.migration)
+        with open(self.migrations_dir / self.migration.name, "a") as f:
+            f.write("\n-- changed")
+
+        with self.assertRaises(ValueError) as ctx:
+            self.client.validate_migrations(self.client.retrieve_migration_statuses())
+        statuses = self.client.retrieve_migration_statuses()
+        with (
+            patch.object(self.client, "_get_database_hashes") as mock_hashes,
+            self.assertRaises(ValueError) as ctx,
+        ):
+            self.client.validate_migrations(statuses)
+        mock_hashes.assert_not_called()
+        self.assertIn(f"{self.migration.name} (found=", str(ctx.exception))
+        self.assertNotIn(self.INIT_MIGRATION, str(ctx.exception))
+
+    def test_retrieve_migration_statuses_reads_differing_rows(self):
+        migrations = [self._add_migration(f"{i:04}_step.sql", sql=f"SELECT {i};") for i in range(2, 30)]
+        for migration in migrations[:-1]:
+            self.client.apply_migration(migration)
+        with open(self.migrations_dir / migrations[0].name, "a") as f:
+            f.write("\n-- changed")
+
+        with (
+            patch.object(self.client, "_get_database_hashes", wraps=self.client._get_database_hashes) as mock_hashes,
+            patch.object(self.client, "retrieve_applied_migrations") as mock_rows,
+        ):
+            statuses = self.client.retrieve_migration_statuses()
+        mock_rows.assert_not_called()
+        self.assertEqual(
+            sorted(mock_hashes.call_args.args[0]), [self.migration.name, migrations[0].name, migrations[-1].name]
+        )
+        self.assertEqual(statuses[migrations[0].name], MigrationStatus.CONFLICT)
+        self.assertEqual(statuses[migrations[-1].name], MigrationStatus.NOT_APPLIED)
+        self.assertEqual(statuses[self.migration.name], MigrationStatus.NOT_APPLIED)
+        self.assertEqual(
+            [n for n, s in statuses.items() if s == MigrationStatus.APPLIED],
+            [self.INIT_MIGRATION, *(m.name for m in migrations[1:-1])],
+        )
+
+    def test_merkle_tree_follows_migrations_table(self):
+        squashed = self._add_migration("0002_squashed.sql", sql="SELECT 1;")
+        self.client.apply_migration(self.migration)
+        self.client.apply_migration(squashed)
+        with open(self.migrations_dir / squashed.name, "a") as f:
+            f.write("\n-- changed")
+        self.client.update_migration_hash(squashed)
+        self.client.apply_migration(self.migration, is_rollback=True)
+
+        nodes = self.connection.execute(f"SELECT node, digest FROM {self.client.merkle_table_name}")
+        self.assertEqual(
+            {node: digest for node, digest in nodes if digest != EMPTY_NAMES_DIGEST},
+            build_merkle_tree(self.client.retrieve_applied_migrations()),
+        )
+
+    def test_squash_and_update_hash(self):
+        self.client.apply_migration(self.migration)
+        squashed = self._add_migration("0002_squashed.sql", sql="SELECT 1;")
+        self.client.squash_migrations([self.migration.name], squashed)
+
+        rows = self.connection.execute(f"SELECT migration_name, squashed FROM {self.TEST_MIGRATIONS_TABLE} ORDER BY id")
+        self.assertEqual(list(rows), [(self.INIT_MIGRATION, 0), (self.migration.name, 1), (squashed.name, 0)])
+
+        with open(self.migrations_dir / squashed.name, "a") as f:
+            f.write("\n-- changed")
+        self.client.update_migration_hash(squashed)
+        self.assertEqual(self.client.retrieve_migration_statuses()[squashed.name], MigrationStatus.APPLIED)
+
+    def test_validate_sql_syntax(self):
+        self.assertIsNone(self.client.validate_sql_syntax(self.migration))
+        self.assertEqual(self._tables(), [self.TEST_MIGRATIONS_TABLE])
+
+        broken = self._add_migration("0002_broken.sql", sql="CREATE TABLE broken (id int);\nCREAT TABLE oops (id int);")
+        result = self.client.validate_sql_syntax(broken)
+        assert result is not None
+        error, statement = result
+        self.assertIn("syntax error", str(error))
+        self.assertEqual(statement, "CREAT TABLE oops (id int);")
+
+    def test_copy_blocks_not_supported(self):
+        copy = self._add_migration("0002_copy.sql", sql="COPY test_entity (data) FROM stdin;\nc\n\\.\n")
+
+        with self.assertRaises(NotImplementedError):
+            self.client.apply_migration(copy)
@@ -0,0 +1,69 @@
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from migrateit.cli import cmd_init, cmd_new, cmd_run
+from migrateit.clients import PsqlClient, SqliteClient, get_client_class
+from migrateit.models import MigrateItConfig, MigrationStatus, SupportedDatabase, TransactionMode
+from migrateit.tree import load_changelog_file, write_into_migration_file
+
+
+@patch("migrateit.reporters.output.write_line_b", lambda *_: None)
+class TestSqliteRun(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.migrations_dir = self.temp_dir / "migrations"
+        with patch("migrateit.reporters.output.write_line_b", lambda *_: None):
+            cmd_init(
+                table_name="migrations",
+                migrations_dir=self.migrations_dir,
+                migrations_file=self.temp_dir / "changelog.json",
+                database=SupportedDatabase.SQLITE,
+            )
+
+        config = MigrateItConfig(
+            table_name="migrations",
+            migrations_dir=self.migrations_dir,
+            changelog=load_changelog_file(self.temp_dir / "changelog.json"),
+        )
+        with patch.dict("os.environ", {"DB_URL": "sqlite://"}):
+            self.client = SqliteClient(SqliteClient.connect(), config)
+
+    def tearDown(self):
+        self.client.connection.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_get_client_class(self):
+        self.assertIs(get_client_class(SupportedDatabase.POSTGRES), PsqlClient)
+        self.assertIs(get_client_class(SupportedDatabase.SQLITE), SqliteClient)
+
+    def test_environment_url(self):
+        for url, expected in (
+            ("sqlite://", ":memory:"),
+            ("sqlite:///db/app.db", "db/app.db"),
+            ("sqlite:////var/app.db", "/var/app.db"),
+            ("app.db", "app.db"),
+        ):
+            with patch.dict("os.environ", {"DB_URL": url}):
+                self.assertEqual(SqliteClient.get_environment_url(), expected)
+
+    def test_cmd_run_and_rollback(self):
+        cmd_run(self.client)
+        cmd_new(self.client, name="users", no_edit=True)
+        write_into_migration_file(
+            self.migrations_dir / "0001_users.sql",
+            sql="CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT);\nCREATE INDEX users_name ON users (name);",
+            rollback="DROP TABLE users;",
+        )
+
+        for mode in TransactionMode:
+            cmd_run(self.client, transaction_mode=mode)
+            self.assertEqual(set(self.client.retrieve_migration_statuses().values()), {MigrationStatus.APPLIED}, mode)
+            cmd_run(self.client, name="0001", is_rollback=True, transaction_mode=mode)
+            self.assertEqual(self.client.retrieve_migration_statuses()["0001_users.sql"], MigrationStatus.NOT_APPLIED)
+
+        with self.assertRaises(sqlite3.OperationalError):
+            self.client.connection.execute("SELECT * FROM users")
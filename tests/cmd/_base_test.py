@@ -31,6 +31,9 @@ class BaseCmdTest(unittest.TestCase):
     def _drop_test_table(self):
         with self.connection.cursor() as cursor:
             cursor.execute(f"DROP TABLE IF EXISTS {self.TEST_MIGRATIONS_TABLE}")
+            cursor.execute(f"DROP TABLE IF EXISTS {self.TEST_MIGRATIONS_TABLE}_digest")
+            cursor.execute(f"DROP TABLE IF EXISTS {self.TEST_MIGRATIONS_TABLE}_fingerprint")
+            cursor.execute(f"DROP TABLE IF EXISTS {self.TEST_MIGRATIONS_TABLE}_merkle")
         self.connection.commit()
 
     def _create_migrations_file(self, filename: str, sql: str | None = None, rollback_sql: str | None = None) -> str:
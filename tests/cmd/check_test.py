@@ -0,0 +1,69 @@
+from unittest.mock import patch
+
+from migrateit.cli import CHECK_BEHIND, CHECK_DIVERGED, CHECK_UP_TO_DATE, cmd_check, cmd_init, cmd_new, cmd_run
+from migrateit.clients.psql import PsqlClient
+from migrateit.models import Migration
+from migrateit.models.changelog import SupportedDatabase
+from migrateit.models.config import MigrateItConfig
+from migrateit.tree import load_changelog_file
+from tests.cmd._base_test import BaseCmdTest
+
+
+@patch("migrateit.reporters.output.write_line_b", lambda *_: None)
+class CliCheckTest(BaseCmdTest):
+    def setUp(self):
+        super().setUp()
+
+        with patch("migrateit.reporters.output.write_line_b", lambda *_: None):
+            cmd_init(
+                table_name=self.TEST_MIGRATIONS_TABLE,
+                migrations_dir=self.migrations_dir,
+                migrations_file=self.temp_dir / "changelog.json",
+                database=SupportedDatabase.POSTGRES,
+            )
+
+        self.changelog = load_changelog_file(self.temp_dir / "changelog.json")
+        self.config = MigrateItConfig(
+            table_name=self.TEST_MIGRATIONS_TABLE,
+            migrations_dir=self.migrations_dir,
+            changelog=self.changelog,
+        )
+        self.client = PsqlClient(connection=self.connection, config=self.config)
+
+        for name in ("0001_first.sql", "0002_second.sql"):
+            cmd_new(self.client, name=name[5:-4], no_edit=True)
+            self._create_migrations_file(name, sql="SELECT 1;", rollback_sql="SELECT 1;")
+
+    def test_cmd_check(self):
+        self.assertEqual(cmd_check(self.client), CHECK_BEHIND)
+
+        cmd_run(self.client, "0001")
+        with patch.object(self.client, "retrieve_applied_migrations") as retrieve:
+            self.assertEqual(cmd_check(self.client), CHECK_BEHIND)
+            retrieve.assert_not_called()
+
+        cmd_run(self.client)
+        with patch.object(self.client, "retrieve_applied_migrations") as retrieve:
+            self.assertEqual(cmd_check(self.client), CHECK_UP_TO_DATE)
+            retrieve.assert_not_called()
+
+        cmd_run(self.client, "0002", is_rollback=True)
+        self.assertEqual(cmd_check(self.client), CHECK_BEHIND)
+
+    def test_cmd_check_ahead_and_diverged(self):
+        cmd_run(self.client)
+        second = self.changelog.migrations.pop()
+
+        # an older build only knows about part of the migrations
+        self.assertEqual(cmd_check(self.client), CHECK_UP_TO_DATE)
+
+        self.changelog.migrations.append(Migration(name="0002_other.sql", parents=second.parents))
+        self.assertEqual(cmd_check(self.client), CHECK_DIVERGED)
+
+    def test_cmd_check_without_digest(self):
+        cmd_run(self.client)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {self.TEST_MIGRATIONS_TABLE}_digest")
+        self.connection.commit()
+
+        self.assertEqual(cmd_check(self.client), CHECK_UP_TO_DATE)
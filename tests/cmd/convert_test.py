@@ -0,0 +1,47 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from migrateit.cli import cmd_convert
+from migrateit.models.changelog import SupportedDatabase
+from migrateit.tree import create_changelog_file, create_migration_directory, create_new_migration, load_changelog_file
+
+
+@patch("migrateit.reporters.output.write_line_b", lambda *_: None)
+class CliConvertTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.migrations_dir = self.temp_dir / "migrations"
+        create_migration_directory(self.migrations_dir)
+
+        with patch("migrateit.reporters.output.write_line_b", lambda *_: None):
+            changelog = create_changelog_file(self.temp_dir / "changelog.json", SupportedDatabase.POSTGRES)
+            create_new_migration(changelog, self.migrations_dir, "init")
+            create_new_migration(changelog, self.migrations_dir, "add_users")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_cmd_convert_roundtrip(self):
+        cmd_convert(self.temp_dir / "changelog.json", target_format="jsonl")
+
+        self.assertFalse((self.temp_dir / "changelog.json").exists())
+        changelog = load_changelog_file(self.temp_dir / "changelog.jsonl")
+        self.assertTrue(changelog.is_jsonl)
+        self.assertEqual([m.name for m in changelog.migrations], ["0000_init.sql", "0001_add_users.sql"])
+
+        cmd_convert(self.temp_dir / "changelog.jsonl", target_format="json")
+
+        self.assertFalse((self.temp_dir / "changelog.jsonl").exists())
+        changelog = load_changelog_file(self.temp_dir / "changelog.json")
+        self.assertEqual([m.name for m in changelog.migrations], ["0000_init.sql", "0001_add_users.sql"])
+
+    def test_cmd_convert_same_format(self):
+        cmd_convert(self.temp_dir / "changelog.json", target_format="json")
+        self.assertTrue((self.temp_dir / "changelog.json").exists())
+
+    def test_cmd_convert_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            cmd_convert(self.temp_dir / "changelog.json", target_format="yaml")
@@ -0,0 +1,151 @@
+from unittest.mock import patch
+
+import psycopg2
+
+from migrateit.cli import cmd_drift, cmd_init, cmd_new, cmd_run
+from migrateit.clients.psql import PsqlClient
+from migrateit.drift import compare_fingerprints, fingerprint_schema
+from migrateit.models import TransactionMode
+from migrateit.models.changelog import SupportedDatabase
+from migrateit.models.config import MigrateItConfig
+from migrateit.tree import load_changelog_file
+from tests.cmd._base_test import BaseCmdTest
+
+
+@patch("migrateit.reporters.output.write_line_b", lambda *_: None)
+class CliDriftTest(BaseCmdTest):
+    def setUp(self):
+        super().setUp()
+
+        with patch("migrateit.reporters.output.write_line_b", lambda *_: None):
+            cmd_init(
+                table_name=self.TEST_MIGRATIONS_TABLE,
+                migrations_dir=self.migrations_dir,
+                migrations_file=self.temp_dir / "changelog.json",
+                database=SupportedDatabase.POSTGRES,
+            )
+
+        self.changelog = load_changelog_file(self.temp_dir / "changelog.json")
+        self.config = MigrateItConfig(
+            table_name=self.TEST_MIGRATIONS_TABLE,
+            migrations_dir=self.migrations_dir,
+            changelog=self.changelog,
+        )
+        self.client = PsqlClient(connection=self.connection, config=self.config)
+
+        cmd_new(self.client, name="drift", no_edit=True)
+        self._create_migrations_file(
+            "0001_drift.sql",
+            sql="CREATE TABLE drift_test (id int PRIMARY KEY, name text DEFAULT 'a');\n"
+            "CREATE INDEX drift_test_name ON drift_test (name);",
+            rollback_sql="DROP TABLE drift_test;",
+        )
+
+    def tearDown(self):
+        self.connection.rollback()
+        self._execute("DROP TABLE IF EXISTS drift_test;")
+        self._execute("DROP TABLE IF EXISTS drift_more;")
+        super().tearDown()
+
+    def _execute(self, sql: str) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql)
+        self.connection.commit()
+
+    def _drift(self):
+        recorded = self.client.retrieve_schema_fingerprint()
+        assert recorded is not None
+        return compare_fingerprints(recorded, fingerprint_schema(self.client.retrieve_schema_objects()))
+
+    def test_cmd_drift(self):
+        self.assertEqual(cmd_drift(self.client), 0)  # nothing recorded yet
+        cmd_run(self.client)
+
+        objects = self.client.retrieve_schema_objects()
+        self.assertEqual(objects["column public.drift_test.name"], "text DEFAULT 'a'::text")
+        self.assertIn("index public.drift_test_name", objects)
+        self.assertIn("constraint public.drift_test.drift_test_pkey", objects)
+        fingerprint = self.client.retrieve_schema_fingerprint()
+        assert fingerprint is not None
+        self.assertFalse(any(self.TEST_MIGRATIONS_TABLE in key for key in fingerprint))
+        self.assertEqual(cmd_drift(self.client), 0)
+
+        self._execute(
+            "ALTER TABLE drift_test ADD COLUMN hotfix int, ALTER COLUMN name SET DEFAULT 'b';"
+            "DROP INDEX drift_test_name;"
+        )
+        drift = self._drift()
+        self.assertEqual(drift.added, ["column public.drift_test.hotfix"])
+        self.assertEqual(drift.removed, ["index public.drift_test_name"])
+        self.assertEqual(drift.changed, ["column public.drift_test.name"])
+        self.assertEqual(cmd_drift(self.client), 1)
+
+    def test_fingerprint_recorded_on_rollback(self):
+        cmd_run(self.client)
+        cmd_run(self.client, "0001", is_rollback=True)
+
+        self.assertFalse(self._drift())
+        self.assertNotIn("table public.drift_test", self.client.retrieve_schema_fingerprint() or {})
+
+    def test_drift_kept_on_migrate(self):
+        cmd_run(self.client)
+        self._execute("ALTER TABLE drift_test ADD COLUMN hotfix int;")
+
+        cmd_new(self.client, name="more", no_edit=True)
+        self._create_migrations_file(
+            "0002_more.sql", sql="ALTER TABLE drift_test ADD COLUMN more int;", rollback_sql=""
+        )
+        cmd_run(self.client)
+
+        # the manual change is still reported after the next migrate, the migrated one is not
+        drift = self._drift()
+        self.assertEqual(drift.added, ["column public.drift_test.hotfix"])
+        self.assertFalse(drift.removed or drift.changed)
+        self.assertEqual(cmd_drift(self.client), 1)
+
+    def test_drift_accept(self):
+        cmd_run(self.client)
+        self._execute("CREATE INDEX drift_test_hotfix ON drift_test (id, name);")
+
+        # the hotfix made it to a migration, it is still reported until accepted
+        cmd_new(self.client, name="hotfix", no_edit=True)
+        self._create_migrations_file(
+            "0002_hotfix.sql", sql="CREATE INDEX IF NOT EXISTS drift_test_hotfix ON drift_test (id, name);"
+        )
+        cmd_run(self.client)
+        self.assertEqual(self._drift().added, ["index public.drift_test_hotfix"])
+
+        self.assertEqual(cmd_drift(self.client, accept=True), 0)
+        self.assertFalse(self._drift())
+        self.assertEqual(cmd_drift(self.client), 0)
+
+    def test_fingerprint_recorded_before_failure(self):
+        cmd_run(self.client)
+        cmd_new(self.client, name="more", no_edit=True)
+        self._create_migrations_file(
+            "0002_more.sql", sql="CREATE TABLE drift_more (id int);", rollback_sql="DROP TABLE drift_more;"
+        )
+        cmd_new(self.client, name="broken", no_edit=True)
+        self._create_migrations_file("0003_broken.sql", sql="SELECT * FROM missing_table;")
+
+        with self.assertRaises(psycopg2.errors.UndefinedTable):
+            cmd_run(self.client, transaction_mode=TransactionMode.MIGRATION)
+
+        # the migration committed before the failure is part of the recorded schema
+        self.assertFalse(self._drift())
+        self.assertIn("table public.drift_more", self.client.retrieve_schema_fingerprint() or {})
+
+    def test_default_table_name_excluded(self):
+        # the default table name is upper case, created unquoted it is stored in lower case
+        config = MigrateItConfig(
+            table_name="MIGRATEIT_CHANGELOG", migrations_dir=self.migrations_dir, changelog=self.changelog
+        )
+        client = PsqlClient(connection=self.connection, config=config)
+        try:
+            for table in client.internal_tables:
+                self._execute(f"CREATE TABLE {table} (id int PRIMARY KEY);")
+            objects = client.retrieve_schema_objects()
+        finally:
+            self.connection.rollback()
+            self._execute("".join(f"DROP TABLE IF EXISTS {table};" for table in client.internal_tables))
+        self.assertFalse([key for key in objects if "migrateit_changelog" in key])
@@ -0,0 +1,62 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from migrateit.cli import cmd_lint
+from migrateit.models.changelog import SupportedDatabase
+from migrateit.tree import (
+    create_changelog_file,
+    create_migration_directory,
+    create_new_migration,
+    load_changelog_file,
+    write_into_migration_file,
+)
+
+
+@patch("migrateit.reporters.output.write_line_b", lambda *_: None)
+class CliLintTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.migrations_dir = self.temp_dir / "migrations"
+        self.baseline = self.temp_dir / "lint-baseline.json"
+        create_migration_directory(self.migrations_dir)
+
+        with patch("migrateit.reporters.output.write_line_b", lambda *_: None):
+            changelog = create_changelog_file(self.temp_dir / "changelog.json", SupportedDatabase.POSTGRES)
+            create_new_migration(changelog, self.migrations_dir, "init")
+            create_new_migration(changelog, self.migrations_dir, "index")
+        write_into_migration_file(
+            self.migrations_dir / "0000_init.sql", sql="CREATE TABLE users (id int);", rollback=None
+        )
+        write_into_migration_file(
+            self.migrations_dir / "0001_index.sql", sql="CREATE INDEX idx ON users (id);", rollback=None
+        )
+        self.changelog = load_changelog_file(self.temp_dir / "changelog.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_cmd_lint(self):
+        self.assertEqual(cmd_lint(self.changelog, self.migrations_dir), 1)
+        self.assertEqual(cmd_lint(self.changelog, self.migrations_dir, names=["0000"]), 0)
+        self.assertEqual(
+            cmd_lint(self.changelog, self.migrations_dir, disabled_rules=["create-index-not-concurrently"]), 0
+        )
+
+    def test_cmd_lint_unknown_rule(self):
+        with self.assertRaises(ValueError):
+            cmd_lint(self.changelog, self.migrations_dir, disabled_rules=["unknown"])
+
+    def test_cmd_lint_baseline(self):
+        self.assertEqual(cmd_lint(self.changelog, self.migrations_dir, baseline=self.baseline), 1)
+        self.assertEqual(cmd_lint(self.changelog, self.migrations_dir, baseline=self.baseline, update_baseline=True), 0)
+        self.assertEqual(cmd_lint(self.changelog, self.migrations_dir, baseline=self.baseline), 0)
+
+        with patch("migrateit.reporters.output.write_line_b", lambda *_: None):
+            create_new_migration(self.changelog, self.migrations_dir, "update")
+        write_into_migration_file(
+            self.migrations_dir / "0002_update.sql", sql="UPDATE users SET id = 1;", rollback=None
+        )
+        self.assertEqual(cmd_lint(self.changelog, self.migrations_dir, baseline=self.baseline), 1)
@@ -0,0 +1,89 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from migrateit.cli import cmd_apply, cmd_init, cmd_new, cmd_plan, cmd_run
+from migrateit.clients.psql import PsqlClient
+from migrateit.hooks import HookManager, MigrateItHooks
+from migrateit.models.changelog import SupportedDatabase
+from migrateit.models.config import MigrateItConfig
+from migrateit.tree import load_changelog_file
+from tests.cmd._base_test import BaseCmdTest
+
+
+@patch("migrateit.reporters.output.write_line_b", lambda *_: None)
+class CliPlanTest(BaseCmdTest):
+    def setUp(self):
+        super().setUp()
+
+        with patch("migrateit.reporters.output.write_line_b", lambda *_: None):
+            cmd_init(
+                table_name=self.TEST_MIGRATIONS_TABLE,
+                migrations_dir=self.migrations_dir,
+                migrations_file=self.temp_dir / "changelog.json",
+                database=SupportedDatabase.POSTGRES,
+            )
+
+        self.changelog = load_changelog_file(self.temp_dir / "changelog.json")
+        self.config = MigrateItConfig(
+            table_name=self.TEST_MIGRATIONS_TABLE,
+            migrations_dir=self.migrations_dir,
+            changelog=self.changelog,
+        )
+        self.client = PsqlClient(connection=self.connection, config=self.config)
+        self.plan_file = self.temp_dir / "plan.json"
+
+        cmd_new(self.client, name="first", no_edit=True)
+        self._create_migrations_file("0001_first.sql", sql="SELECT 1;", rollback_sql="SELECT 1;")
+
+    def _applied(self) -> list[str]:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT migration_name FROM {self.TEST_MIGRATIONS_TABLE} ORDER BY id")
+            rows = [name for (name,) in cursor.fetchall()]
+        self.connection.rollback()
+        return rows
+
+    def test_cmd_plan_and_apply(self):
+        cmd_plan(self.client, self.plan_file)
+
+        plan = json.loads(self.plan_file.read_text())
+        self.assertEqual([m["name"] for m in plan["migrations"]], ["0000_migrateit.sql", "0001_first.sql"])
+        self.assertEqual([m["initial"] for m in plan["migrations"]], [True, False])
+        self.assertFalse(plan["is_rollback"])
+        self.assertEqual(self._applied(), [])
+
+        hooks = MagicMock(spec=MigrateItHooks, run_async=False)
+        cmd_apply(self.client, self.plan_file, hooks=HookManager([hooks]))
+        self.assertEqual(self._applied(), ["0000_migrateit.sql", "0001_first.sql"])
+        self.assertEqual(hooks.after_migration.call_count, 2)
+
+        # the plan was built for an empty migrations table
+        with self.assertRaises(ValueError) as ctx:
+            cmd_apply(self.client, self.plan_file)
+        self.assertIn("changed since the plan was built", str(ctx.exception))
+
+    def test_cmd_plan_rollback(self):
+        cmd_run(self.client)
+        cmd_plan(self.client, self.plan_file, name="0001", is_rollback=True)
+
+        cmd_apply(self.client, self.plan_file)
+        self.assertEqual(self._applied(), ["0000_migrateit.sql"])
+
+    def test_cmd_apply_changed_migration(self):
+        cmd_plan(self.client, self.plan_file)
+        self._create_migrations_file("0001_first.sql", sql="SELECT 2;")
+
+        with self.assertRaises(ValueError) as ctx:
+            cmd_apply(self.client, self.plan_file)
+        self.assertIn("0001_first.sql", str(ctx.exception))
+        self.assertEqual(self._applied(), [])
+
+    def test_cmd_apply_failure(self):
+        self._create_migrations_file("0001_first.sql", sql="SELECT * FROM missing_table;")
+        cmd_plan(self.client, self.plan_file)
+
+        hooks = MagicMock(spec=MigrateItHooks, run_async=False)
+        with self.assertRaises(Exception):
+            cmd_apply(self.client, self.plan_file, hooks=HookManager([hooks]))
+        _, migration, _ = hooks.on_failure.call_args.args
+        self.assertEqual(migration.name, "0001_first.sql")
+        self.assertEqual(self._applied(), [])
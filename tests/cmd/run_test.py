@@ -1,9 +1,12 @@
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 import psycopg2
 
 from migrateit.cli import cmd_init, cmd_new, cmd_run
 from migrateit.clients.psql import PsqlClient
+from migrateit.hooks import HookManager, MigrateItHooks
+from migrateit.metrics import reset_metrics
+from migrateit.models import MigrationPhase, TransactionMode
 from migrateit.models.changelog import SupportedDatabase
 from migrateit.models.config import MigrateItConfig
 from migrateit.tree import load_changelog_file
@@ -98,3 +101,127 @@ class CliRunTest(BaseCmdTest):
             cursor.execute(f"SELECT * FROM {self.TEST_MIGRATIONS_TABLE}")
             rows = cursor.fetchall()
             self.assertEqual(len(rows), 1)
+
+    def test_cmd_run_records_metrics(self):
+        cmd_new(self.client, name="new", no_edit=True)
+        self._create_migrations_file("0001_new.sql", sql="SELECT 1;")
+
+        metrics = reset_metrics("migrate")
+        cmd_run(client=self.client)
+
+        self.assertEqual(list(metrics.migration_durations), ["0000_migrateit.sql", "0001_new.sql"])
+        self.assertEqual(metrics.pending, 2)
+        self.assertIn("lock_wait", metrics.phases)
+        self.assertIn("planning", metrics.phases)
+
+    def test_cmd_run_hooks(self):
+        cmd_new(self.client, name="new", no_edit=True)
+        self._create_migrations_file(
+            "0001_new.sql", sql="CREATE TABLE test (id int); INSERT INTO test VALUES (1), (2);"
+        )
+        cmd_new(self.client, name="broken", no_edit=True)
+        self._create_migrations_file("0002_broken.sql", sql="SELECT * FROM missing_table;")
+
+        hooks = MagicMock(spec=MigrateItHooks, run_async=False)
+        with self.assertRaises(psycopg2.errors.UndefinedTable):
+            cmd_run(client=self.client, hooks=HookManager([hooks]))
+
+        hooks.after_plan.assert_called_once()
+        self.assertEqual(
+            [m.name for m in hooks.after_plan.call_args.args[1]],
+            ["0000_migrateit.sql", "0001_new.sql", "0002_broken.sql"],
+        )
+        result = hooks.after_migration.call_args_list[1].args[1]
+        self.assertEqual((result.migration.name, result.rows), ("0001_new.sql", 2))
+        self.assertEqual(hooks.before_migration.call_count, 3)
+        self.assertEqual(hooks.after_migration.call_count, 2)
+        _, migration, error = hooks.on_failure.call_args.args
+        self.assertEqual(migration.name, "0002_broken.sql")
+        self.assertIsInstance(error, psycopg2.errors.UndefinedTable)
+
+    def test_cmd_run_migration_transaction_mode(self):
+        cmd_new(self.client, name="first", no_edit=True)
+        self._create_migrations_file("0001_first.sql", sql="SELECT 1;")
+        cmd_new(self.client, name="broken", no_edit=True)
+        self._create_migrations_file("0002_broken.sql", sql="SELECT * FROM missing_table;")
+
+        with self.assertRaises(psycopg2.errors.UndefinedTable):
+            cmd_run(client=self.client, transaction_mode=TransactionMode.MIGRATION)
+
+        self.assertFalse(self.connection.autocommit)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT migration_name FROM {self.TEST_MIGRATIONS_TABLE} ORDER BY migration_name")
+            self.assertEqual([r[0] for r in cursor.fetchall()], ["0000_migrateit.sql", "0001_first.sql"])
+            # the session lock is released
+            cursor.execute("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' AND pid = pg_backend_pid()")
+            self.assertEqual(cursor.fetchone(), (0,))
+        self.connection.rollback()
+
+    def test_cmd_run_migration_transaction_mode_throttled(self):
+        cmd_new(self.client, name="first", no_edit=True)
+        self._create_migrations_file("0001_first.sql", sql="SELECT 1;")
+        cmd_new(self.client, name="second", no_edit=True)
+        self._create_migrations_file("0002_second.sql", sql="SELECT 2;")
+
+        with patch.object(self.client, "throttle_between_migrations") as throttle:
+            cmd_run(client=self.client, transaction_mode=TransactionMode.MIGRATION)
+        # paused after each migration committed but the last one
+        self.assertEqual(throttle.call_count, 2)
+
+    def test_cmd_run_statement_transaction_mode(self):
+        cmd_new(self.client, name="index", no_edit=True)
+        self._create_migrations_file(
+            "0001_index.sql",
+            sql="CREATE TABLE test (id int, name text);\nCREATE INDEX CONCURRENTLY test_name ON test (name);",
+            rollback_sql="DROP TABLE test;",
+        )
+
+        cmd_run(client=self.client, transaction_mode=TransactionMode.STATEMENT)
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'test'")
+            self.assertEqual(cursor.fetchall(), [("test_name",)])
+        self.connection.rollback()
+
+        cmd_run(client=self.client, name="0001", is_rollback=True)
+
+    def test_cmd_run_rewrite_ddl(self):
+        cmd_new(self.client, name="table", no_edit=True)
+        self._create_migrations_file(
+            "0001_table.sql", sql="CREATE TABLE test (id int, name text);", rollback_sql="DROP TABLE test;"
+        )
+        cmd_new(self.client, name="ddl", no_edit=True)
+        self._create_migrations_file(
+            "0002_ddl.sql",
+            sql="CREATE INDEX test_name ON test (name);\nALTER TABLE test ALTER COLUMN id SET NOT NULL;",
+            rollback_sql="DROP INDEX test_name;",
+        )
+        self.client.rewrite_ddl = True
+
+        with self.assertRaises(ValueError):
+            cmd_run(client=self.client)
+
+        cmd_run(client=self.client, transaction_mode=TransactionMode.STATEMENT)
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = 'test_name'::regclass")
+            self.assertEqual(cursor.fetchall(), [(True,)])
+            cursor.execute("SELECT attnotnull FROM pg_attribute WHERE attrelid = 'test'::regclass AND attname = 'id'")
+            self.assertEqual(cursor.fetchall(), [(True,)])
+            cursor.execute("SELECT count(*) FROM pg_constraint WHERE conrelid = 'test'::regclass")
+            self.assertEqual(cursor.fetchall(), [(0,)])
+        self.connection.rollback()
+
+        cmd_run(client=self.client, name="0001", is_rollback=True)
+
+    def test_cmd_run_phase(self):
+        cmd_new(self.client, name="add_column", no_edit=True)
+        self._create_migrations_file("0001_add_column.sql", sql="SELECT 1;")
+        cmd_new(self.client, name="drop_column", no_edit=True, phase=MigrationPhase.POST)
+        self._create_migrations_file("0002_drop_column.sql", sql="SELECT 2;")
+        self.assertEqual(load_changelog_file(self.changelog.path).migrations[-1].phase, MigrationPhase.POST)
+
+        cmd_run(client=self.client, phase=MigrationPhase.PRE)
+        self.assertTrue(self.client.is_migration_applied(self.changelog.migrations[1]))
+        self.assertFalse(self.client.is_migration_applied(self.changelog.migrations[2]))
+
+        cmd_run(client=self.client, phase=MigrationPhase.POST)
+        self.assertTrue(self.client.is_migration_applied(self.changelog.migrations[2]))
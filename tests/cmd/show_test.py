@@ -1,10 +1,13 @@
+import io
+import json
+from types import SimpleNamespace
 from unittest.mock import patch
 
-from migrateit.cli import cmd_init
+from migrateit.cli import cmd_init, cmd_new, cmd_run, cmd_show
 from migrateit.clients.psql import PsqlClient
 from migrateit.models.changelog import SupportedDatabase
 from migrateit.models.config import MigrateItConfig
-from migrateit.tree import load_changelog_file
+from migrateit.tree import load_changelog_file, write_into_migration_file
 from tests.cmd._base_test import BaseCmdTest
 
 
@@ -31,3 +34,41 @@ class CliShowTest(BaseCmdTest):
 
     def test_cmd_show(self):
         pass
+
+    def _show_output(self, **kwargs) -> bytes:
+        stdout = SimpleNamespace(buffer=io.BytesIO())
+        with patch("sys.stdout", stdout):
+            cmd_show(self.client, **kwargs)
+        return stdout.buffer.getvalue()
+
+    @patch("migrateit.reporters.output.write_line_b", lambda *_: None)
+    def test_cmd_show_json(self):
+        cmd_new(self.client, name="new", no_edit=True)
+        cmd_run(self.client, name="0000")
+
+        document = json.loads(self._show_output(output_format="json"))
+
+        self.assertEqual([m["name"] for m in document["migrations"]], ["0000_migrateit.sql", "0001_new.sql"])
+        self.assertEqual([m["status"] for m in document["migrations"]], ["applied", "not_applied"])
+        self.assertEqual(document["pending"], 1)
+        self.assertEqual(document["orphans"], [])
+        self.assertEqual(document["missing"], [])
+
+    @patch("migrateit.reporters.output.write_line_b", lambda *_: None)
+    def test_cmd_show_ndjson(self):
+        cmd_new(self.client, name="new", no_edit=True)
+
+        records = [json.loads(line) for line in self._show_output(output_format="ndjson").splitlines()]
+
+        self.assertEqual([r["name"] for r in records], ["0000_migrateit.sql", "0001_new.sql"])
+
+    @patch("migrateit.reporters.output.write_line_b", lambda *_: None)
+    def test_cmd_show_json_lint(self):
+        cmd_new(self.client, name="new", no_edit=True)
+        write_into_migration_file(self.migrations_dir / "0001_new.sql", sql="UPDATE users SET a = 1;", rollback=None)
+
+        document = json.loads(self._show_output(output_format="json", validate_sql=True))
+
+        self.assertEqual(
+            [(f["migration"], f["rule"]) for f in document["lint"]], [("0001_new.sql", "update-without-where")]
+        )
@@ -4,7 +4,7 @@ from migrateit.cli import cmd_init, cmd_new, cmd_run, cmd_squash
 from migrateit.clients.psql import PsqlClient
 from migrateit.models.changelog import SupportedDatabase
 from migrateit.models.config import MigrateItConfig
-from migrateit.tree import load_changelog_file
+from migrateit.tree import compress_migration_file, hash_migration, load_changelog_file
 from tests.cmd._base_test import BaseCmdTest
 
 
@@ -51,3 +51,22 @@ class CliSquashTest(BaseCmdTest):
             self.assertIn("0003_squashed_0001_0002.sql", applied)
             self.assertNotIn("0001_first", applied)
             self.assertNotIn("0002_second", applied)
+
+    def test_cmd_squash_preserves_compression(self):
+        cmd_new(self.client, name="first", no_edit=True)
+        self._create_migrations_file("0001_first.sql", sql="SELECT 1;", rollback_sql="SELECT 1;")
+        cmd_new(self.client, name="second", no_edit=True)
+        self._create_migrations_file("0002_second.sql", sql="SELECT 2;", rollback_sql="SELECT 2;")
+        compress_migration_file(self.migrations_dir / "0002_second.sql", ".gz")
+
+        cmd_run(client=self.client)
+        cmd_squash(client=self.client, start_migration="0001", end_migration="0002", name="squashed")
+
+        squashed = self.migrations_dir / "0003_squashed.sql"
+        self.assertFalse(squashed.exists())
+        self.assertTrue((self.migrations_dir / "0003_squashed.sql.gz").exists())
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT change_hash FROM {self.TEST_MIGRATIONS_TABLE} WHERE migration_name = %s", (squashed.name,)
+            )
+            self.assertEqual(cursor.fetchone(), (hash_migration(squashed),))
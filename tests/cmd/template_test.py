@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+import psycopg2
+
+from migrateit.cli import cmd_init, cmd_new, cmd_template
+from migrateit.clients.psql import PsqlClient
+from migrateit.models.changelog import SupportedDatabase
+from migrateit.models.config import MigrateItConfig
+from migrateit.template import database_url, drop_database, get_template_digest
+from migrateit.tree import compute_changelog_digest, load_changelog_file
+from tests.cmd._base_test import BaseCmdTest
+
+
+@patch("migrateit.reporters.output.write_line_b", lambda *_: None)
+class CliTemplateTest(BaseCmdTest):
+    TEST_TEMPLATE = "migrateit_test_template"
+    TEST_CLONE = "migrateit_test_clone"
+
+    def setUp(self):
+        super().setUp()
+
+        with patch("migrateit.reporters.output.write_line_b", lambda *_: None):
+            cmd_init(
+                table_name=self.TEST_MIGRATIONS_TABLE,
+                migrations_dir=self.migrations_dir,
+                migrations_file=self.temp_dir / "changelog.json",
+                database=SupportedDatabase.POSTGRES,
+            )
+
+        self.changelog = load_changelog_file(self.temp_dir / "changelog.json")
+        self.config = MigrateItConfig(
+            table_name=self.TEST_MIGRATIONS_TABLE,
+            migrations_dir=self.migrations_dir,
+            changelog=self.changelog,
+        )
+        self.client = PsqlClient(connection=self.connection, config=self.config)
+
+    def tearDown(self):
+        drop_database(self.client, self.TEST_CLONE)
+        drop_database(self.client, self.TEST_TEMPLATE)
+        super().tearDown()
+
+    def _count_rows(self, database: str, table: str) -> int:
+        with psycopg2.connect(database_url(database)) as conn, conn.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            result = cursor.fetchone()
+        conn.close()
+        return result[0] if result else 0
+
+    def test_cmd_template_builds_and_clones(self):
+        cmd_new(self.client, name="new", no_edit=True)
+        self._create_migrations_file("0001_new.sql", sql="CREATE TABLE test (id serial primary key);")
+
+        cmd_template(self.client, template_name=self.TEST_TEMPLATE, clone=self.TEST_CLONE)
+
+        self.assertEqual(
+            get_template_digest(self.client, self.TEST_TEMPLATE),
+            compute_changelog_digest(self.changelog, self.migrations_dir),
+        )
+        self.assertEqual(self._count_rows(self.TEST_CLONE, self.TEST_MIGRATIONS_TABLE), 2)
+        self.assertEqual(self._count_rows(self.TEST_CLONE, "test"), 0)
+
+    def test_cmd_template_skips_rebuild_when_digest_matches(self):
+        cmd_template(self.client, template_name=self.TEST_TEMPLATE)
+
+        with patch("migrateit.cli.build_template") as build_template:
+            cmd_template(self.client, template_name=self.TEST_TEMPLATE)
+            build_template.assert_not_called()
+
+    def test_cmd_template_rebuilds_when_changelog_changes(self):
+        cmd_template(self.client, template_name=self.TEST_TEMPLATE)
+        digest = get_template_digest(self.client, self.TEST_TEMPLATE)
+
+        cmd_new(self.client, name="new", no_edit=True)
+        self._create_migrations_file("0001_new.sql", sql="SELECT 1;")
+        cmd_template(self.client, template_name=self.TEST_TEMPLATE, clone=self.TEST_CLONE)
+
+        self.assertNotEqual(get_template_digest(self.client, self.TEST_TEMPLATE), digest)
+        self.assertEqual(self._count_rows(self.TEST_CLONE, self.TEST_MIGRATIONS_TABLE), 2)
+
+    def test_cmd_template_failed_build_is_dropped(self):
+        cmd_new(self.client, name="new", no_edit=True)
+        self._create_migrations_file("0001_new.sql", sql="SELECT * FROM missing_table;")
+
+        with self.assertRaises(psycopg2.errors.UndefinedTable):
+            cmd_template(self.client, template_name=self.TEST_TEMPLATE)
+        self.assertIsNone(get_template_digest(self.client, self.TEST_TEMPLATE))
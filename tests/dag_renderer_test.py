@@ -0,0 +1,77 @@
+import io
+import json
+import unittest
+
+from migrateit.models.graph import MigrationGraph
+from migrateit.models.migration import Migration, MigrationStatus
+from migrateit.reporters import print_json, render_dag
+
+
+class TestDagRenderer(unittest.TestCase):
+    def setUp(self):
+        self.migrations = [
+            Migration(name="0001_init.sql", initial=True, parents=[]),
+            Migration(name="0002_add_users.sql", parents=["0001_init.sql"]),
+            Migration(name="0003_add_orders.sql", parents=["0001_init.sql"]),
+            Migration(name="0004_add_queries.sql", parents=["0002_add_users.sql", "0003_add_orders.sql"]),
+        ]
+        self.graph = MigrationGraph(self.migrations, {"0001_init.sql": MigrationStatus.APPLIED})
+
+    def _names(self, lines: list[str]) -> list[str]:
+        return [line.split("|")[0].replace("└─", "").strip() for line in lines]
+
+    def test_render_dag(self):
+        lines = list(render_dag(self.graph))
+
+        self.assertEqual(
+            self._names(lines),
+            [
+                "0001_init.sql",
+                "0002_add_users.sql",
+                "0004_add_queries.sql",
+                "0003_add_orders.sql",
+                "0004_add_queries.sql",
+            ],
+        )
+        self.assertTrue(lines[2].startswith("    └─ 0004_add_queries.sql"))
+        self.assertIn("Applied", lines[0])
+        self.assertTrue(lines[-1].endswith("(*)"))
+
+    def test_render_dag_is_repeatable(self):
+        self.assertEqual(list(render_dag(self.graph)), list(render_dag(self.graph)))
+
+    def test_render_deep_linear_history(self):
+        migrations = [Migration(name="0000_init.sql", initial=True)]
+        for i in range(1, 10_000):
+            migrations.append(Migration(name=f"{i:05d}_m.sql", parents=[migrations[-1].name]))
+        graph = MigrationGraph(migrations)
+
+        self.assertEqual(len(list(render_dag(graph))), 10_000)
+
+        collapsed = list(render_dag(graph, collapse=10))
+        self.assertEqual(len(collapsed), 3)
+        self.assertIn("... 9998 migrations", collapsed[1])
+        self.assertIn("09999_m.sql", collapsed[2])
+
+    def test_print_json(self):
+        stream = io.BytesIO()
+        print_json(self.graph, {"0099_removed.sql": MigrationStatus.REMOVED}, extra={"orphans": []}, stream=stream)
+
+        document = json.loads(stream.getvalue())
+        self.assertEqual(len(document["migrations"]), 5)
+        self.assertEqual(document["migrations"][0]["status"], "applied")
+        self.assertEqual(document["migrations"][3]["parents"], ["0002_add_users.sql", "0003_add_orders.sql"])
+        self.assertEqual(
+            document["migrations"][4],
+            {"name": "0099_removed.sql", "status": "removed", "initial": False, "parents": [], "phase": None},
+        )
+        self.assertEqual(document["pending"], 3)
+        self.assertEqual(document["summary"]["removed"], 1)
+        self.assertEqual(document["orphans"], [])
+
+    def test_print_ndjson(self):
+        stream = io.BytesIO()
+        print_json(self.graph, {}, ndjson=True, stream=stream)
+
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([r["name"] for r in records], [m.name for m in self.migrations])
@@ -0,0 +1,73 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from migrateit.clients import SqlClient
+from migrateit.hooks import HookManager, MigrateItHooks, discover_hooks
+from migrateit.models import Migration
+
+CLIENT = MagicMock(spec=SqlClient)
+
+
+class RecordingHooks(MigrateItHooks):
+    def __init__(self):
+        self.calls = []
+
+    def before_migration(self, client, migration, is_rollback):
+        self.calls.append(("before_migration", migration.name, threading.current_thread().name))
+
+    def on_failure(self, client, migration, error):
+        raise RuntimeError("broken hook")
+
+
+class AsyncHooks(RecordingHooks):
+    run_async = True
+
+    def after_plan(self, client, plan, is_rollback):
+        raise RuntimeError("broken async hook")
+
+
+class TestHooks(unittest.TestCase):
+    def test_sync_hooks_run_inline(self):
+        hook = RecordingHooks()
+        manager = HookManager([hook])
+
+        manager.before_migration(CLIENT, Migration(name="0001_init.sql"), False)
+        manager.after_plan(CLIENT, [], False)  # not overridden
+
+        self.assertEqual(hook.calls, [("before_migration", "0001_init.sql", threading.current_thread().name)])
+
+    def test_async_hooks_run_in_order_on_a_worker(self):
+        hook = AsyncHooks()
+        manager = HookManager([hook])
+
+        with self.assertLogs("migrateit", level="ERROR") as logs:
+            manager.after_plan(CLIENT, [], False)
+            for name in ("0001_init.sql", "0002_users.sql"):
+                manager.before_migration(CLIENT, Migration(name=name), False)
+            manager.close()
+
+        self.assertEqual([c[1] for c in hook.calls], ["0001_init.sql", "0002_users.sql"])
+        self.assertTrue(all(c[2].startswith("migrateit-AsyncHooks") for c in hook.calls))
+        self.assertIn("broken async hook", logs.output[0])
+
+    def test_failure_hooks_never_raise(self):
+        manager = HookManager([RecordingHooks()])
+        with self.assertLogs("migrateit", level="ERROR"):
+            manager.on_failure(CLIENT, None, ValueError("migration failed"))
+
+    def test_discover_hooks(self):
+        class EntryPoint:
+            def __init__(self, name, value):
+                self.name, self.value = name, value
+
+            def load(self):
+                return self.value
+
+        instance = RecordingHooks()
+        entry_points = [EntryPoint("b", instance), EntryPoint("a", RecordingHooks)]
+        with patch("migrateit.hooks.entry_points", return_value=entry_points):
+            hooks = discover_hooks()
+
+        self.assertIsInstance(hooks[0], RecordingHooks)
+        self.assertIs(hooks[1], instance)
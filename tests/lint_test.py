@@ -0,0 +1,98 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from migrateit.lint import LINT_RULES, lint_migration, load_baseline, save_baseline
+from migrateit.tree import ROLLBACK_SPLIT_TAG
+
+
+class TestLint(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _lint(self, sql: str, rules: list[str] | None = None) -> list[tuple[str, int]]:
+        path = self.temp_dir / "0001_test.sql"
+        path.write_text(f"-- Migration 0001_test.sql\n{sql}\n{ROLLBACK_SPLIT_TAG}\nUPDATE users SET a = 1;\n")
+        return [(f.rule, f.line) for f in lint_migration(path, rules)]
+
+    def test_lint_create_index(self):
+        self.assertEqual(
+            self._lint("CREATE INDEX idx ON users (a);\nCREATE INDEX CONCURRENTLY idx2 ON users (b);"),
+            [("create-index-not-concurrently", 2)],
+        )
+
+    def test_lint_skips_new_tables(self):
+        sql = "CREATE TABLE users (id int);\nCREATE INDEX idx ON users (id);\nALTER TABLE users ALTER id TYPE bigint;"
+        self.assertEqual(self._lint(sql), [])
+
+    def test_lint_volatile_default(self):
+        sql = (
+            "ALTER TABLE users ADD COLUMN token uuid DEFAULT gen_random_uuid();\n"
+            "ALTER TABLE users ADD COLUMN created timestamptz DEFAULT now();\n"
+            "ALTER TABLE users ADD COLUMN n bigserial;"
+        )
+        self.assertEqual(self._lint(sql), [("add-column-volatile-default", 2), ("add-column-volatile-default", 4)])
+
+    def test_lint_set_not_null(self):
+        self.assertEqual(self._lint("ALTER TABLE users ALTER COLUMN a SET NOT NULL;"), [("set-not-null", 2)])
+
+        sql = (
+            "ALTER TABLE users ADD CONSTRAINT a_nn CHECK (a IS NOT NULL) NOT VALID;\n"
+            "ALTER TABLE users VALIDATE CONSTRAINT a_nn;\n"
+            "ALTER TABLE users ALTER COLUMN a SET NOT NULL;"
+        )
+        self.assertEqual(self._lint(sql), [])
+
+    def test_lint_foreign_key(self):
+        sql = (
+            "ALTER TABLE posts ADD CONSTRAINT fk FOREIGN KEY (user_id) REFERENCES users (id);\n"
+            "ALTER TABLE posts ADD FOREIGN KEY (user_id) REFERENCES users (id) NOT VALID;"
+        )
+        self.assertEqual(self._lint(sql), [("add-foreign-key-valid", 2)])
+
+    def test_lint_alter_column_type(self):
+        sql = "ALTER TABLE users\n  ALTER COLUMN a TYPE bigint;\n\\online_alter users ALTER COLUMN a TYPE bigint;"
+        self.assertEqual(self._lint(sql), [("alter-column-type", 2)])
+
+    def test_lint_update_without_where(self):
+        sql = "UPDATE users SET a = 1;\nUPDATE users SET a = 1 WHERE id < 100;\n-- UPDATE users SET b = 1;"
+        self.assertEqual(self._lint(sql), [("update-without-where", 2)])
+
+    def test_lint_ignore_comment(self):
+        sql = (
+            "-- migrateit-lint: ignore update-without-where\n"
+            "UPDATE users SET a = 1;\n"
+            "CREATE INDEX idx ON users (a); -- migrateit-lint: ignore create-index-not-concurrently, set-not-null"
+        )
+        self.assertEqual(self._lint(sql), [])
+
+    def test_lint_copy_data(self):
+        sql = "COPY users (a) FROM stdin;\nUPDATE users SET a = 1;\n\\.\nUPDATE users SET a = 2;"
+        self.assertEqual(self._lint(sql), [("update-without-where", 5)])
+
+    def test_lint_selected_rules(self):
+        sql = "UPDATE users SET a = 1;\nCREATE INDEX idx ON users (a);"
+        self.assertEqual(
+            self._lint(sql, rules=["create-index-not-concurrently"]), [("create-index-not-concurrently", 3)]
+        )
+        self.assertEqual(len(LINT_RULES), 6)
+
+    def test_lint_baseline(self):
+        path = self.temp_dir / "0001_test.sql"
+        path.write_text(f"UPDATE users SET a = 1;\n{ROLLBACK_SPLIT_TAG}\n")
+        findings = lint_migration(path)
+        baseline = self.temp_dir / "baseline.json"
+
+        self.assertEqual(load_baseline(baseline), set())
+        save_baseline(baseline, findings)
+        self.assertEqual(load_baseline(baseline), {findings[0].fingerprint})
+
+        # moving the statement around keeps the fingerprint
+        path.write_text(f"\n\nUPDATE users\n  SET a = 1;\n{ROLLBACK_SPLIT_TAG}\n")
+        moved = lint_migration(path)
+        self.assertEqual(moved[0].line, 3)
+        self.assertEqual(moved[0].fingerprint, findings[0].fingerprint)
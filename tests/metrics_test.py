@@ -0,0 +1,49 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from migrateit.metrics import RunMetrics, metrics_textfile, record_migration, record_statuses, render_openmetrics
+from migrateit.models import MigrationStatus
+
+
+class TestMetrics(unittest.TestCase):
+    def test_render_openmetrics(self):
+        metrics = RunMetrics(command="migrate", started_at=1700000000, success=True)
+        metrics.statuses = {MigrationStatus.APPLIED: 3, MigrationStatus.NOT_APPLIED: 2}
+        metrics.migration_durations = {"0001_init.sql": 0.02, "0002_users.sql": 7.5}
+        metrics.phases = {"lock_wait": 0.5}
+
+        text = render_openmetrics(metrics)
+
+        self.assertIn('migrateit_last_run_success{command="migrate"} 1', text)
+        self.assertIn('migrateit_migrations{status="applied"} 3', text)
+        self.assertIn("migrateit_migrations_pending 2", text)
+        self.assertIn('migrateit_lock_wait_seconds{command="migrate"} 0.5', text)
+        self.assertNotIn("migrateit_planning_seconds", text)
+        self.assertIn('migrateit_migration_apply_duration_seconds_bucket{le="0.05"} 1', text)
+        self.assertIn('migrateit_migration_apply_duration_seconds_bucket{le="10"} 2', text)
+        self.assertIn('migrateit_migration_apply_duration_seconds_bucket{le="+Inf"} 2', text)
+        self.assertIn("migrateit_migration_apply_duration_seconds_count 2", text)
+        self.assertIn('migrateit_migration_last_apply_duration_seconds{migration="0002_users.sql"} 7.5', text)
+        self.assertTrue(text.endswith("# EOF\n"))
+
+    def test_metrics_textfile(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "migrateit.prom"
+
+            with metrics_textfile(path, "migrate") as metrics:
+                record_statuses({"0001_init.sql": MigrationStatus.NOT_APPLIED})
+                record_migration("0001_init.sql", 0.1)
+                metrics.success = True
+            text = path.read_text()
+            self.assertIn('migrateit_last_run_success{command="migrate"} 1', text)
+            self.assertIn("migrateit_migrations_pending 1", text)
+
+            with self.assertRaises(RuntimeError), metrics_textfile(path, "show"):
+                raise RuntimeError()
+            self.assertIn('migrateit_last_run_success{command="show"} 0', path.read_text())
+
+            # a non-zero exit code (i.e. check behind, lint findings) is not a success either
+            with metrics_textfile(path, "check"):
+                pass
+            self.assertIn('migrateit_last_run_success{command="check"} 0', path.read_text())
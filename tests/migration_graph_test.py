@@ -0,0 +1,68 @@
+import unittest
+
+from migrateit.models.changelog import ChangelogFile
+from migrateit.models.graph import MigrationGraph
+from migrateit.models.migration import Migration, MigrationStatus
+from migrateit.tree import build_migrations_tree, find_path
+
+
+class TestMigrationGraph(unittest.TestCase):
+    def setUp(self):
+        self.migrations = [
+            Migration(name="0001_init.sql", initial=True, parents=[]),
+            Migration(name="0002_add_users.sql", parents=["0001_init.sql"]),
+            Migration(name="0003_add_orders.sql", parents=["0001_init.sql"]),
+            Migration(name="0004_add_queries.sql", parents=["0002_add_users.sql", "0003_add_orders.sql"]),
+            Migration(name="0005_add_rows.sql", parents=["0004_add_queries.sql"]),
+        ]
+        self.changelog = ChangelogFile(version=1, migrations=self.migrations)
+
+    def test_adjacency(self):
+        graph = MigrationGraph(self.migrations)
+
+        self.assertEqual(len(graph), 5)
+        self.assertEqual(list(graph), [m.name for m in self.migrations])
+        self.assertEqual(list(graph.children(0)), [1, 2])
+        self.assertEqual(list(graph.children(1)), [3])
+        self.assertEqual(list(graph.children(4)), [])
+        self.assertEqual(list(graph.parents(0)), [])
+        self.assertEqual(list(graph.parents(3)), [1, 2])
+        self.assertEqual(graph.name_of(graph.id_of("0004_add_queries.sql")), "0004_add_queries.sql")
+        self.assertIn("0005_add_rows.sql", graph)
+        self.assertNotIn("0006_missing.sql", graph)
+
+    def test_statuses(self):
+        graph = build_migrations_tree(
+            self.changelog,
+            {
+                "0001_init.sql": MigrationStatus.APPLIED,
+                "0002_add_users.sql": MigrationStatus.CONFLICT,
+                "0099_removed.sql": MigrationStatus.REMOVED,
+            },
+        )
+
+        self.assertEqual(graph.status(0), MigrationStatus.APPLIED)
+        self.assertEqual(graph.status(1), MigrationStatus.CONFLICT)
+        self.assertEqual(graph.status(2), MigrationStatus.NOT_APPLIED)
+
+    def test_names_are_interned(self):
+        parent = Migration(name="_".join(["0001", "init.sql"]), initial=True)
+        child = Migration(name="0002_child.sql", parents=["_".join(["0001", "init.sql"])])
+        self.assertIs(child.parents[0], parent.name)
+
+    def test_find_path(self):
+        graph = build_migrations_tree(self.changelog)
+
+        self.assertEqual(
+            find_path(graph, "0002_add_users.sql", "0005_add_rows.sql"),
+            ["0002_add_users.sql", "0004_add_queries.sql", "0005_add_rows.sql"],
+        )
+        self.assertEqual(find_path(graph, "0002_add_users.sql", "0003_add_orders.sql"), [])
+
+    def test_find_path_deep_history(self):
+        migrations = [Migration(name="0000_init.sql", initial=True)]
+        for i in range(1, 5000):
+            migrations.append(Migration(name=f"{i:04d}_m.sql", parents=[migrations[-1].name]))
+        graph = MigrationGraph(migrations)
+
+        self.assertEqual(len(find_path(graph, "0000_init.sql", "4999_m.sql")), 5000)
@@ -1,12 +1,11 @@
 import shutil
 import tempfile
 import unittest
-from collections import OrderedDict
 from pathlib import Path
 
 from migrateit.models.changelog import ChangelogFile
-from migrateit.models.migration import Migration, MigrationStatus
-from migrateit.tree import build_migration_plan
+from migrateit.models.migration import Migration, MigrationPhase, MigrationStatus
+from migrateit.tree import build_migration_plan, build_migrations_tree
 
 
 class TestMigrationPlanBuilder(unittest.TestCase):
@@ -21,15 +20,7 @@ class TestMigrationPlanBuilder(unittest.TestCase):
         self.migrations = [self.m1, self.m2, self.m3, self.m4, self.m5]
         self.changelog = ChangelogFile(version=1, migrations=self.migrations, path=self.temp_dir / "changelog.json")
 
-        self.migration_tree = OrderedDict(
-            {
-                "0001_init.sql": [self.m2, self.m3],
-                "0002_add_users.sql": [self.m4],
-                "0003_add_orders.sql": [self.m4],
-                "0004_add_queries.sql": [self.m5],
-                "0005_add_rows.sql": [],
-            }
-        )
+        self.migration_tree = build_migrations_tree(self.changelog)
 
     def tearDown(self) -> None:
         shutil.rmtree(self.temp_dir)
@@ -134,3 +125,36 @@ class TestMigrationPlanBuilder(unittest.TestCase):
                 target_migration=None,
                 is_rollback=True,
             )
+
+    def test_plan_by_phase(self):
+        self.m5.phase = MigrationPhase.POST
+        statuses = {m.name: MigrationStatus.NOT_APPLIED for m in self.migrations}
+        statuses["0001_init.sql"] = MigrationStatus.APPLIED
+
+        pre = build_migration_plan(self.changelog, self.migration_tree, statuses, phase=MigrationPhase.PRE)
+        self.assertEqual([m.name for m in pre], ["0002_add_users.sql", "0003_add_orders.sql", "0004_add_queries.sql"])
+        # the post-deploy migration waits for its pre-deploy parents
+        with self.assertRaises(ValueError):
+            build_migration_plan(self.changelog, self.migration_tree, statuses, phase=MigrationPhase.POST)
+
+        statuses.update((m.name, MigrationStatus.APPLIED) for m in pre)
+        post = build_migration_plan(self.changelog, self.migration_tree, statuses, phase=MigrationPhase.POST)
+        self.assertEqual([m.name for m in post], ["0005_add_rows.sql"])
+
+    def test_plan_by_phase_blocked_by_other_phase(self):
+        self.m3.phase = MigrationPhase.POST
+        statuses = {m.name: MigrationStatus.NOT_APPLIED for m in self.migrations}
+        statuses["0001_init.sql"] = MigrationStatus.APPLIED
+
+        with self.assertRaisesRegex(ValueError, "0004_add_queries.sql depends on 0003_add_orders.sql"):
+            build_migration_plan(self.changelog, self.migration_tree, statuses, phase=MigrationPhase.PRE)
+        target = build_migration_plan(
+            self.changelog, self.migration_tree, statuses, target_migration=self.m2, phase=MigrationPhase.PRE
+        )
+        self.assertEqual([m.name for m in target], ["0002_add_users.sql"])
+
+    def test_migration_phase_serialization(self):
+        self.m5.phase = MigrationPhase.POST
+        self.assertNotIn("phase", self.m4.to_dict())
+        self.assertEqual(self.m5.to_dict()["phase"], "post")
+        self.assertEqual(Migration(**self.m5.to_dict()), self.m5)
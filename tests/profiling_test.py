@@ -0,0 +1,41 @@
+import json
+import tempfile
+import unittest
+from io import BytesIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from migrateit.metrics import reset_metrics, timed
+from migrateit.profiling import profile, render_profile
+
+
+class TestProfiling(unittest.TestCase):
+    def test_render_profile(self):
+        metrics = reset_metrics("migrate")
+        with timed("total"):
+            with timed("status_query"):
+                pass
+            for _ in range(3):
+                with timed("sql_exec"):
+                    pass
+
+        lines = list(render_profile(metrics))
+        self.assertEqual([line.split("|")[0].strip() for line in lines[2:]], ["total", "status_query", "sql_exec"])
+        self.assertEqual(lines[4].split("|")[1].strip(), "3")
+
+    def test_profile_outputs(self):
+        reset_metrics("show")
+        stderr = SimpleNamespace(buffer=BytesIO())
+        with tempfile.TemporaryDirectory() as temp_dir:
+            stats_file, trace_file = Path(temp_dir) / "run.prof", Path(temp_dir) / "run.json"
+
+            with patch("sys.stderr", stderr), profile(stats_file=stats_file, trace_file=trace_file):
+                with timed("planning"):
+                    pass
+
+            self.assertTrue(stats_file.exists())
+            events = json.loads(trace_file.read_text())["traceEvents"]
+            self.assertEqual([e["name"] for e in events], ["total", "planning"])
+            self.assertTrue(all(e["ph"] == "X" for e in events))
+        self.assertIn(b"planning", stderr.buffer.getvalue())
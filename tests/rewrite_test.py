@@ -0,0 +1,84 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from migrateit.rewrite import rewrite_migration_file, rewrite_sql
+from migrateit.tree import ROLLBACK_SPLIT_TAG
+
+
+class TestRewrite(unittest.TestCase):
+    def test_rewrite_create_index(self):
+        sql, rewrites = rewrite_sql(
+            "CREATE UNIQUE INDEX users_email ON users (lower(email)) WHERE name <> 'a  b';\n"
+            "CREATE INDEX ON users (a);\n"
+            "CREATE INDEX CONCURRENTLY idx ON users (b);\n"
+            "CREATE INDEX idx ON ONLY events (c);"
+        )
+        self.assertEqual(
+            sql,
+            "CREATE UNIQUE INDEX CONCURRENTLY users_email ON users (lower(email)) WHERE name <> 'a  b';\n"
+            "CREATE INDEX CONCURRENTLY ON users (a);\n"
+            "CREATE INDEX CONCURRENTLY idx ON users (b);\n"
+            "CREATE INDEX idx ON ONLY events (c);",
+        )
+        self.assertEqual(
+            [(r.rule, r.line) for r in rewrites],
+            [("create-index-not-concurrently", 1), ("create-index-not-concurrently", 2)],
+        )
+
+    def test_rewrite_create_index_in_transaction(self):
+        code = "BEGIN;\nCREATE INDEX users_a ON users (a);\nCOMMIT;"
+        sql, rewrites = rewrite_sql(code)
+        self.assertEqual(sql, code)
+        self.assertEqual(rewrites, [])
+
+    def test_rewrite_foreign_key(self):
+        sql, _ = rewrite_sql(
+            "ALTER TABLE posts ADD CONSTRAINT posts_user_fk FOREIGN KEY (user_id) REFERENCES users (id) "
+            "ON DELETE CASCADE;"
+        )
+        self.assertEqual(
+            sql,
+            "ALTER TABLE posts ADD CONSTRAINT posts_user_fk FOREIGN KEY (user_id) REFERENCES users (id) "
+            "ON DELETE CASCADE NOT VALID;\n"
+            "ALTER TABLE posts VALIDATE CONSTRAINT posts_user_fk;",
+        )
+
+    def test_rewrite_set_not_null(self):
+        sql, _ = rewrite_sql('ALTER TABLE public."Users" ALTER "Email" SET NOT NULL;')
+        self.assertEqual(
+            sql,
+            'ALTER TABLE public."Users" ADD CONSTRAINT "Users_Email_not_null" CHECK ("Email" IS NOT NULL) NOT VALID;\n'
+            'ALTER TABLE public."Users" VALIDATE CONSTRAINT "Users_Email_not_null";\n'
+            'ALTER TABLE public."Users" ALTER COLUMN "Email" SET NOT NULL;\n'
+            'ALTER TABLE public."Users" DROP CONSTRAINT "Users_Email_not_null";',
+        )
+
+    def test_rewrite_skips(self):
+        sql = (
+            "CREATE TABLE users (id int, name text);\n"
+            "CREATE INDEX users_name ON users (name);\n"
+            "ALTER TABLE posts ALTER id SET NOT NULL, ALTER name SET NOT NULL;\n"
+            "ALTER TABLE posts ADD CONSTRAINT fk FOREIGN KEY (a) REFERENCES users (id) NOT VALID;\n"
+            "CREATE INDEX posts_a ON posts /* keep me */ (a);\n"
+            "-- migrateit-lint: ignore create-index-not-concurrently\n"
+            "CREATE INDEX posts_b ON posts (b);"
+        )
+        self.assertEqual(rewrite_sql(sql), (sql, []))
+
+    def test_rewrite_migration_file(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, temp_dir)
+        path = temp_dir / "0001_test.sql"
+        path.write_text(f"-- Migration\nCREATE INDEX idx ON users (a);\n{ROLLBACK_SPLIT_TAG}\nDROP INDEX idx;\n")
+
+        self.assertEqual(len(rewrite_migration_file(path, dry_run=True)), 1)
+        self.assertIn("CREATE INDEX idx", path.read_text())
+
+        rewrites = rewrite_migration_file(path)
+        self.assertEqual(rewrites[0].line, 2)
+        self.assertEqual(
+            path.read_text(),
+            f"-- Migration\nCREATE INDEX CONCURRENTLY idx ON users (a);\n{ROLLBACK_SPLIT_TAG}\nDROP INDEX idx;\n",
+        )
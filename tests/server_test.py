@@ -0,0 +1,102 @@
+import json
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+
+from migrateit.server import StatusCache, create_server
+from tests.clients.sqlite._base_test import BaseSqliteTest
+
+
+@patch("migrateit.reporters.output.write_line_b", lambda *_: None)
+class TestServer(BaseSqliteTest):
+    def setUp(self):
+        super().setUp()
+        self.client.apply_migration(self.changelog.migrations[0])
+        self.connection.commit()
+        self._add_migration("0001_users.sql", sql="CREATE TABLE users (id INTEGER);", rollback_sql="DROP TABLE users;")
+        self._save_changelog()
+
+        self.cache = StatusCache(self.client)
+        self.server = create_server(self.cache)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.addCleanup(self.thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def _save_changelog(self):
+        self.changelog.path.write_text(self.changelog.serialize())
+
+    def _get(self, path: str) -> tuple[int, dict]:
+        url = f"http://127.0.0.1:{self.server.socket.getsockname()[1]}{path}"
+        try:
+            with urllib.request.urlopen(url) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_serve_documents(self):
+        self.assertTrue(self.cache.refresh())
+
+        code, status = self._get("/status")
+        self.assertEqual(code, 200)
+        self.assertEqual(status["pending"], 1)
+        self.assertEqual(self._get("/pending"), (200, {"pending": 1, "migrations": ["0001_users.sql"]}))
+        self.assertEqual(self._get("/plan"), (200, {"migrations": ["0001_users.sql"]}))
+        self.assertEqual(self._get("/unknown")[0], 404)
+
+    def test_refresh_only_on_changes(self):
+        self.assertTrue(self.cache.refresh())
+        self.assertFalse(self.cache.refresh())
+
+        # the database marker changes
+        self.client.apply_migration(self.changelog.migrations[1])
+        self.connection.commit()
+        self.assertTrue(self.cache.refresh())
+        self.assertEqual(self._get("/pending"), (200, {"pending": 0, "migrations": []}))
+
+        # the changelog changes
+        self._add_migration("0002_posts.sql", sql="CREATE TABLE posts (id INTEGER);", rollback_sql="DROP TABLE posts;")
+        self._save_changelog()
+        self.assertTrue(self.cache.refresh())
+        self.assertEqual(self._get("/plan"), (200, {"migrations": ["0002_posts.sql"]}))
+
+    def test_refresh_on_hash_update(self):
+        self.assertTrue(self.cache.refresh())
+        self.client.update_migration_hash(self.changelog.migrations[0])
+        self.connection.commit()
+        self.assertTrue(self.cache.refresh())
+
+    def test_refresh_error(self):
+        self.changelog.path.write_text("{")
+        with patch.object(self.cache, "_reconnect") as reconnect:
+            self.assertFalse(self.cache.refresh())
+        reconnect.assert_not_called()
+        code, body = self._get("/status")
+        self.assertEqual(code, 503)
+        self.assertIsNone(body["last_refresh_age"])
+
+    def test_refresh_error_after_refresh(self):
+        self.assertTrue(self.cache.refresh())
+        self.changelog.path.write_text("{")
+        self.assertFalse(self.cache.refresh())
+
+        # the previous documents are stale, the error is reported instead
+        code, body = self._get("/pending")
+        self.assertEqual(code, 503)
+        self.assertIn("error", body)
+        self.assertGreaterEqual(body["last_refresh_age"], 0)
+
+        self._save_changelog()
+        self.assertTrue(self.cache.refresh())
+        self.assertEqual(self._get("/pending")[0], 200)
+
+    def test_refresh_database_error_reconnects(self):
+        with (
+            patch.object(self.client, "retrieve_status_marker", side_effect=sqlite3.OperationalError("closed")),
+            patch.object(self.cache, "_reconnect") as reconnect,
+        ):
+            self.assertFalse(self.cache.refresh())
+        reconnect.assert_called_once()
@@ -1,17 +1,37 @@
+import hashlib
 import os
 import shutil
+import sys
 import tempfile
 import unittest
 from pathlib import Path
 from unittest.mock import patch
 
-from migrateit.models import ChangelogFile, SupportedDatabase
+from migrateit.models import ChangelogFile, CopyBlock, OnlineAlter, SupportedDatabase
 from migrateit.tree import (
+    EMPTY_NAMES_DIGEST,
+    ROLLBACK_SPLIT_TAG,
+    atomic_write,
+    build_merkle_tree,
+    compress_migration_file,
+    compute_names_digest,
     create_changelog_file,
     create_migration_directory,
     create_new_migration,
+    find_changelog_file,
+    hash_migration,
+    hash_migration_file,
     load_changelog_file,
+    merkle_bucket,
+    open_copy_block,
+    read_migration_segments,
+    retrieve_migration_sqls,
     save_changelog_file,
+    scan_migrations_directory,
+    split_migration_file,
+    split_sql_statements,
+    toggle_merkle_nodes,
+    write_migration_file,
 )
 
 
@@ -119,3 +139,249 @@ class TestTreeUtils(unittest.TestCase):
 
         with self.assertRaises(ValueError):
             create_new_migration(changelog, self.migrations_dir, "")
+
+    def test_create_jsonl_changelog_and_append_migrations(self):
+        os.makedirs(self.migrations_dir)
+        jsonl_path = self.temp_dir / "changelog.jsonl"
+        changelog = create_changelog_file(jsonl_path, SupportedDatabase.POSTGRES)
+
+        create_new_migration(changelog, self.migrations_dir, "init")
+        create_new_migration(changelog, self.migrations_dir, "add_users")
+
+        lines = jsonl_path.read_text().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('"version": 1', lines[0])
+        self.assertIn("0001_add_users.sql", lines[2])
+
+        loaded = load_changelog_file(jsonl_path)
+        self.assertEqual([m.name for m in loaded.migrations], ["0000_init.sql", "0001_add_users.sql"])
+        self.assertEqual(loaded.migrations[1].parents, ["0000_init.sql"])
+
+    def test_save_jsonl_changelog_rewrites_atomically(self):
+        os.makedirs(self.migrations_dir)
+        jsonl_path = self.temp_dir / "changelog.jsonl"
+        changelog = create_changelog_file(jsonl_path, SupportedDatabase.POSTGRES)
+        create_new_migration(changelog, self.migrations_dir, "init")
+        create_new_migration(changelog, self.migrations_dir, "add_users")
+
+        changelog.migrations = changelog.migrations[:1]
+        save_changelog_file(changelog)
+
+        self.assertEqual(len(load_changelog_file(jsonl_path).migrations), 1)
+        self.assertFalse([f for f in os.listdir(self.temp_dir) if f.endswith(".tmp")])
+
+    def test_atomic_write_permissions(self):
+        path = self.temp_dir / "file.txt"
+        previous = os.umask(0o027)
+        try:
+            atomic_write(path, "a")
+        finally:
+            os.umask(previous)
+        self.assertEqual(path.stat().st_mode & 0o777, 0o640)
+
+        # existing files keep their permissions
+        path.chmod(0o600)
+        atomic_write(path, b"b")
+        self.assertEqual(path.stat().st_mode & 0o777, 0o600)
+        self.assertEqual(path.read_text(), "b")
+
+    def test_load_invalid_jsonl_changelog(self):
+        jsonl_path = self.temp_dir / "changelog.jsonl"
+        jsonl_path.write_text("")
+        with self.assertRaises(ValueError):
+            load_changelog_file(jsonl_path)
+
+    def test_find_changelog_file(self):
+        self.assertEqual(find_changelog_file(self.temp_dir), self.temp_dir / "changelog.json")
+        (self.temp_dir / "changelog.jsonl").touch()
+        self.assertEqual(find_changelog_file(self.temp_dir), self.temp_dir / "changelog.jsonl")
+
+    def test_scan_migrations_directory(self):
+        os.makedirs(self.migrations_dir)
+        changelog = create_changelog_file(self.migrations_file_path, SupportedDatabase.POSTGRES)
+        create_new_migration(changelog, self.migrations_dir, "init")
+        create_new_migration(changelog, self.migrations_dir, "add_users")
+        (self.migrations_dir / "0001_add_users.sql").unlink()
+        (self.migrations_dir / "0002_orphan.sql").write_text("SELECT 1;")
+        (self.migrations_dir / "notes.txt").write_text("not a migration")
+        os.makedirs(self.migrations_dir / "0003_directory.sql")
+
+        index = scan_migrations_directory(self.migrations_dir, changelog)
+
+        self.assertEqual(sorted(index.files), ["0000_init.sql", "0002_orphan.sql"])
+        self.assertEqual(index.orphans, ["0002_orphan.sql"])
+        self.assertEqual(index.missing, ["0001_add_users.sql"])
+
+    def test_migrations_index_stat_new_files(self):
+        os.makedirs(self.migrations_dir)
+        changelog = create_changelog_file(self.migrations_file_path, SupportedDatabase.POSTGRES)
+        index = scan_migrations_directory(self.migrations_dir, changelog)
+
+        self.assertIsNone(index.stat("0000_init.sql"))
+        create_new_migration(changelog, self.migrations_dir, "init")
+        self.assertIsNotNone(index.stat("0000_init.sql"))
+        self.assertIn("0000_init.sql", index.files)
+
+    def test_hash_migration_file_matches_text_hash(self):
+        path = self.temp_dir / "0001_hash.sql"
+        contents = [
+            b"",
+            b"CREATE TABLE a (id INT);\n-- Rollback migration\nDROP TABLE a;\n",
+            b"SELECT 1;\r\nSELECT 2;\rSELECT 3;\r\n\r\r\n",
+            "INSERT INTO t VALUES ('\u00f1and\u00fa');\r\n".encode("utf-8") * 50,
+        ]
+        for chunk_size in (1, 2, 3, 7, 1024):
+            for content in contents:
+                path.write_bytes(content)
+                with self.subTest(chunk_size=chunk_size, content=content[:20]):
+                    with patch("migrateit.tree.HASH_CHUNK_SIZE", chunk_size):
+                        expected = hashlib.sha256(path.read_text().encode("utf-8")).hexdigest()
+                        self.assertEqual(hash_migration_file(path), expected)
+
+    def test_split_migration_file(self):
+        path = self.temp_dir / "0001_split.sql"
+        path.write_bytes(f"CREATE TABLE a (id INT);\r\n{ROLLBACK_SPLIT_TAG}\r\nDROP TABLE a;".encode())
+
+        sql, rollback = split_migration_file(path)
+        self.assertEqual(sql, "CREATE TABLE a (id INT);\n")
+        self.assertEqual(rollback, "\nDROP TABLE a;")
+
+    def test_split_migration_file_without_rollback(self):
+        path = self.temp_dir / "0001_split.sql"
+        for content in ("", "SELECT 1;"):
+            path.write_text(content)
+            with self.assertRaises(ValueError):
+                split_migration_file(path)
+
+    def test_read_migration_segments(self):
+        path = self.temp_dir / "0001_copy.sql"
+        path.write_text(
+            "CREATE TABLE a (id INT, name TEXT);\n"
+            "COPY a (id, name) FROM stdin;\n1\tfirst\n\\.\n"
+            "\\copy a (id, name) FROM 'a.csv' WITH (FORMAT csv)\n"
+            "SELECT 1;\n"
+            f"{ROLLBACK_SPLIT_TAG}\nDROP TABLE a;\n"
+        )
+
+        sql, inline, data_file, tail = read_migration_segments(path)
+        assert isinstance(sql, str) and isinstance(tail, str)
+        assert isinstance(inline, CopyBlock) and isinstance(data_file, CopyBlock)
+        self.assertEqual(sql.strip(), "CREATE TABLE a (id INT, name TEXT);")
+        self.assertEqual(inline.statement, "COPY a (id, name) FROM stdin;")
+        self.assertEqual(path.read_bytes()[inline.start : inline.end], b"1\tfirst\n")
+        self.assertEqual(data_file.statement, "COPY a (id, name) FROM STDIN WITH (FORMAT csv)")
+        self.assertEqual(data_file.path, self.temp_dir / "a.csv")
+        self.assertEqual(tail.strip(), "SELECT 1;")
+        self.assertEqual(read_migration_segments(path, is_rollback=True), ["\nDROP TABLE a;\n"])
+
+    def test_hash_migration_without_data_files(self):
+        path = self.temp_dir / "0001_plain.sql"
+        path.write_text(f"SELECT 1;\n{ROLLBACK_SPLIT_TAG}\n")
+        self.assertEqual(hash_migration(path), hash_migration_file(path))
+
+    def test_compressed_migration_file(self):
+        os.makedirs(self.migrations_dir)
+        changelog = create_changelog_file(self.migrations_file_path, SupportedDatabase.POSTGRES)
+        create_new_migration(changelog, self.migrations_dir, "init")
+        path = self.migrations_dir / "0000_init.sql"
+        path.write_bytes(
+            b"CREATE TABLE a (id INT);\r\nCOPY a (id) FROM stdin;\n1\n2\n\\.\n"
+            + f"{ROLLBACK_SPLIT_TAG}\nDROP TABLE a;\n".encode()
+        )
+        plain_hash = hash_migration(path)
+
+        compressed = compress_migration_file(path, ".gz")
+        self.assertEqual(compressed.name, "0000_init.sql.gz")
+        self.assertFalse(path.exists())
+
+        # the migration keeps its name and hash
+        index = scan_migrations_directory(self.migrations_dir, changelog)
+        self.assertEqual(list(index.files), ["0000_init.sql"])
+        self.assertEqual(index.path("0000_init.sql"), compressed)
+        self.assertEqual(index.missing, [])
+        with patch("migrateit.tree.HASH_CHUNK_SIZE", 3):
+            self.assertEqual(hash_migration(path), plain_hash)
+
+        sql, copy = read_migration_segments(path)
+        self.assertEqual(sql, "CREATE TABLE a (id INT);\n")
+        assert isinstance(copy, CopyBlock)
+        self.assertEqual(copy.path, compressed)
+        with open_copy_block(copy) as data:
+            self.assertEqual(data.read(), b"1\n2\n")
+        self.assertEqual(retrieve_migration_sqls(path)[1], "DROP TABLE a;")
+
+        write_migration_file(path, f"SELECT 1;\n{ROLLBACK_SPLIT_TAG}\n")
+        self.assertFalse(path.exists())
+        self.assertEqual(split_migration_file(path), ("SELECT 1;\n", "\n"))
+
+    def test_compressed_migration_file_zstd_missing(self):
+        path = self.temp_dir / "0001_zstd.sql"
+        path.write_text(f"SELECT 1;\n{ROLLBACK_SPLIT_TAG}\n")
+
+        with patch.dict(sys.modules, {"compression": None, "zstandard": None}):
+            with self.assertRaises(ValueError):
+                compress_migration_file(path, ".zst")
+        with self.assertRaises(ValueError):
+            compress_migration_file(path, ".bz2")
+
+    def test_split_sql_statements(self):
+        sql = (
+            "-- leading comment; not a statement\n"
+            "CREATE TABLE a (v text DEFAULT ';');\n"
+            "/* x; */ INSERT INTO a VALUES (E'\\';'), ('it''s;');\n"
+            "CREATE FUNCTION f() RETURNS int AS $body$ SELECT 1; $body$ LANGUAGE sql;\n"
+            "DO $$ BEGIN PERFORM 1; END $$;\n"
+            "-- trailing comment;\n"
+            'SELECT "a;b" FROM a\n'
+        )
+        self.assertEqual(
+            split_sql_statements(sql),
+            [
+                (2, "CREATE TABLE a (v text DEFAULT ';');"),
+                (3, "INSERT INTO a VALUES (E'\\';'), ('it''s;');"),
+                (4, "CREATE FUNCTION f() RETURNS int AS $body$ SELECT 1; $body$ LANGUAGE sql;"),
+                (5, "DO $$ BEGIN PERFORM 1; END $$;"),
+                (7, 'SELECT "a;b" FROM a'),
+            ],
+        )
+        self.assertEqual(split_sql_statements("-- nothing\n"), [])
+
+    def test_read_migration_segments_online_alter(self):
+        path = self.temp_dir / "0001_online.sql"
+        path.write_text(
+            "SELECT 1;\n\\online_alter public.users ALTER COLUMN id TYPE bigint,\n  ADD COLUMN note text;\n"
+            f"SELECT 2;\n{ROLLBACK_SPLIT_TAG}\n"
+        )
+
+        before, online, after = read_migration_segments(path)
+        assert isinstance(before, str) and isinstance(after, str)
+        self.assertEqual(before.strip(), "SELECT 1;")
+        self.assertEqual(
+            online, OnlineAlter(table="public.users", actions="ALTER COLUMN id TYPE bigint,\n  ADD COLUMN note text")
+        )
+        self.assertEqual(after.strip(), "SELECT 2;")
+
+    def test_compute_names_digest(self):
+        digest = compute_names_digest(["0000_a.sql", "0001_b.sql", "0002_c.sql"])
+        self.assertEqual(digest, compute_names_digest(["0002_c.sql", "0000_a.sql", "0001_b.sql"]))
+        self.assertEqual(len(digest), 64)
+
+        # toggling a name adds or removes it from the set
+        partial = compute_names_digest(["0000_a.sql", "0001_b.sql"])
+        self.assertEqual(compute_names_digest(["0002_c.sql"], partial), digest)
+        self.assertEqual(compute_names_digest(["0002_c.sql"], digest), partial)
+        self.assertEqual(compute_names_digest([]), EMPTY_NAMES_DIGEST)
+
+    def test_build_merkle_tree(self):
+        rows = [("0000_a.sql", "h0"), ("0001_b.sql", "h1"), ("0002_c.sql", "h2")]
+        tree = build_merkle_tree(rows)
+        self.assertEqual(tree, build_merkle_tree(reversed(rows)))
+        self.assertEqual(len(tree[""]), 64)
+        for name, _ in rows:
+            self.assertIn(merkle_bucket(name), tree)
+
+        # toggling rows only touches the nodes on their path
+        partial = build_merkle_tree(rows[:2])
+        self.assertEqual({**partial, **toggle_merkle_nodes(partial, build_merkle_tree(rows[2:]))}, tree)
+        updated = toggle_merkle_nodes(tree, build_merkle_tree([("0002_c.sql", "h2"), ("0002_c.sql", "new")]))
+        self.assertEqual({**tree, **updated}, build_merkle_tree([*rows[:2], ("0002_c.sql", "new")]))